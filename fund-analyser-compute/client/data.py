@@ -1,11 +1,51 @@
-from typing import Dict, Iterator, Optional
+import gzip
+import json
+import time
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, Optional, TypeVar
 
+import numpy as np
 import requests
 import ujson
+from requests.adapters import HTTPAdapter
+from urllib3 import Retry
 
 from lib.util import properties
+from lib.util.logging_utils import log_warning
+from lib.util.pipeline import pipelined_map
 
 DATA_HOST = properties.get("client.data")
+POOL_SIZE = properties.get("client.data.pool.size") or 10
+RETRIES = 3
+RETRY_BACKOFF = 0.5  # seconds, doubled on each retry
+RETRY_STATUSES = [429, 502, 503, 504]
+TIMEOUT = (10, 300)  # seconds to connect, and between bytes received
+GZIP_MIN_BYTES = 1 << 10  # smaller request bodies are not worth compressing
+UPLOAD_CHUNK_BYTES = 1 << 16
+STREAM_WORKERS = 4
+STREAM_MAX_PENDING = 64
+# compact binary alternative to json for streams of funds / stocks, see fund-analyser-data lib/util/columnar.ts
+COLUMNAR_CONTENT_TYPE = "application/x-columnar"
+
+T = TypeVar('T')
+
+
+def _new_session() -> requests.Session:
+    """
+    Session shared by all requests to the data service, so that connections are kept alive and reused.
+    """
+    session = requests.Session()
+    retry = Retry(total=RETRIES, backoff_factor=RETRY_BACKOFF, status_forcelist=RETRY_STATUSES,
+                  allowed_methods=None, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    session.verify = False
+    return session
+
+
+_session = _new_session()
 
 
 def _remove_leading_slash(endpoint: str) -> str:
@@ -14,18 +54,121 @@ def _remove_leading_slash(endpoint: str) -> str:
 
 def get(endpoint: str, params: Optional[Dict[str, str]] = None) -> object:
     endpoint = f"{DATA_HOST}/{_remove_leading_slash(endpoint)}"
-    return requests.get(endpoint, params, verify=False).json()
+    return _session.get(endpoint, params=params, timeout=TIMEOUT).json()
 
 
 def post(endpoint: str, data: Optional[object] = None) -> object:
+    """
+    Posts data as json, gzip compressed unless small.
+    """
+    endpoint = f"{DATA_HOST}/{_remove_leading_slash(endpoint)}"
+    if data is None:
+        return _session.post(endpoint, timeout=TIMEOUT)
+    body = json.dumps(data, allow_nan=False).encode()
+    headers = {"Content-Type": "application/json"}
+    if len(body) >= GZIP_MIN_BYTES:
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = "gzip"
+    return _session.post(endpoint, data=body, headers=headers, timeout=TIMEOUT)
+
+
+def post_chunked(endpoint: str, chunks: Callable[[], Iterable[bytes]]) -> requests.Response:
+    """
+    Uploads a large json body as it is generated, gzip compressed with chunked transfer encoding,
+    so that the whole payload never needs to be held in memory.
+    :param endpoint: endpoint to post to
+    :param chunks: returns a fresh iterable of json body chunks on each call, so that the upload can be retried
+    :return: response
+    """
     endpoint = f"{DATA_HOST}/{_remove_leading_slash(endpoint)}"
-    return requests.post(endpoint, json=data, verify=False)
+    headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    # requests does not retry chunked uploads, since the body can only be consumed once
+    attempt = 0
+    while True:
+        try:
+            res = _session.post(endpoint, data=_gzip_chunks(chunks()), headers=headers, timeout=TIMEOUT)
+            if res.status_code not in RETRY_STATUSES or attempt >= RETRIES:
+                return res
+            log_warning(f"Upload to {endpoint} failed with status {res.status_code}, retrying...")
+        except requests.ConnectionError as e:
+            if attempt >= RETRIES:
+                raise
+            log_warning(f"Upload to {endpoint} failed: {repr(e)}, retrying...")
+        time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        attempt += 1
+
+
+def _gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)  # gzip container
+    buf = bytearray()
+    for chunk in chunks:
+        buf += compressor.compress(chunk)
+        if len(buf) >= UPLOAD_CHUNK_BYTES:
+            yield bytes(buf)
+            buf.clear()
+    buf += compressor.flush()
+    yield bytes(buf)
 
 
 def stream(endpoint: str, data: Optional[object] = None) -> Iterator[Dict]:
+    return stream_converted(endpoint, lambda d: d, data)
+
+
+def stream_converted(endpoint: str, convert: Callable[[Dict], T], data: Optional[object] = None) -> Iterator[T]:
+    """
+    Streams entries of a json array response, applying convert to each decoded entry.
+    The compact columnar encoding is negotiated where the endpoint supports it, falling back to json.
+    Columnar entries are decoded like json ones, except historicPrices which becomes a dict of arrays:
+    {"date": datetime64[D] array, "price": float64 array, ...}.
+    Reading the socket, decoding and convert run as separate bounded pipeline stages,
+    so that network waits, parsing and conversion of consecutive entries overlap.
+    :param endpoint: endpoint to post to
+    :param convert: function applied to each decoded entry
+    :param data: json payload
+    :return: iterator of converted entries, in response order
+    """
     endpoint = f"{DATA_HOST}/{_remove_leading_slash(endpoint)}"
-    line_seps = {b",", b"[", b"]"}
-    lines = requests.post(endpoint, json=data, stream=True, verify=False).iter_lines()
-    return (ujson.loads(line)
-            for line in lines
-            if line not in line_seps)
+    headers = {"Accept": f"{COLUMNAR_CONTENT_TYPE}, application/json;q=0.9"}
+    res = _session.post(endpoint, json=data, headers=headers, stream=True, timeout=TIMEOUT)
+    if res.headers.get("Content-Type", "").startswith(COLUMNAR_CONTENT_TYPE):
+        records: Iterable[bytes] = _split_columnar(res.iter_content(chunk_size=1 << 16))
+        decode: Callable[[bytes], Dict] = _decode_columnar
+    else:
+        line_seps = {b",", b"[", b"]"}
+        records = (line for line in res.iter_lines() if line not in line_seps)
+        decode = ujson.loads
+    entries = pipelined_map(decode, records, max_workers=1, max_pending=STREAM_MAX_PENDING)
+    return pipelined_map(convert, entries, max_workers=STREAM_WORKERS, max_pending=STREAM_MAX_PENDING)
+
+
+def _split_columnar(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Splits the columnar stream into records, each prefixed by its uint32 length.
+    """
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        pos = 0
+        while len(buf) - pos >= 4:
+            end = pos + 4 + int.from_bytes(buf[pos:pos + 4], "little")
+            if len(buf) < end:
+                break
+            yield bytes(buf[pos + 4:end])
+            pos = end
+        del buf[:pos]
+    if buf:
+        raise ValueError(f"Columnar stream ended with incomplete record of {len(buf)} bytes")
+
+
+def _decode_columnar(record: bytes) -> Dict:
+    header_len = int.from_bytes(record[:4], "little")
+    d = ujson.loads(record[4:4 + header_len])
+    n = int.from_bytes(record[4 + header_len:8 + header_len], "little")
+    offset = 8 + header_len
+    historic_prices = {"date": np.frombuffer(record, dtype="<i4", count=n, offset=offset).astype("datetime64[D]")}
+    offset += 4 * n
+    for field in d.pop("historicPriceFields"):
+        historic_prices[field] = np.frombuffer(record, dtype="<f8", count=n, offset=offset)
+        offset += 8 * n
+    d["historicPrices"] = historic_prices
+    return d
@@ -1,4 +1,16 @@
+import gzip
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pytest
+import ujson
+
 from client import data
+from lib.util.logging_utils import log_info
+from lib.util.pandas_utils import np_historic_prices_from_json
 
 
 def test_get():
@@ -6,3 +18,118 @@ def test_get():
         "charlesStanleyDirect": True,
         "testsPassing": True
     }
+
+
+def _stub_funds(num_funds: int, num_prices: int) -> List[Dict]:
+    dates = np.arange(np.datetime64("2010-01-01"), np.datetime64("2010-01-01") + num_prices)
+    return [{
+        "isin": f"isin{i}",
+        "name": f"Fund {i}",
+        "historicPrices": [{"date": f"{d}T00:00:00.000Z", "price": 100 + i + j * 0.01} for j, d in enumerate(dates)]
+    } for i in range(num_funds)]
+
+
+def _encode_columnar(entry: Dict) -> bytes:
+    """
+    Mirror of the encoder in fund-analyser-data lib/util/columnar.ts
+    """
+    historic_prices = entry["historicPrices"]
+    header = ujson.dumps({**{k: v for k, v in entry.items() if k != "historicPrices"},
+                          "historicPriceFields": ["price"]}).encode()
+    days = np.array([p["date"][:10] for p in historic_prices], dtype="datetime64[D]").astype("<i4")
+    prices = np.array([p["price"] for p in historic_prices], dtype="<f8")
+    body = len(header).to_bytes(4, "little") + header + len(days).to_bytes(4, "little") \
+        + days.tobytes() + prices.tobytes()
+    return len(body).to_bytes(4, "little") + body
+
+
+def _read_body(handler: BaseHTTPRequestHandler) -> bytes:
+    if handler.headers.get("Transfer-Encoding") == "chunked":
+        body = bytearray()
+        while True:
+            size = int(handler.rfile.readline().strip(), 16)
+            body += handler.rfile.read(size)
+            handler.rfile.readline()
+            if not size:
+                break
+    else:
+        body = bytearray(handler.rfile.read(int(handler.headers.get("Content-Length", 0))))
+    return gzip.decompress(body) if handler.headers.get("Content-Encoding") == "gzip" else bytes(body)
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    funds = _stub_funds(num_funds=200, num_prices=1000)
+    bytes_sent: Dict[str, int] = dict()
+    uploads: List[Tuple[Optional[str], Dict]] = []
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = _read_body(self)
+            if self.path == "/upload":
+                uploads.append((self.headers.get("Transfer-Encoding"), ujson.loads(body)))
+                self.send_response(503 if len(uploads) == 1 else 200)  # fails once
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            columnar = data.COLUMNAR_CONTENT_TYPE in self.headers.get("Accept", "") and self.path != "/json/stream"
+            if columnar:
+                body = b"".join(_encode_columnar(fund) for fund in funds)
+            else:
+                body = ("[\n" + "\n,\n".join(ujson.dumps(fund) for fund in funds) + "\n]\n").encode()
+            bytes_sent["columnar" if columnar else "json"] = len(body)
+            self.send_response(200)
+            self.send_header("Content-Type", data.COLUMNAR_CONTENT_TYPE if columnar else "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            # deliberately small writes, so records are split across chunks
+            for i in range(0, len(body), 4093):
+                self.wfile.write(body[i:i + 4093])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("localhost", 0), StubHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(data, "DATA_HOST", f"http://localhost:{server.server_address[1]}")
+    monkeypatch.setattr(data, "RETRY_BACKOFF", 0)
+    yield funds, bytes_sent, uploads
+    server.shutdown()
+
+
+def test_stream_columnar_and_json(stub_server):
+    funds, bytes_sent, _ = stub_server
+
+    def convert(d: Dict):
+        return d["isin"], np_historic_prices_from_json(d["historicPrices"])
+
+    decode_times = dict()
+    results = dict()
+    for fmt, endpoint in [("columnar", "/funds/stream"), ("json", "/json/stream")]:
+        start = time.perf_counter()
+        results[fmt] = list(data.stream_converted(endpoint, convert))
+        decode_times[fmt] = time.perf_counter() - start
+        log_info(f"Streamed {len(funds)} funds as {fmt}: {bytes_sent[fmt]} bytes in {decode_times[fmt]:.3f} s")
+
+    assert len(results["columnar"]) == len(results["json"]) == len(funds)
+    for (isin1, (dates1, prices1)), (isin2, (dates2, prices2)) in zip(results["columnar"], results["json"]):
+        assert isin1 == isin2
+        np.testing.assert_array_equal(dates1, dates2)
+        np.testing.assert_array_equal(prices1, prices2)
+    assert bytes_sent["columnar"] < bytes_sent["json"] / 3
+
+
+def test_post_chunked(stub_server):
+    _, _, uploads = stub_server
+    payload = {"similarFunds": [{"isin": f"isin{i}", "similarIsins": [f"isin{i}"]} for i in range(10000)]}
+
+    def chunks():
+        yield b'{"similarFunds":['
+        yield b",".join(ujson.dumps(entry).encode() for entry in payload["similarFunds"])
+        yield b"]}"
+
+    res = data.post_chunked("/upload", chunks)
+    assert res.status_code == 200
+    assert uploads == [("chunked", payload), ("chunked", payload)]  # retried after 503
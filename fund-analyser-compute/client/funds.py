@@ -1,14 +1,26 @@
+import json
+from datetime import date
+from functools import partial
 from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
 
+import numpy as np
+import pandas as pd
+
 from client import data
 from lib.fund.fund import Fund, FundHistoricPrices
+from lib.util.dates import format_date
 from lib.util.logging_utils import log_error
-from lib.util.pandas_utils import pd_historic_prices_from_json
+from lib.util.pandas_utils import np_historic_prices_from_json
 
 
 class FundStreamEntry(NamedTuple):
     fund: Fund
-    historic_prices: FundHistoricPrices
+    dates: np.ndarray  # datetime64[D]
+    prices: np.ndarray  # float64, aligned with dates
+
+    @property
+    def historic_prices(self) -> FundHistoricPrices:
+        return pd.Series(self.prices, index=pd.DatetimeIndex(self.dates, name="date"), name=self.fund.isin)
 
 
 class SimilarFundsEntry(NamedTuple):
@@ -27,18 +39,41 @@ class SimilarFundsEntry(NamedTuple):
 SimilarFunds = List[SimilarFundsEntry]
 
 
-def stream_funds(isins: Optional[Iterable[str]] = None) -> Iterator[FundStreamEntry]:
-    for d in data.stream("/funds/stream", data={"isins": isins}):
-        try:
-            yield FundStreamEntry(
-                fund=Fund.from_dict(d),
-                historic_prices=pd_historic_prices_from_json(d.get("historicPrices", [])).rename(d["isin"])
-            )
-        except Exception as e:
-            log_error(f"Failed to convert {d} to fund! Cause: {repr(e)}")
+def stream_funds(isins: Optional[Iterable[str]] = None, since: Optional[date] = None) -> Iterator[FundStreamEntry]:
+    """
+    Streams funds with their historic prices.
+    :param isins: isins to stream, or all funds if None
+    :param since: if supplied, only historic prices strictly after this date are returned
+    """
+    payload: Dict[str, object] = {"isins": isins}
+    if since is not None:
+        payload["since"] = format_date(since)
+    entries = data.stream_converted("/funds/stream", partial(_to_fund_stream_entry, since=since), data=payload)
+    return (entry for entry in entries if entry is not None)
+
+
+def _to_fund_stream_entry(d: Dict, since: Optional[date]) -> Optional[FundStreamEntry]:
+    try:
+        dates, prices = np_historic_prices_from_json(d.get("historicPrices", []))
+        if since is not None:
+            # the data service already filters by since, this only guards the delta against older prices
+            after_since = dates > np.datetime64(pd.Timestamp(since), "D")
+            dates, prices = dates[after_since], prices[after_since]
+        return FundStreamEntry(
+            fund=Fund.from_dict(d),
+            dates=dates,
+            prices=prices
+        )
+    except Exception as e:
+        log_error(f"Failed to convert {d} to fund! Cause: {repr(e)}")
+        return None
 
 
 def post_similar_funds(similar_funds: SimilarFunds):
-    data.post("/funds/similar-funds", {
-        "similarFunds": [similar_funds_entry.as_dict() for similar_funds_entry in similar_funds]
-    })
+    def chunks() -> Iterator[bytes]:
+        yield b'{"similarFunds":['
+        for i, similar_funds_entry in enumerate(similar_funds):
+            yield (b"," if i else b"") + json.dumps(similar_funds_entry.as_dict(), allow_nan=False).encode()
+        yield b"]}"
+
+    data.post_chunked("/funds/similar-funds", chunks)
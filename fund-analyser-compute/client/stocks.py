@@ -1,4 +1,4 @@
-from typing import Iterable, Iterator, NamedTuple, Optional
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional
 
 from client import data
 from lib.stock.stock import Stock, StockHistoricPrices
@@ -12,11 +12,16 @@ class StockStreamEntry(NamedTuple):
 
 
 def stream_stocks(symbols: Optional[Iterable[str]] = None) -> Iterator[StockStreamEntry]:
-    for d in data.stream("/stocks/stream", data={"symbols": symbols}):
-        try:
-            yield StockStreamEntry(
-                stock=Stock.from_dict(d),
-                historic_prices=pd_historic_prices_from_json(d.get("historicPrices", []))
-            )
-        except Exception as e:
-            log_error(f"Failed to convert {d} to stock! Cause: {repr(e)}")
+    entries = data.stream_converted("/stocks/stream", _to_stock_stream_entry, data={"symbols": symbols})
+    return (entry for entry in entries if entry is not None)
+
+
+def _to_stock_stream_entry(d: Dict) -> Optional[StockStreamEntry]:
+    try:
+        return StockStreamEntry(
+            stock=Stock.from_dict(d),
+            historic_prices=pd_historic_prices_from_json(d.get("historicPrices", []))
+        )
+    except Exception as e:
+        log_error(f"Failed to convert {d} to stock! Cause: {repr(e)}")
+        return None
@@ -0,0 +1,198 @@
+// Per series indicators for batch_indicators(), on plain slices so they can run in parallel across series.
+//
+// Output columns of one series (nan where undefined, ilocs index into the series):
+//   mdd, mdd iloc, mdt (days), mdt iloc, num breakouts,
+//   stability mean, stability max, stability min, stability median,
+//   then for each lookback: max returns, max returns iloc, min returns, min returns iloc
+
+pub const NUM_FIXED_COLUMNS: usize = 9;
+pub const NUM_LOOKBACK_COLUMNS: usize = 4;
+
+const NANOS_PER_DAY: i64 = 24 * 60 * 60 * 1_000_000_000;
+
+pub fn num_columns(num_lookbacks: usize) -> usize {
+    NUM_FIXED_COLUMNS + NUM_LOOKBACK_COLUMNS * num_lookbacks
+}
+
+/// dates: nanoseconds since epoch, prices: without nans,
+/// base_ilocs: for each lookback, the iloc of the price each date's returns are measured from, or -1.
+pub fn series_indicators(dates: &[i64], prices: &[f64], base_ilocs: &[&[i64]]) -> Vec<f64> {
+    let mut row = vec![f64::NAN; num_columns(base_ilocs.len())];
+    if prices.is_empty() {
+        return row;
+    }
+    let (mdd, mdd_iloc) = mdd(prices);
+    let (mdt, mdt_iloc, num_breakouts) = mdt_num_breakouts(dates, prices);
+    row[0] = mdd;
+    row[1] = mdd_iloc as f64;
+    row[2] = mdt as f64;
+    row[3] = mdt_iloc as f64;
+    row[4] = num_breakouts as f64;
+    row[5..NUM_FIXED_COLUMNS].copy_from_slice(&stability(prices));
+    for (l, lookback_base_ilocs) in base_ilocs.iter().enumerate() {
+        let offset = NUM_FIXED_COLUMNS + NUM_LOOKBACK_COLUMNS * l;
+        row[offset..offset + NUM_LOOKBACK_COLUMNS]
+            .copy_from_slice(&min_max_returns(prices, lookback_base_ilocs));
+    }
+    row
+}
+
+/// Max drawdown and its (first) iloc, as ffn's to_drawdown_series(prices).min().
+fn mdd(prices: &[f64]) -> (f64, usize) {
+    let (mut peak, mut mdd, mut mdd_iloc) = (f64::NEG_INFINITY, f64::NAN, 0);
+    for (i, &price) in prices.iter().enumerate() {
+        peak = peak.max(price);
+        let drawdown = price / peak - 1.0;
+        if mdd.is_nan() || drawdown < mdd {
+            mdd = drawdown;
+            mdd_iloc = i;
+        }
+    }
+    (mdd, mdd_iloc)
+}
+
+/// Longest time in days between new highs (or the first / last date), the iloc ending it,
+/// and the number of new highs.
+fn mdt_num_breakouts(dates: &[i64], prices: &[f64]) -> (i64, usize, usize) {
+    let last = prices.len() - 1;
+    let (mut peak, mut recovery) = (prices[0], 0);
+    let (mut mdt, mut mdt_iloc, mut num_breakouts) = (i64::MIN, 0, 0);
+    let mut recover = |i: usize, recovery: usize| {
+        let downtime = (dates[i] - dates[recovery]).div_euclid(NANOS_PER_DAY);
+        if downtime > mdt {
+            mdt = downtime;
+            mdt_iloc = i;
+        }
+    };
+    for i in 1..prices.len() {
+        if prices[i] > peak {
+            recover(i, recovery);
+            peak = prices[i];
+            recovery = i;
+            num_breakouts += 1;
+        }
+    }
+    recover(last, recovery);
+    (mdt, mdt_iloc, num_breakouts)
+}
+
+/// Mean, max, min and median number of consecutive days prices moved in the same direction,
+/// where unchanged prices continue the previous direction.
+fn stability(prices: &[f64]) -> [f64; 4] {
+    let mut streaks: Vec<usize> = Vec::new();
+    let mut direction = 0.0;
+    for i in 1..prices.len() {
+        let change = prices[i] - prices[i - 1];
+        let new_direction = if change > 0.0 {
+            1.0
+        } else if change < 0.0 {
+            -1.0
+        } else {
+            direction
+        };
+        match streaks.last_mut() {
+            Some(streak) if new_direction * direction >= 0.0 => *streak += 1,
+            _ => streaks.push(1),
+        }
+        direction = new_direction;
+    }
+    if streaks.is_empty() {
+        return [f64::NAN; 4];
+    }
+    let mean = streaks.iter().sum::<usize>() as f64 / streaks.len() as f64;
+    streaks.sort_unstable();
+    let mid = streaks.len() / 2;
+    let median = if streaks.len() % 2 == 1 {
+        streaks[mid] as f64
+    } else {
+        (streaks[mid - 1] + streaks[mid]) as f64 / 2.0
+    };
+    [
+        mean,
+        streaks[streaks.len() - 1] as f64,
+        streaks[0] as f64,
+        median,
+    ]
+}
+
+/// Max returns, its iloc, min returns and its iloc (first occurrences) over the lookback.
+fn min_max_returns(prices: &[f64], base_ilocs: &[i64]) -> [f64; 4] {
+    let mut result = [f64::NAN; 4];
+    for (i, (&price, &base_iloc)) in prices.iter().zip(base_ilocs).enumerate() {
+        if base_iloc < 0 {
+            continue;
+        }
+        let base_price = prices[base_iloc as usize];
+        let returns = (price - base_price) / base_price;
+        if returns.is_nan() {
+            continue;
+        }
+        if result[0].is_nan() || returns > result[0] {
+            result[0] = returns;
+            result[1] = i as f64;
+        }
+        if result[2].is_nan() || returns < result[2] {
+            result[2] = returns;
+            result[3] = i as f64;
+        }
+    }
+    result
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn days(ds: &[i64]) -> Vec<i64> {
+        ds.iter().map(|d| d * NANOS_PER_DAY).collect()
+    }
+
+    #[test]
+    fn test_mdd() {
+        assert_eq!(
+            mdd(&[100.0, 110.0, 99.0, 105.0, 88.0, 120.0]),
+            (88.0 / 110.0 - 1.0, 4)
+        );
+        assert_eq!(mdd(&[100.0, 110.0]), (0.0, 0));
+    }
+
+    #[test]
+    fn test_mdt_num_breakouts() {
+        let dates = days(&[0, 1, 2, 5, 9, 10]);
+        assert_eq!(
+            mdt_num_breakouts(&dates, &[100.0, 101.0, 99.0, 100.0, 102.0, 101.0]),
+            (8, 4, 2)
+        );
+        assert_eq!(mdt_num_breakouts(&dates[..1], &[100.0]), (0, 0, 0));
+    }
+
+    #[test]
+    fn test_stability() {
+        // streaks: up 2 (incl. unchanged), down 1, up 1
+        assert_eq!(
+            stability(&[100.0, 101.0, 101.0, 100.0, 102.0]),
+            [4.0 / 3.0, 2.0, 1.0, 1.0]
+        );
+        // leading unchanged prices join the first streak
+        assert_eq!(
+            stability(&[100.0, 100.0, 99.0, 100.0]),
+            [1.5, 2.0, 1.0, 1.5]
+        );
+        assert!(stability(&[100.0])[0].is_nan());
+    }
+
+    #[test]
+    fn test_min_max_returns() {
+        let result = min_max_returns(&[100.0, 110.0, 99.0, 120.0], &[-1, 0, 1, 1]);
+        assert_eq!(result, [0.1, 1.0, (99.0 - 110.0) / 110.0, 2.0]);
+        assert!(min_max_returns(&[100.0], &[-1]).iter().all(|x| x.is_nan()));
+    }
+
+    #[test]
+    fn test_series_indicators() {
+        assert_eq!(series_indicators(&[], &[], &[&[]]).len(), num_columns(1));
+        let row = series_indicators(&days(&[0, 1]), &[100.0, 110.0], &[&[-1, 0]]);
+        assert_eq!(row[..5], [0.0, 0.0, 1.0, 1.0, 1.0]);
+        assert_eq!(row[NUM_FIXED_COLUMNS..], [0.1, 1.0, 0.1, 1.0]);
+    }
+}
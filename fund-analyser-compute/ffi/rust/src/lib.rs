@@ -1 +1,2 @@
+mod batch_indicators;
 mod rust_indicators;
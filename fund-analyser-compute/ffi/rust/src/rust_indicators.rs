@@ -1,10 +1,12 @@
 use ndarray::parallel::prelude::*;
 use ndarray::prelude::*;
 use ndarray::{Array, Array1, Array2, ArrayView1, ArrayView2};
-use numpy::{IntoPyArray, PyArray2};
+use numpy::{IntoPyArray, PyArray1, PyArray2};
 use pyo3::prelude::{pymodule, PyModule, PyResult, Python};
 use pyo3::types::PyTuple;
 
+use crate::batch_indicators::{num_columns, series_indicators};
+
 #[pymodule]
 fn rust_indicators(_py: Python, m: &PyModule) -> PyResult<()> {
     fn support_resistance_ilocs(
@@ -131,5 +133,43 @@ fn rust_indicators(_py: Python, m: &PyModule) -> PyResult<()> {
         )
     }
 
+    #[pyfn(m)]
+    #[pyo3(name = "batch_indicators")]
+    fn batch_indicators_py<'p>(
+        py: Python<'p>,
+        dates: Vec<&PyArray1<i64>>,
+        prices: Vec<&PyArray1<f64>>,
+        base_ilocs: Vec<&PyArray2<i64>>,
+    ) -> PyResult<&'p PyArray2<f64>> {
+        let num_lookbacks = base_ilocs.first().map_or(0, |ilocs| ilocs.shape()[0]);
+        let mut series = Vec::with_capacity(prices.len());
+        for ((dates, prices), base_ilocs) in dates.iter().zip(&prices).zip(&base_ilocs) {
+            let (dates, prices, base_ilocs) = unsafe {
+                (
+                    dates.as_slice()?,
+                    prices.as_slice()?,
+                    base_ilocs.as_slice()?,
+                )
+            };
+            let lookbacks_base_ilocs: Vec<&[i64]> = if prices.is_empty() {
+                vec![&[]; num_lookbacks]
+            } else {
+                base_ilocs.chunks_exact(prices.len()).collect()
+            };
+            series.push((dates, prices, lookbacks_base_ilocs));
+        }
+        let rows: Vec<Vec<f64>> = py.allow_threads(|| {
+            series
+                .par_iter()
+                .map(|(dates, prices, base_ilocs)| series_indicators(dates, prices, base_ilocs))
+                .collect()
+        });
+        let shape = (rows.len(), num_columns(num_lookbacks));
+        Ok(Array::from_iter(rows.into_iter().flatten())
+            .into_shape(shape)
+            .unwrap()
+            .into_pyarray(py))
+    }
+
     Ok(())
 }
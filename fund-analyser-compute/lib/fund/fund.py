@@ -93,7 +93,7 @@ class Fund(NamedTuple):
     exitCharge: Optional[float] = None
     bidAskSpread: Optional[float] = None
     holdings: List[FundHolding] = []
-    returns: Dict[str, float] = dict()
+    returns: Dict[str, Optional[float]] = dict()
     asof: Optional[datetime] = None
     indicators: Optional[FundIndicators] = None
     realTimeDetails: Optional[FundRealTimeDetails] = None
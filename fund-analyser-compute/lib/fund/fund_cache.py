@@ -1,24 +1,67 @@
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date, datetime, timedelta
 from threading import Lock
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+from uuid import uuid4
 
 import numpy as np
 import pandas as pd
 
 from client.funds import stream_funds
 from lib.fund.fund import Fund
-from lib.util.disk import read_from_disk, write_to_disk
-from lib.util.logging_utils import log_debug, log_info, log_warning
+from lib.fund.fund_table import FundTable
+from lib.util import properties
+from lib.util.dates import BDAY
+from lib.util.disk import list_disk, read_array_from_disk, read_from_disk, remove_from_disk, write_array_to_disk, \
+    write_to_disk
+from lib.util.logging_utils import log_debug, log_error, log_info, log_warning
+from lib.util.pandas_utils import pd_prices_df_from_arrays
+from lib.util.rolling_corr import corr_neighbours, RollingCorr
 
 EXPIRY = timedelta(days=1)
+DELTA_OVERLAP = 5 * BDAY
+# running correlation sums are kept between refreshes only if they fit, see RollingCorr.nbytes()
+MAX_ROLLING_CORR_BYTES = properties.get("fund.corr.rolling.max.bytes") or 512 * 1024 ** 2
 _PICKLE_FUND_CACHE = "fund_cache.pickle"
+_NPY_FUND_PRICES_PATTERN = "fund_cache_prices.*.npy"
 
-_fund_cache: Dict[str, Fund] = dict()
-_prices_df: Optional[pd.DataFrame] = None  # fast DataFrame cache for fund historicPrices
-_corr_df: Optional[pd.DataFrame] = None  # correlation between price series
-_expiration_time: Optional[datetime] = None
-_is_full: bool = False
-_lock = Lock()
+
+class Snapshot(NamedTuple):
+    """
+    Immutable, complete view of the fund cache. Never modified after creation -
+    refreshes build a new snapshot and swap it in, so readers holding a snapshot are unaffected.
+    """
+    funds: FundTable
+    prices_df: pd.DataFrame  # fast DataFrame cache for fund historicPrices
+    corr_df: pd.DataFrame  # correlation between price series
+    expiration_times: Dict[str, datetime]  # per isin, as funds can be fetched at different times
+    is_full: bool  # whether funds contains the full universe, rather than only the isins asked for so far
+    # per isin, last date of prices_df when it was last fetched - later prices are forward filled from other isins
+    fetched_dates: Dict[str, pd.Timestamp] = dict()
+
+    def covers(self, isins: Optional[Iterable[str]]) -> bool:
+        if isins is None:
+            return self.is_full
+        return self.funds.keys() >= set(isins)
+
+    def expired(self, isins: Optional[Iterable[str]] = None) -> bool:
+        """
+        Returns whether any of isins (all cached funds if None) is due a refresh.
+        Isins without an expiration time (e.g. not cached) are never expired.
+        """
+        now = datetime.now()
+        if isins is None:
+            return any(now > expiration_time for expiration_time in self.expiration_times.values())
+        return any(now > self.expiration_times.get(isin, datetime.max) for isin in isins)
+
+
+_snapshot: Optional[Snapshot] = None  # only ever replaced as a whole, never mutated
+_rolling_corr: Optional[RollingCorr] = None  # running sums behind corr_df, only touched by the refresh worker
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fund_cache")  # serialises refreshes
+_in_flight: Dict[Optional[FrozenSet[str]], Future] = dict()  # pending refreshes by isins, None for all funds
+_lock = Lock()  # guards _in_flight and loading from file, never held while reading or refreshing
+_loaded_from_file = False
+_version = 0  # bumped whenever _snapshot is replaced
 
 
 def get(isins: Optional[Iterable[str]] = None) -> List[Fund]:
@@ -27,40 +70,65 @@ def get(isins: Optional[Iterable[str]] = None) -> List[Fund]:
     :param isins: iterable of isins
     :return: list of funds
     """
-    maybe_initialise(isins)
-    isins = _normalise_isins(isins)
-    return [_fund_cache[isin] for isin in isins]
+    isins = _listify(isins)
+    snapshot = maybe_initialise(isins)
+    return [snapshot.funds[isin] for isin in _normalise_isins(snapshot, isins)]
 
 
 def get_prices(isins: Optional[Iterable[str]] = None) -> pd.DataFrame:
-    maybe_initialise(isins)
-    isins = _normalise_isins(isins)
-    return _prices_df[isins]  # type: ignore
+    isins = _listify(isins)
+    snapshot = maybe_initialise(isins)
+    return snapshot.prices_df[_normalise_isins(snapshot, isins)]
 
 
 def get_corr(isins: Optional[Iterable[str]] = None) -> pd.DataFrame:
-    maybe_initialise(isins)
-    isins = _normalise_isins(isins)
-    return _corr_df.loc[isins, isins]  # type: ignore
+    isins = _listify(isins)
+    snapshot = maybe_initialise(isins)
+    isins = _normalise_isins(snapshot, isins)
+    return snapshot.corr_df.loc[isins, isins]
+
 
+def get_similar(isins: Optional[Iterable[str]] = None, threshold: float = 0.99,
+                limit: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Sparse neighbour lists of funds whose price correlation (same window as get_corr) exceeds threshold.
+    Unlike get_corr(), never builds the dense isins x isins matrix.
+    :param isins: iterable of isins
+    :param threshold: correlation threshold
+    :param limit: if supplied, max number of most correlated neighbours per fund
+    :return: isin -> similar isins
+    """
+    isins = _listify(isins)
+    snapshot = maybe_initialise(isins)
+    isins = _normalise_isins(snapshot, isins)
+    return corr_neighbours(_corr_window(snapshot.prices_df[isins]), threshold, limit=limit)
 
-def filter_isins(isins: Iterable[str]) -> List[str]:
+
+def version() -> int:
+    """
+    Returns a number that changes whenever the cache is refreshed (or loaded from file),
+    so that results derived from the cache can be invalidated.
+    """
+    return _version
+
+
+def filter_isins(snapshot: Snapshot, isins: Iterable[str]) -> List[str]:
     def no_entry_charge(isin: str) -> bool:
-        return not _fund_cache[isin].entryCharge
+        return not snapshot.funds.get_field(isin, "entryCharge")
 
     def no_bid_ask_spread(isin: str) -> bool:
-        return not _fund_cache[isin].bidAskSpread
+        return not snapshot.funds.get_field(isin, "bidAskSpread")
 
     def daily_frequency(isin: str) -> bool:
-        return _fund_cache[isin].frequency == "Daily"
+        return snapshot.funds.get_field(isin, "frequency") == "Daily"
 
     def long_history(isin: str) -> bool:
-        return len(_prices_df[isin].index) >= 30  # type: ignore
+        return len(snapshot.prices_df[isin].index) >= 30
 
     TODAY = date.today()
 
     def up_to_date(isin: str) -> bool:
-        return np.busday_count(_prices_df[isin].last_valid_index().date(), TODAY) <= 5  # type: ignore
+        return np.busday_count(snapshot.prices_df[isin].last_valid_index().date(), TODAY) <= 5
 
     funcs = [no_entry_charge, no_bid_ask_spread, daily_frequency, long_history, up_to_date]
     result = isins
@@ -74,101 +142,309 @@ def valid(isins: Optional[Iterable[str]]) -> bool:
     """
     Returns whether fund cache is initialised,  not expired, and contains the asking isins.
     """
-    if _expiration_time is None:
-        return False
-    if datetime.now() > _expiration_time:
-        return False
-    if isins is None:
-        return _is_full
-    return set(_fund_cache.keys()).issuperset(isins)
+    snapshot = _snapshot
+    return snapshot is not None and snapshot.covers(isins) and not snapshot.expired(isins)
 
 
-def initialise(isins: Optional[Iterable[str]]) -> None:
+def initialise(isins: Optional[Iterable[str]]) -> Snapshot:
     """
-    Initialises fund cache from file or web where appropriate.
-    Applies locking to ensure no redundant initialisation is performed.
+    Initialises fund cache from file or web where appropriate, and returns a snapshot containing the asking isins.
+    Only blocks until the asking isins are available - if a refresh for them is already in flight,
+    waits for that instead of starting another.
     """
-    _lock.acquire()
-    load_from_file_or_refresh(isins)
-    _lock.release()
+    isins = _listify(isins)
+    _maybe_load_from_file()
+    snapshot = _snapshot
+    if snapshot is None or not snapshot.covers(isins):
+        schedule_refresh(isins).result()
+        snapshot = _snapshot
     log_info("Fund cache initialised.")
+    return snapshot  # type: ignore
 
 
-def maybe_initialise(isins: Optional[Iterable[str]]) -> None:
-    if not valid(isins):
-        initialise(isins)
+def maybe_initialise(isins: Optional[Iterable[str]]) -> Snapshot:
+    """
+    Returns the current snapshot if it contains the asking isins, without blocking.
+    If any of the asking isins has expired, it is still returned while a fresh one is built in the background.
+    """
+    snapshot = _snapshot
+    if snapshot is None or not snapshot.covers(isins):
+        snapshot = initialise(isins)
+    if snapshot.expired(isins):
+        schedule_refresh(isins)
+    return snapshot
 
 
-def load_from_file_or_refresh(isins: Optional[Iterable[str]]) -> None:
+def schedule_refresh(isins: Optional[Iterable[str]]) -> Future:
     """
-    Loads fund cache from file if present and not expired, else refresh from web.
+    Schedules a background refresh for isins, unless one covering them is already in flight.
+    :param isins: iterable of isins, or None for all funds
+    :return: future that completes once the refreshed snapshot has been swapped in
     """
-    try:
-        load_from_file(isins)
-        log_debug("Successfully loaded from pickle file.")
-    except (ValueError, FileNotFoundError) as e:
-        log_warning(e)
-        refresh(isins)
+    key = None if isins is None else frozenset(isins)
+    with _lock:
+        for in_flight_key, future in _in_flight.items():
+            if in_flight_key is None or (key is not None and key <= in_flight_key):
+                return future
+        future = _refresh_executor.submit(_refresh_if_needed, key)
+        _in_flight[key] = future
+        return future
 
 
-def load_from_file(isins: Optional[Iterable[str]]) -> None:
+def load_from_file() -> Snapshot:
     """
-    Loads fund cache from file if present and not expired, else raises ValueError.
+    Loads fund cache snapshot from file, even if expired.
+    Prices are memory mapped, so pages are only read when the corresponding isins are accessed.
     """
-    global _fund_cache, _prices_df, _corr_df, _expiration_time, _is_full
     data = read_from_disk(_PICKLE_FUND_CACHE)
-    if datetime.now() > data["expiry"]:
-        raise ValueError(f"Fund cache expired at: {data['expiry']}")
-    _fund_cache, _prices_df, _corr_df, _expiration_time, _is_full = \
-        data["funds"], data["prices_df"], data["corr_df"], data["expiry"], data["is_full"]
-    if not valid(isins):
-        raise ValueError(f"Fund cache needs refresh because it doesn't contain all isins: {isins}")
-
-
-def save_to_file() -> None:
+    funds = data["funds"]
+    if isinstance(funds, dict):
+        # saved before funds were stored as a table
+        funds = FundTable(funds.values())
+    prices_df = pd.DataFrame(read_array_from_disk(data["prices_file"]),
+                             index=data["prices_index"],
+                             columns=data["prices_columns"],
+                             copy=False)
+    return Snapshot(funds=funds,
+                    prices_df=prices_df,
+                    corr_df=data["corr_df"],
+                    expiration_times=data["expiration_times"],
+                    is_full=data["is_full"],
+                    # saved before fetched dates were tracked - isins are then re-fetched from the start once
+                    fetched_dates=data.get("fetched_dates", dict()))
+
+
+def save_to_file(snapshot: Snapshot) -> None:
     """
-    Saves in-memory fund cache to file.
-    :return:
+    Saves fund cache snapshot to file.
+    Prices are stored separately as a column-major float64 block, so that they can be memory mapped on load.
     """
-    global _fund_cache, _prices_df, _corr_df, _expiration_time, _is_full
+    prices_file = _NPY_FUND_PRICES_PATTERN.replace("*", uuid4().hex)
+    write_array_to_disk(prices_file, np.asfortranarray(snapshot.prices_df.to_numpy(dtype=np.float64)))
     write_to_disk(_PICKLE_FUND_CACHE, {
-        "funds": _fund_cache,
-        "prices_df": _prices_df,
-        "corr_df": _corr_df,
-        "expiry": _expiration_time,
-        "is_full": _is_full
+        "funds": snapshot.funds,
+        "prices_file": prices_file,
+        "prices_index": snapshot.prices_df.index,
+        "prices_columns": snapshot.prices_df.columns,
+        "corr_df": snapshot.corr_df,
+        "expiration_times": snapshot.expiration_times,
+        "is_full": snapshot.is_full,
+        "fetched_dates": snapshot.fetched_dates
     })
+    # processes still mapping a stale file keep their view until they reload
+    for stale_prices_file in list_disk(_NPY_FUND_PRICES_PATTERN):
+        if stale_prices_file != prices_file:
+            remove_from_disk(stale_prices_file)
 
 
-def refresh(isins: Optional[Iterable[str]]) -> None:
+def refresh(isins: Optional[Iterable[str]], incremental: bool = True) -> None:
     """
-    Builds a fresh copy of fund cache from web.
+    Builds a fresh snapshot of fund cache from web and swaps it in. Blocks until done.
+    Fetched isins are merged into the existing cache, so other cached funds are never evicted.
+    If incremental, cached isins that are still fresh are skipped, and expired ones only have prices newer than
+    the cache fetched and appended, instead of rebuilding from full history.
     """
-    global _fund_cache, _prices_df, _corr_df, _expiration_time, _is_full
+    _refresh_executor.submit(_refresh, _listify(isins), incremental).result()
+
+
+def _refresh_if_needed(key: Optional[FrozenSet[str]]) -> None:
+    try:
+        # an earlier refresh in the queue may already have covered these isins
+        if not valid(key):
+            _refresh(None if key is None else list(key), incremental=True)
+    except Exception as e:
+        log_error(f"Fund cache refresh failed: {repr(e)}")
+        raise
+    finally:
+        with _lock:
+            del _in_flight[key]
+
+
+def _refresh(isins: Optional[List[str]], incremental: bool) -> None:
+    global _snapshot, _version
+    snapshot = _snapshot
+    if snapshot is None or snapshot.prices_df.empty or (isins is None and not incremental):
+        snapshot = _refresh_full(isins)
+    else:
+        snapshot = _refresh_partial(snapshot, isins, incremental)
+    _snapshot = snapshot
+    _version += 1
+    save_to_file(snapshot)
+
+
+def _refresh_full(isins: Optional[List[str]]) -> Snapshot:
     log_info("Refreshing fund cache...")
-    _fund_cache = dict()
-    all_prices = []
+    funds, prices_df = _fetch_full(isins)
+    expiration_time = datetime.now() + EXPIRY
+    log_info("Fund cache refreshed.")
+    return Snapshot(funds=FundTable(funds.values()),
+                    prices_df=prices_df,
+                    corr_df=_calc_corr(prices_df, incremental=False),
+                    expiration_times={isin: expiration_time for isin in funds},
+                    is_full=isins is None,
+                    fetched_dates={isin: prices_df.index[-1] for isin in funds} if len(prices_df.index) else dict())
+
+
+def _refresh_partial(snapshot: Snapshot, isins: Optional[List[str]], incremental: bool) -> Snapshot:
+    """
+    Merges fresh data for isins (all funds if None) into a copy of snapshot, leaving other cached funds untouched.
+    If incremental, expired cached isins have their last DELTA_OVERLAP of prices re-fetched and appended.
+    The overlap picks up late published prices that were forward filled in the previous refresh.
+    Isins new to the cache (or all isins, if not incremental) have their full history fetched.
+    """
+    log_info(f"Refreshing fund cache for {'all' if isins is None else len(isins)} isins...")
+    funds: Dict[str, Fund] = dict()  # fetched funds, replacing the cached ones
+    expiration_times = dict(snapshot.expiration_times)
+    prices_df = snapshot.prices_df
+    refreshed_isins: List[str] = []
+    new_isins: List[str] = []
+    requested_isins: List[str] = []  # cached isins asked for, renewed even if the data service doesn't return them
+    if incremental:
+        stale_isins = None if isins is None \
+            else [isin for isin in isins if isin in snapshot.funds and snapshot.expired([isin])]
+        if stale_isins != []:
+            prices_df, refreshed_isins, new_isins = _append_delta(snapshot, stale_isins, funds)
+            requested_isins = list(snapshot.funds.keys()) if stale_isins is None else stale_isins
+        if isins is not None:
+            new_isins = [isin for isin in isins if isin not in snapshot.funds]
+    else:
+        new_isins = list(isins)  # type: ignore
+        requested_isins = [isin for isin in new_isins if isin in snapshot.funds]
+
+    if new_isins:
+        log_debug(f"Fetching full history for funds: {new_isins}")
+        new_funds, new_prices_df = _fetch_full(new_isins)
+        funds.update(new_funds)
+        refreshed_isins.extend(new_funds.keys())
+        prices_df = pd.concat([prices_df.drop(columns=new_prices_df.columns, errors="ignore"), new_prices_df],
+                              axis=1).resample("B").asfreq().fillna(method="ffill")
+
+    missing_isins = set(requested_isins).difference(refreshed_isins)
+    if missing_isins:
+        # e.g. delisted or failed to convert - keep serving the cached data rather than re-requesting on every get()
+        log_warning(f"Funds not returned by data service, kept until next expiry: {sorted(missing_isins)}")
+    expiration_time = datetime.now() + EXPIRY
+    expiration_times.update({isin: expiration_time for isin in [*refreshed_isins, *missing_isins]})
+    # missing isins were asked for up to now too, so that they don't hold back every later delta
+    fetched_dates = dict(snapshot.fetched_dates)
+    fetched_dates.update({isin: prices_df.index[-1] for isin in [*refreshed_isins, *missing_isins]})
+    log_info("Fund cache refreshed.")
+    return Snapshot(funds=snapshot.funds.updated(funds.values()),
+                    prices_df=prices_df,
+                    corr_df=_calc_corr(prices_df, incremental=True),
+                    expiration_times=expiration_times,
+                    is_full=snapshot.is_full or isins is None,
+                    fetched_dates=fetched_dates)
+
+
+def _append_delta(snapshot: Snapshot, isins: Optional[List[str]],
+                  funds: Dict[str, Fund]) -> Tuple[pd.DataFrame, List[str], List[str]]:
+    """
+    Re-fetches prices for isins (all funds if None) since DELTA_OVERLAP before the earliest date they were last
+    fetched up to, and appends them to the cached prices, adding the fetched cached funds to funds.
+    Going by the cache's last date instead would skip prices of isins forward filled by other isins' refreshes.
+    :return: (prices, refreshed cached isins, isins streamed that are not cached yet)
+    """
+    # the first row is always retained, to seed forward filling
+    first_date = snapshot.prices_df.index[0]
+    fetched_date = min((snapshot.fetched_dates.get(isin, first_date)
+                        for isin in (snapshot.funds.keys() if isins is None else isins)), default=first_date)
+    since = max(fetched_date - DELTA_OVERLAP, first_date)
+    refreshed_isins, delta_dates, delta_prices = [], [], []
+    new_isins = []
+    counter = 0
+    for fund_stream_entry in stream_funds(isins, since=since):
+        counter += 1
+        fund = fund_stream_entry.fund
+        log_debug(f"Fund {counter} {fund.isin} received.")
+        if fund.isin in snapshot.funds:
+            funds[fund.isin] = fund
+            refreshed_isins.append(fund.isin)
+            delta_dates.append(fund_stream_entry.dates)
+            delta_prices.append(fund_stream_entry.prices)
+        else:
+            new_isins.append(fund.isin)
+
+    log_debug("Appending fund historic prices...")
+    base_df = snapshot.prices_df.loc[:since]
+    tail_df = snapshot.prices_df[snapshot.prices_df.index > base_df.index[-1]]
+    if refreshed_isins:
+        delta_df = pd_prices_df_from_arrays(refreshed_isins, delta_dates, delta_prices)
+        # refreshed isins take the fetched prices, other isins keep their cached ones
+        tail_df = pd.concat([tail_df.drop(columns=refreshed_isins),
+                             delta_df[delta_df.index > base_df.index[-1]]], axis=1)
+    # forward fill only the new tail, seeded with the last retained row
+    tail_df = pd.concat([base_df.iloc[-1:], tail_df]).resample("B").asfreq().fillna(method="ffill").iloc[1:]
+    return pd.concat([base_df, tail_df]), refreshed_isins, new_isins
+
+
+def _fetch_full(isins: Optional[List[str]]) -> Tuple[Dict[str, Fund], pd.DataFrame]:
+    funds = dict()
+    all_dates, all_prices = [], []
     counter = 0
     for fund_stream_entry in stream_funds(isins):
         counter += 1
         fund = fund_stream_entry.fund
         log_debug(f"Fund {counter} {fund.isin} received.")
-        _fund_cache[fund.isin] = fund
-        all_prices.append(fund_stream_entry.historic_prices)
+        funds[fund.isin] = fund
+        all_dates.append(fund_stream_entry.dates)
+        all_prices.append(fund_stream_entry.prices)
     log_debug("Merging fund historic prices...")
-    _prices_df = pd.concat(all_prices, axis=1).resample("B").asfreq().fillna(method="ffill")
-    _corr_df = _prices_df.truncate(before=date.today() - pd.DateOffset(years=1)).corr()
-    _expiration_time = datetime.now() + EXPIRY
-    _is_full = isins is None
-    save_to_file()
-    log_info("Fund cache refreshed.")
+    return funds, pd_prices_df_from_arrays(list(funds.keys()), all_dates, all_prices)
+
+
+def _maybe_load_from_file() -> None:
+    """
+    Loads the snapshot saved by a previous process once, so that it can be served (or refreshed incrementally)
+    instead of rebuilt from scratch.
+    """
+    global _snapshot, _loaded_from_file, _version
+    with _lock:
+        if _loaded_from_file:
+            return
+        _loaded_from_file = True
+        try:
+            snapshot = load_from_file()
+            log_debug("Successfully loaded from pickle file.")
+        except (FileNotFoundError, KeyError) as e:
+            log_warning(repr(e))
+            return
+        if _snapshot is None:
+            _snapshot = snapshot
+            _version += 1
+
+
+def _calc_corr(prices_df: pd.DataFrame, incremental: bool) -> pd.DataFrame:
+    """
+    Correlation between price series over the past year.
+    If incremental, rolls the running sums from the previous refresh forward instead of recomputing.
+    Universes whose running sums would exceed MAX_ROLLING_CORR_BYTES are always recomputed, without keeping sums.
+    """
+    global _rolling_corr
+    window_df = _corr_window(prices_df)
+    if RollingCorr.nbytes(len(window_df.columns), len(window_df.index)) > MAX_ROLLING_CORR_BYTES:
+        _rolling_corr = None
+        return window_df.corr()
+    if incremental and _rolling_corr is not None:
+        _rolling_corr.update(window_df)
+    else:
+        _rolling_corr = RollingCorr(window_df)
+    return _rolling_corr.corr()
+
+
+def _corr_window(prices_df: pd.DataFrame) -> pd.DataFrame:
+    return prices_df.truncate(before=date.today() - pd.DateOffset(years=1))
+
+
+def _listify(isins: Optional[Iterable[str]]) -> Optional[List[str]]:
+    return None if isins is None else list(isins)
 
 
-def _normalise_isins(isins: Optional[Iterable[str]] = None) -> List[str]:
+def _normalise_isins(snapshot: Snapshot, isins: Optional[List[str]]) -> List[str]:
     """
-    Normalise input isins. If None, will be replaced with filtered isins in fund cache.
+    Normalise input isins. If None, will be replaced with filtered isins in snapshot.
     """
     if isins is None:
-        return filter_isins(_fund_cache.keys())
+        return filter_isins(snapshot, snapshot.funds.keys())
     else:
-        return list(isins)
+        return isins
@@ -1,6 +1,17 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from threading import Event
+from uuid import uuid4
+
+import numpy as np
 import pandas as pd
+from pandas.testing import assert_frame_equal
 
+from client.funds import FundStreamEntry
 from lib.fund import fund_cache
+from lib.fund.fund import Fund
+from lib.fund.fund_table import FundTable
 
 
 def test_get():
@@ -20,3 +31,287 @@ def test_get_corr():
     assert isinstance(corr_df, pd.DataFrame)
     assert list(corr_df.index) == list(corr_df.columns)
     assert len(corr_df.columns) > 3000
+
+
+def test_save_and_load_from_file(monkeypatch):
+    file_prefix = str(uuid4())
+    monkeypatch.setattr(fund_cache, "_PICKLE_FUND_CACHE", f"{file_prefix}.pickle")
+    monkeypatch.setattr(fund_cache, "_NPY_FUND_PRICES_PATTERN", f"{file_prefix}.*.npy")
+    prices_df = pd.DataFrame(
+        [[1.0, 10.0, np.nan],
+         [2.0, 20.0, 200.0],
+         [3.0, 30.0, 300.0]],
+        index=pd.date_range(datetime(2001, 1, 1), datetime(2001, 1, 3), freq="B"),
+        columns=["isin1", "isin2", "isin3"]
+    )
+    snapshot = fund_cache.Snapshot(funds=FundTable(Fund(isin=isin) for isin in prices_df.columns),
+                                   prices_df=prices_df,
+                                   corr_df=prices_df.corr(),
+                                   expiration_times={isin: datetime.now() + timedelta(hours=1)
+                                                     for isin in prices_df.columns},
+                                   is_full=True,
+                                   fetched_dates={isin: prices_df.index[-1] for isin in prices_df.columns})
+    fund_cache.save_to_file(snapshot)
+
+    loaded = fund_cache.load_from_file()
+
+    assert loaded.covers(["isin1", "isin3"])
+    assert not loaded.expired()
+    assert loaded.fetched_dates == snapshot.fetched_dates
+    assert_frame_equal(loaded.prices_df, prices_df, check_freq=False)
+    assert_frame_equal(loaded.prices_df[["isin3", "isin1"]], prices_df[["isin3", "isin1"]], check_freq=False)
+
+
+def test_refresh_incremental(monkeypatch):
+    historic_prices = {
+        "isin1": pd.Series([1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0],
+                           index=pd.date_range(datetime(2001, 1, 1), datetime(2001, 1, 12), freq="B")),
+        "isin2": pd.Series([10.0, 30.0, 40.0, 80.0],
+                           index=pd.DatetimeIndex(["2001-01-01", "2001-01-03", "2001-01-04", "2001-01-10"]))
+    }
+    as_of = datetime(2001, 1, 8)
+
+    def mock_stream_funds(isins=None, since=None):
+        for isin, series in historic_prices.items():
+            if isins is not None and isin not in isins:
+                continue
+            series = series[series.index <= as_of]
+            if since is not None:
+                series = series[series.index > since]
+            yield _stream_entry(isin, series)
+
+    monkeypatch.setattr(fund_cache, "stream_funds", mock_stream_funds)
+    monkeypatch.setattr(fund_cache, "save_to_file", lambda snapshot: None)
+    monkeypatch.setattr(fund_cache, "_snapshot", None)
+    monkeypatch.setattr(fund_cache, "_rolling_corr", None)
+    fund_cache.refresh(None, incremental=False)
+
+    # a day later: a late published price, new prices and a new fund in the universe
+    as_of = datetime(2001, 1, 12)
+    historic_prices["isin2"] = pd.concat([pd.Series([20.0], index=pd.DatetimeIndex(["2001-01-02"])),
+                                          historic_prices["isin2"]]).sort_index()
+    historic_prices["isin3"] = pd.Series([100.0, 200.0], index=pd.DatetimeIndex(["2001-01-02", "2001-01-11"]))
+    fund_cache.refresh(None)
+    incremental_prices_df = fund_cache._snapshot.prices_df
+
+    fund_cache.refresh(None, incremental=False)
+    full_prices_df = fund_cache._snapshot.prices_df
+
+    assert list(fund_cache._snapshot.funds.keys()) == ["isin1", "isin2", "isin3"]
+    assert_frame_equal(incremental_prices_df, full_prices_df, check_freq=False)
+
+
+def test_refresh_incremental_after_other_isins_moved_ahead(monkeypatch):
+    dates = pd.date_range(datetime(2001, 1, 1), periods=20, freq="B")
+    historic_prices = {
+        "isin1": pd.Series(np.arange(1.0, 21.0), index=dates),
+        "isin2": pd.Series(np.arange(101.0, 121.0), index=dates)
+    }
+    as_of = dates[2]
+
+    def mock_stream_funds(isins=None, since=None):
+        for isin, series in historic_prices.items():
+            if isins is not None and isin not in isins:
+                continue
+            series = series[series.index <= as_of]
+            if since is not None:
+                series = series[series.index > since]
+            yield _stream_entry(isin, series)
+
+    monkeypatch.setattr(fund_cache, "stream_funds", mock_stream_funds)
+    monkeypatch.setattr(fund_cache, "save_to_file", lambda snapshot: None)
+    monkeypatch.setattr(fund_cache, "_snapshot", None)
+    monkeypatch.setattr(fund_cache, "_rolling_corr", None)
+    fund_cache.refresh(None, incremental=False)
+
+    # isin1 alone is refreshed much later, moving the index ahead and forward filling isin2
+    as_of = dates[-1]
+    fund_cache._snapshot = fund_cache._snapshot._replace(
+        expiration_times=dict(fund_cache._snapshot.expiration_times, isin1=datetime.now() - timedelta(hours=1)))
+    fund_cache.refresh(["isin1"])
+    assert fund_cache._snapshot.prices_df["isin2"].iloc[-1] == 103.0
+
+    # then isin2 must get all its prices since it was last fetched, not just the last few days of the index
+    fund_cache._snapshot = fund_cache._snapshot._replace(
+        expiration_times=dict(fund_cache._snapshot.expiration_times, isin2=datetime.now() - timedelta(hours=1)))
+    fund_cache.refresh(["isin2"])
+    incremental_prices_df = fund_cache._snapshot.prices_df
+
+    fund_cache.refresh(None, incremental=False)
+    assert_frame_equal(incremental_prices_df, fund_cache._snapshot.prices_df, check_freq=False)
+
+
+def test_calc_corr_over_memory_budget(monkeypatch):
+    prices_df = pd.DataFrame(
+        [[1.0, 2.0, 5.0],
+         [2.0, 4.0, 4.0],
+         [3.0, 6.1, 5.0],
+         [2.5, 5.0, 3.0]],
+        index=pd.date_range(date.today() - timedelta(days=6), periods=4, freq="B"),
+        columns=["isin1", "isin2", "isin3"]
+    )
+    monkeypatch.setattr(fund_cache, "_rolling_corr", None)
+    assert_frame_equal(fund_cache._calc_corr(prices_df, incremental=True), prices_df.corr())
+    assert fund_cache._rolling_corr is not None
+
+    monkeypatch.setattr(fund_cache, "MAX_ROLLING_CORR_BYTES", 100)
+    assert_frame_equal(fund_cache._calc_corr(prices_df, incremental=True), prices_df.corr())
+    assert fund_cache._rolling_corr is None
+
+
+def test_get_similar(monkeypatch):
+    prices_df = pd.DataFrame(
+        [[1.0, 2.0, 5.0],
+         [2.0, 4.0, 4.0],
+         [3.0, 6.1, 5.0],
+         [2.5, 5.0, 3.0]],
+        index=pd.date_range(date.today() - timedelta(days=6), periods=4, freq="B"),
+        columns=["isin1", "isin2", "isin3"]
+    )
+    snapshot = fund_cache.Snapshot(funds=FundTable(), prices_df=prices_df, corr_df=pd.DataFrame(),
+                                   expiration_times=dict(), is_full=True)
+    monkeypatch.setattr(fund_cache, "maybe_initialise", lambda isins: snapshot)
+    assert fund_cache.get_similar(["isin1", "isin2", "isin3"], threshold=0.99) == {
+        "isin1": ["isin1", "isin2"],
+        "isin2": ["isin1", "isin2"],
+        "isin3": ["isin3"]
+    }
+
+
+def test_refresh_merges_partial_universe(monkeypatch):
+    historic_prices = {
+        isin: pd.Series([1.0, 2.0, 3.0], index=pd.date_range(datetime(2001, 1, 1), periods=3, freq="B"))
+        for isin in ["isin1", "isin2", "isin3"]
+    }
+    streamed = []
+
+    def mock_stream_funds(isins=None, since=None):
+        streamed.append((None if isins is None else sorted(isins), since))
+        for isin, series in historic_prices.items():
+            if isins is None or isin in isins:
+                yield _stream_entry(isin, series)
+
+    monkeypatch.setattr(fund_cache, "stream_funds", mock_stream_funds)
+    monkeypatch.setattr(fund_cache, "save_to_file", lambda snapshot: None)
+    monkeypatch.setattr(fund_cache, "_snapshot", None)
+    monkeypatch.setattr(fund_cache, "_rolling_corr", None)
+
+    version = fund_cache.version()
+    fund_cache.refresh(["isin1"])
+    assert streamed == [(["isin1"], None)]
+    assert fund_cache.version() == version + 1
+    assert not fund_cache._snapshot.is_full
+
+    # full universe: only funds not cached yet are fetched in full
+    fund_cache.refresh(None)
+    assert fund_cache._snapshot.is_full
+    assert list(fund_cache._snapshot.prices_df.columns) == ["isin1", "isin2", "isin3"]
+    assert streamed[2] == (["isin2", "isin3"], None)
+
+    # small request for a new fund is merged in, without evicting the universe
+    historic_prices["isin4"] = historic_prices["isin1"] * 2
+    streamed.clear()
+    fund_cache.refresh(["isin1", "isin4"])
+    assert streamed == [(["isin4"], None)]  # isin1 is still fresh
+    assert fund_cache._snapshot.is_full
+    assert list(fund_cache._snapshot.funds.keys()) == ["isin1", "isin2", "isin3", "isin4"]
+    assert fund_cache.valid(None)
+
+    # only expired funds are re-fetched
+    expired_times = dict(fund_cache._snapshot.expiration_times, isin2=datetime.now() - timedelta(hours=1))
+    fund_cache._snapshot = fund_cache._snapshot._replace(expiration_times=expired_times)
+    assert not fund_cache.valid(None)
+    assert fund_cache.valid(["isin1", "isin3"])
+    streamed.clear()
+    fund_cache.refresh(["isin1", "isin2"])
+    assert [isins for isins, since in streamed] == [["isin2"]]
+    assert fund_cache.valid(None)
+
+
+def test_refresh_renews_isins_missing_from_stream(monkeypatch):
+    historic_prices = {
+        isin: pd.Series([1.0, 2.0, 3.0], index=pd.date_range(datetime(2001, 1, 1), periods=3, freq="B"))
+        for isin in ["isin1", "isin2"]
+    }
+
+    def mock_stream_funds(isins=None, since=None):
+        for isin, series in historic_prices.items():
+            if isins is None or isin in isins:
+                yield _stream_entry(isin, series)
+
+    monkeypatch.setattr(fund_cache, "stream_funds", mock_stream_funds)
+    monkeypatch.setattr(fund_cache, "save_to_file", lambda snapshot: None)
+    monkeypatch.setattr(fund_cache, "_snapshot", None)
+    monkeypatch.setattr(fund_cache, "_rolling_corr", None)
+    fund_cache.refresh(None)
+
+    # isin2 is no longer returned by the data service
+    del historic_prices["isin2"]
+    expired_times = {isin: datetime.now() - timedelta(hours=1) for isin in ["isin1", "isin2"]}
+    fund_cache._snapshot = fund_cache._snapshot._replace(expiration_times=expired_times)
+    assert not fund_cache.valid(None)
+    fund_cache.refresh(None)
+
+    assert fund_cache.valid(None)
+    assert fund_cache.valid(["isin1", "isin2"])
+    assert list(fund_cache._snapshot.funds.keys()) == ["isin1", "isin2"]
+    assert not fund_cache._snapshot.expired(["isin3"])
+
+
+def test_concurrent_get_coalesces_refresh(monkeypatch):
+    historic_prices = pd.Series([1.0, 2.0, 3.0], index=pd.date_range(datetime(2001, 1, 1), periods=3, freq="B"))
+    release = Event()
+    num_streams = 0
+
+    def mock_stream_funds(isins=None, since=None):
+        nonlocal num_streams
+        num_streams += 1
+        release.wait()
+        for isin in isins:
+            yield _stream_entry(isin, historic_prices)
+
+    monkeypatch.setattr(fund_cache, "stream_funds", mock_stream_funds)
+    monkeypatch.setattr(fund_cache, "save_to_file", lambda snapshot: None)
+    monkeypatch.setattr(fund_cache, "_snapshot", None)
+    monkeypatch.setattr(fund_cache, "_rolling_corr", None)
+    monkeypatch.setattr(fund_cache, "_loaded_from_file", True)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = [executor.submit(fund_cache.get_prices, isins)
+                   for isins in [["isin1", "isin2"], ["isin1", "isin2"], ["isin2"], ["isin1"]]]
+        while len(fund_cache._in_flight) == 0:
+            time.sleep(0.01)
+        release.set()
+        prices = [result.result() for result in results]
+
+    assert num_streams == 1
+    assert list(prices[0].columns) == ["isin1", "isin2"]
+    assert list(prices[3].columns) == ["isin1"]
+
+
+def test_expired_snapshot_served_while_refreshing(monkeypatch):
+    prices_df = pd.DataFrame([[1.0], [2.0]], index=pd.date_range(datetime(2001, 1, 1), periods=2, freq="B"),
+                             columns=["isin1"])
+    stale = fund_cache.Snapshot(funds=FundTable([Fund(isin="isin1")]), prices_df=prices_df, corr_df=prices_df.corr(),
+                                expiration_times={"isin1": datetime.now() - timedelta(hours=1)}, is_full=True)
+    release = Event()
+
+    def mock_refresh(isins, incremental):
+        release.wait()
+        fund_cache._snapshot = stale._replace(expiration_times={"isin1": datetime.now() + timedelta(hours=1)})
+
+    monkeypatch.setattr(fund_cache, "_refresh", mock_refresh)
+    monkeypatch.setattr(fund_cache, "_snapshot", stale)
+
+    assert fund_cache.get(["isin1"]) == [Fund(isin="isin1")]  # does not block on the refresh
+    assert not fund_cache.valid(["isin1"])
+    future = fund_cache.schedule_refresh(["isin1"])
+    release.set()
+    future.result()
+    assert fund_cache.valid(["isin1"])
+
+
+def _stream_entry(isin: str, historic_prices: pd.Series) -> FundStreamEntry:
+    return FundStreamEntry(fund=Fund(isin=isin),
+                           dates=historic_prices.index.to_numpy(dtype="datetime64[D]"),
+                           prices=historic_prices.to_numpy(dtype=np.float64))
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from lib.fund.fund import Fund, FundHolding, FundIndicators, FundRealTimeDetails
+
+_FLOAT_FIELDS = ("ocf", "amc", "entryCharge", "exitCharge", "bidAskSpread")
+_CATEGORICAL_FIELDS = ("type", "shareClass", "frequency", "asof")
+_EMPTY_REAL_TIME_DETAILS = FundRealTimeDetails.from_dict(dict())
+
+
+class FundTable(Mapping[str, Fund]):
+    """
+    Compact, immutable table of funds by isin, in place of a dict of Funds for caching the whole universe.
+    Scalar fields are stored as columns (None as nan), fields with few distinct values (e.g. frequency, asof)
+    as codes into shared categories, and holdings flattened into columns of interned names and symbols.
+    Funds are only materialised when looked up, so the table takes a fraction of the memory and pickle size.
+    """
+    __slots__ = ("_isins", "_rows", "_names", "_floats", "_codes", "_categories",
+                 "_holding_offsets", "_holding_codes", "_holding_weights", "_strings",
+                 "_return_keys", "_returns", "_has_returns", "_none_returns", "_indicators", "_real_time_details")
+
+    def __init__(self, funds: Iterable[Fund] = ()):
+        funds = list(funds)
+        self._isins: List[str] = [fund.isin for fund in funds]
+        self._rows: Dict[str, int] = {isin: row for row, isin in enumerate(self._isins)}
+        self._names: List[Optional[str]] = [fund.name for fund in funds]
+        self._floats = np.array([[np.nan if getattr(fund, field) is None else getattr(fund, field)
+                                  for field in _FLOAT_FIELDS] for fund in funds],
+                                dtype=np.float64).reshape(len(funds), len(_FLOAT_FIELDS))
+        codes, self._categories = zip(*[_encode([getattr(fund, field) for fund in funds])
+                                        for field in _CATEGORICAL_FIELDS])
+        self._codes = np.array(codes, dtype=np.int32).reshape(len(_CATEGORICAL_FIELDS), len(funds))
+
+        holdings = [holding for fund in funds for holding in fund.holdings]
+        self._holding_offsets = np.cumsum([0] + [len(fund.holdings) for fund in funds], dtype=np.int64)
+        holding_codes, self._strings = _encode([holding.name for holding in holdings]
+                                               + [holding.symbol for holding in holdings])
+        self._holding_codes = holding_codes.reshape(2, len(holdings))
+        self._holding_weights = np.array([holding.weight for holding in holdings], dtype=np.float64)
+
+        self._return_keys: List[str] = list(dict.fromkeys(key for fund in funds for key in fund.returns))
+        self._returns = np.full((len(funds), len(self._return_keys)), np.nan)
+        self._has_returns = np.zeros((len(funds), len(self._return_keys)), dtype=bool)
+        # None returns are kept apart from nan, which the data service can't send
+        self._none_returns = np.zeros((len(funds), len(self._return_keys)), dtype=bool)
+        columns = {key: column for column, key in enumerate(self._return_keys)}
+        for row, fund in enumerate(funds):
+            for key, value in fund.returns.items():
+                self._has_returns[row, columns[key]] = True
+                if value is None:
+                    self._none_returns[row, columns[key]] = True
+                else:
+                    self._returns[row, columns[key]] = value
+
+        self._indicators: List[Optional[FundIndicators]] = [fund.indicators for fund in funds]
+        # most funds have no real time details, which then share one instance
+        self._real_time_details: List[Optional[FundRealTimeDetails]] = [
+            _EMPTY_REAL_TIME_DETAILS if fund.realTimeDetails == _EMPTY_REAL_TIME_DETAILS else fund.realTimeDetails
+            for fund in funds]
+
+    def __getitem__(self, isin: str) -> Fund:
+        row = self._rows[isin]
+        start, end = self._holding_offsets[row], self._holding_offsets[row + 1]
+        # plain python values, converting one row at a time is much faster than element by element
+        fields: Dict[str, Any] = {field: _to_optional_float(value)
+                                  for field, value in zip(_FLOAT_FIELDS, self._floats[row].tolist())}
+        fields.update({field: _decode(code, categories)
+                       for field, code, categories in zip(_CATEGORICAL_FIELDS, self._codes[:, row].tolist(),
+                                                          self._categories)})
+        return Fund(
+            isin=isin,
+            name=self._names[row],
+            holdings=[FundHolding(name=self._strings[name_code], symbol=self._strings[symbol_code], weight=weight)
+                      for name_code, symbol_code, weight in zip(self._holding_codes[0, start:end].tolist(),
+                                                                self._holding_codes[1, start:end].tolist(),
+                                                                self._holding_weights[start:end].tolist())],
+            returns={key: None if none else value
+                     for key, value, present, none in zip(self._return_keys, self._returns[row].tolist(),
+                                                          self._has_returns[row].tolist(),
+                                                          self._none_returns[row].tolist())
+                     if present},
+            indicators=self._indicators[row],
+            realTimeDetails=self._real_time_details[row],
+            **fields)
+
+    def __contains__(self, isin: object) -> bool:
+        return isin in self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._isins)
+
+    def __len__(self) -> int:
+        return len(self._isins)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # rows are rebuilt from isins on load
+        return {slot: getattr(self, slot) for slot in self.__slots__ if slot != "_rows"}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self._rows = {isin: row for row, isin in enumerate(self._isins)}
+
+    def get_field(self, isin: str, field: str) -> Any:
+        """
+        Returns a field of the fund with isin, without materialising the whole fund where possible.
+        :param isin: isin of the fund
+        :param field: name of the Fund field
+        :return: same as getattr(self[isin], field)
+        """
+        row = self._rows[isin]
+        if field in _FLOAT_FIELDS:
+            return _to_optional_float(self._floats[row, _FLOAT_FIELDS.index(field)].item())
+        if field in _CATEGORICAL_FIELDS:
+            i = _CATEGORICAL_FIELDS.index(field)
+            return _decode(self._codes[i, row].item(), self._categories[i])
+        if field == "name":
+            return self._names[row]
+        return getattr(self[isin], field)
+
+    def updated(self, funds: Iterable[Fund]) -> FundTable:
+        """
+        Returns a copy of this table with funds added, or replacing those with the same isins.
+        """
+        updates = {fund.isin: fund for fund in funds}
+        return FundTable([updates.pop(isin) if isin in updates else self[isin] for isin in self._isins]
+                         + list(updates.values()))
+
+
+def _encode(values: List[Any]) -> Tuple[np.ndarray, List[Any]]:
+    """
+    Codes of values into the list of their distinct values (-1 for None), so that equal values are stored once.
+    """
+    categories: Dict[Hashable, int] = dict()
+    codes = np.array([-1 if value is None else categories.setdefault(value, len(categories)) for value in values],
+                     dtype=np.int32)
+    return codes, list(categories)
+
+
+def _decode(code: int, categories: List[Any]) -> Any:
+    return None if code < 0 else categories[code]
+
+
+def _to_optional_float(value: float) -> Optional[float]:
+    return None if value != value else value  # only nan != nan
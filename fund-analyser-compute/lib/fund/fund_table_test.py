@@ -0,0 +1,94 @@
+import pickle
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, List
+
+import numpy as np
+
+from lib.fund.fund import Fund, FundHolding, FundIndicator, FundRealTimeDetails, FundShareClass, FundType
+from lib.fund.fund_table import FundTable
+from lib.util.logging_utils import log_info
+
+FUNDS = [
+    Fund(isin="isin1", name="Fund 1", type=FundType.OEIC, shareClass=FundShareClass.ACC, frequency="Daily",
+         ocf=0.0006, amc=None, entryCharge=None, exitCharge=0, bidAskSpread=0,
+         holdings=[FundHolding(name="Microsoft Corp", symbol="MSFT:NSQ", weight=0.0364),
+                   FundHolding(name="Apple Inc", symbol="AAPL:NSQ", weight=0.02)],
+         returns={"5Y": 1.096, "1Y": 0.1},
+         asof=datetime(2019, 4, 5, tzinfo=timezone.utc),
+         indicators={"stability": FundIndicator(value=1.974)},
+         realTimeDetails=FundRealTimeDetails(estChange=0.003, ci=(-0.001, 0.007))),
+    Fund(isin="isin2"),
+    Fund.from_dict({"isin": "isin3", "frequency": "Daily", "ocf": 0.01, "asof": "2019-04-05T00:00:00.000Z",
+                    "holdings": [{"name": "Microsoft Corp", "symbol": "MSFT:NSQ", "weight": 0.1}],
+                    "returns": {"1Y": 0.1, "5Y": None}})
+]
+
+
+def test_get():
+    table = FundTable(FUNDS)
+    assert list(table) == ["isin1", "isin2", "isin3"]
+    assert len(table) == 3
+    assert "isin2" in table and "isin4" not in table
+    for fund in FUNDS:
+        assert table[fund.isin] == fund
+        for field in fund._fields:
+            assert table.get_field(fund.isin, field) == getattr(fund, field)
+    assert table.get_field("isin1", "amc") is None
+    assert table["isin3"].returns == {"1Y": 0.1, "5Y": None}
+    assert table.get("isin4") is None
+
+
+def test_updated():
+    table = FundTable(FUNDS[:2]).updated([Fund(isin="isin2", ocf=0.02), FUNDS[2]])
+    assert list(table.values()) == [FUNDS[0], Fund(isin="isin2", ocf=0.02), FUNDS[2]]
+
+
+def test_pickle():
+    table = pickle.loads(pickle.dumps(FundTable(FUNDS)))
+    assert list(table.values()) == FUNDS
+
+
+def _universe(num_funds: int) -> List[Fund]:
+    rng = np.random.default_rng(0)
+    returns_keys = ["5Y", "3Y", "1Y", "6M", "3M", "1M", "2W", "1W", "3D", "1D"]
+    return [Fund.from_dict({
+        "isin": f"GB{i:010d}",
+        "name": f"Fund {i} Accumulation",
+        "type": "OEIC",
+        "shareClass": "Acc",
+        "frequency": "Daily",
+        "ocf": 0.001 * (i % 20),
+        "amc": 0.001 * (i % 15),
+        "entryCharge": 0,
+        "exitCharge": 0,
+        "bidAskSpread": None,
+        "holdings": [{"name": f"Stock {j}", "symbol": f"STK{j}:LSE", "weight": 0.01}
+                     for j in rng.choice(500, 10, replace=False)],
+        "returns": {key: float(rng.normal()) for key in returns_keys},
+        "asof": "2019-04-05T00:00:00.000Z"
+    }) for i in range(num_funds)]
+
+
+def _traced_size(build: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        result = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def test_memory():
+    num_funds = 3000
+    dict_size = _traced_size(lambda: {fund.isin: fund for fund in _universe(num_funds)})
+    table_size = _traced_size(lambda: FundTable(_universe(num_funds)))
+    funds = _universe(num_funds)
+    dict_pickle_size = len(pickle.dumps({fund.isin: fund for fund in funds}))
+    table_pickle_size = len(pickle.dumps(FundTable(funds)))
+    log_info(f"{num_funds} funds take {dict_size} bytes as a dict, {table_size} bytes as a table. "
+             f"Pickled: {dict_pickle_size} bytes as a dict, {table_pickle_size} bytes as a table.")
+    assert table_size < dict_size / 3
+    assert table_pickle_size < dict_pickle_size * 2 / 3
@@ -1,3 +1,5 @@
+from typing import Tuple
+
 import numpy as np
 from overrides import overrides
 
@@ -6,7 +8,7 @@ from lib.fund.fund_utils import calc_fees
 from lib.indicators.indicator import DisplayFormat, Indicator
 
 
-class AfterFeesReturn(Indicator):
+class AfterFeesReturn(Indicator[None]):
     def get_key(self) -> str:
         return "after_fees_return"
 
@@ -28,3 +30,12 @@ class AfterFeesReturn(Indicator):
         returns_per_year = self._fund.returns.get("1Y") or np.nan
         after_fees_return = returns_per_year - fees_per_year
         return FundIndicator(after_fees_return)
+
+    @overrides
+    def init_state(self) -> None:
+        return None
+
+    @overrides
+    def update(self, state: None, new_prices: FundHistoricPrices) -> Tuple[FundIndicator, None]:
+        # independent of prices
+        return self.calc(new_prices), None
@@ -0,0 +1,145 @@
+from typing import Callable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lib.fund.fund import FundHistoricPrices, FundIndicator, FundIndicators
+from lib.indicators.returns import base_ilocs as returns_base_ilocs
+from lib.util.dates import format_date
+from lib.util.logging_utils import log_warning
+from lib.util.maths import format_float
+from lib.util.pandas_utils import pd_offset_from_lookback
+
+try:
+    from rust_indicators import batch_indicators as _rust_batch_indicators
+except ImportError:
+    _rust_batch_indicators = None
+    log_warning("rust_indicators lacks batch_indicators, using the slower NumPy version instead. "
+                "Rebuild the wheels in bin/ with ffi/rust/build")
+
+# columns of batch_indicators(), see ffi/rust/src/batch_indicators.rs
+_NUM_FIXED_COLUMNS = 9
+_NUM_LOOKBACK_COLUMNS = 4
+_NANOS_PER_DAY = 24 * 60 * 60 * 1_000_000_000
+
+
+def calc(historic_prices_list: List[FundHistoricPrices], lookbacks: List[str]) -> List[FundIndicators]:
+    """
+    Computes MDD, MDT, NumBreakouts, Stability, and MaxReturns / MinReturns for each of lookbacks,
+    for many price series in one call (in parallel when rust_indicators supports it).
+    Series that aren't sorted by unique dates or have missing prices are left out
+    (empty dict), for the callers to compute one indicator at a time instead.
+    :param historic_prices_list: list of price series
+    :param lookbacks: lookbacks of MaxReturns / MinReturns
+    :return: indicators by key, for each of historic_prices_list
+    """
+    offsets = [pd_offset_from_lookback(lookback) for lookback in lookbacks]
+    lookbacks = [lookback for lookback, offset in zip(lookbacks, offsets) if offset is not None]
+    offsets = [offset for offset in offsets if offset is not None]
+
+    supported = [i for i, historic_prices in enumerate(historic_prices_list) if _is_supported(historic_prices)]
+    dates = [historic_prices_list[i].index.asi8 for i in supported]
+    prices = [np.ascontiguousarray(historic_prices_list[i].to_numpy(dtype=np.float64)) for i in supported]
+    base_ilocs = [np.array([returns_base_ilocs(historic_prices_list[i].index, offset) for offset in offsets],
+                           dtype=np.int64).reshape(len(offsets), len(historic_prices_list[i]))
+                  for i in supported]
+    batch_indicators = _rust_batch_indicators or _batch_indicators
+    rows = batch_indicators(dates, prices, base_ilocs)
+
+    results: List[FundIndicators] = [dict() for _ in historic_prices_list]
+    for i, row in zip(supported, rows):
+        results[i] = _to_indicators(historic_prices_list[i].index, row, lookbacks)
+    return results
+
+
+def _is_supported(historic_prices: FundHistoricPrices) -> bool:
+    return isinstance(historic_prices, pd.Series) \
+           and isinstance(historic_prices.index, pd.DatetimeIndex) \
+           and historic_prices.index.is_monotonic_increasing \
+           and historic_prices.index.is_unique \
+           and not historic_prices.isna().any()
+
+
+def _to_indicators(index: pd.DatetimeIndex, row: np.ndarray, lookbacks: List[str]) -> FundIndicators:
+    def with_date(value: float, iloc: float, to_value=float) -> FundIndicator:
+        return FundIndicator(np.nan) if np.isnan(value) \
+            else FundIndicator(to_value(value), metadata={"date": format_date(index[int(iloc)])})
+
+    mdd, mdd_iloc, mdt, mdt_iloc, num_breakouts, stability, stability_max, stability_min, stability_median \
+        = row[:_NUM_FIXED_COLUMNS]
+    indicators = {
+        "mdd": with_date(mdd, mdd_iloc),
+        "mdt": with_date(mdt, mdt_iloc, to_value=int),
+        "num_breakouts": FundIndicator(0.0 if np.isnan(num_breakouts) else float(num_breakouts)),
+        "stability": FundIndicator(float(stability),
+                                   metadata={
+                                       "max": format_float(stability_max),
+                                       "min": format_float(stability_min),
+                                       "median": format_float(stability_median)
+                                   })
+    }
+    for i, lookback in enumerate(lookbacks):
+        max_returns, max_iloc, min_returns, min_iloc \
+            = row[_NUM_FIXED_COLUMNS + _NUM_LOOKBACK_COLUMNS * i:][:_NUM_LOOKBACK_COLUMNS]
+        indicators[f"returns_{lookback}_max"] = with_date(max_returns, max_iloc)
+        indicators[f"returns_{lookback}_min"] = with_date(min_returns, min_iloc)
+    return indicators
+
+
+def _batch_indicators(dates: List[np.ndarray], prices: List[np.ndarray],
+                      base_ilocs: List[np.ndarray]) -> np.ndarray:
+    """
+    NumPy fallback for rust_indicators.batch_indicators(), one series at a time.
+    """
+    num_lookbacks = len(base_ilocs[0]) if len(base_ilocs) else 0
+    rows = np.full((len(prices), _NUM_FIXED_COLUMNS + _NUM_LOOKBACK_COLUMNS * num_lookbacks), np.nan)
+    for row, series_dates, series_prices, series_base_ilocs in zip(rows, dates, prices, base_ilocs):
+        if len(series_prices):
+            _series_indicators(row, series_dates, series_prices, series_base_ilocs)
+    return rows
+
+
+def _series_indicators(row: np.ndarray, dates: np.ndarray, prices: np.ndarray, base_ilocs: np.ndarray) -> None:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        peaks = np.maximum.accumulate(prices)
+        row[0:2] = _first_extreme(prices / peaks - 1.0, np.nanargmin)
+
+        breakouts = np.flatnonzero(prices[1:] > peaks[:-1]) + 1
+        recoveries = np.concatenate([[0], breakouts, [len(prices) - 1]])
+        downtimes = (dates[recoveries[1:]] - dates[recoveries[:-1]]) // _NANOS_PER_DAY
+        mdt_i = np.argmax(downtimes)
+        row[2:5] = downtimes[mdt_i], recoveries[mdt_i + 1], len(breakouts)
+
+        streaks = _streaks(prices)
+        if len(streaks):
+            row[5:9] = streaks.sum() / len(streaks), streaks.max(), streaks.min(), np.median(streaks)
+
+        for i, lookback_base_ilocs in enumerate(base_ilocs):
+            base_prices = np.where(lookback_base_ilocs >= 0, prices[lookback_base_ilocs], np.nan)
+            returns = (prices - base_prices) / base_prices
+            offset = _NUM_FIXED_COLUMNS + _NUM_LOOKBACK_COLUMNS * i
+            row[offset:offset + 2] = _first_extreme(returns, np.nanargmax)
+            row[offset + 2:offset + 4] = _first_extreme(returns, np.nanargmin)
+
+
+def _first_extreme(arr: np.ndarray, nanargfunc: Callable[[np.ndarray], int]) -> Tuple[float, float]:
+    """
+    Max / min value ignoring nans and its first iloc, or nans if all nan.
+    """
+    if np.isnan(arr).all():
+        return np.nan, np.nan
+    i = nanargfunc(arr)
+    return arr[i], i
+
+
+def _streaks(prices: np.ndarray) -> np.ndarray:
+    """
+    Numbers of consecutive days prices moved in the same direction,
+    where unchanged prices continue the previous direction.
+    """
+    directions = np.sign(np.diff(prices))
+    if not len(directions):
+        return directions
+    directions = directions[np.maximum.accumulate(np.where(directions != 0, np.arange(len(directions)), 0))]
+    turns = np.flatnonzero(directions[1:] * directions[:-1] < 0) + 1
+    return np.diff(np.concatenate([[0], turns, [len(directions)]]))
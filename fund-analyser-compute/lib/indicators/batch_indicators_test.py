@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lib.indicators import batch_indicators
+from lib.indicators.indicators import calc_indicators, get_all_indicators
+from lib.indicators.returns import base_ilocs
+from lib.indicators.returns_test import SAMPLE_HISTORIC_PRICES
+from lib.util import properties
+
+
+def _random_historic_prices(n: int, seed: int) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    dates = np.sort(rng.choice(pd.date_range("2010-01-01", periods=3 * n), n, replace=False))
+    # rounded, so that some prices are unchanged
+    prices = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))), 1)
+    return pd.Series(prices, index=pd.DatetimeIndex(dates, name="date"), name="price")
+
+
+HISTORIC_PRICES_LIST = [
+    SAMPLE_HISTORIC_PRICES,
+    _random_historic_prices(1, seed=0),
+    _random_historic_prices(2, seed=1),
+    _random_historic_prices(500, seed=2),
+    _random_historic_prices(1500, seed=3),
+    pd.Series(index=pd.DatetimeIndex([], name="date"), name="price", dtype=float)
+]
+
+
+def _assert_indicators_equal(actual, expected):
+    assert actual.metadata == expected.metadata
+    assert actual.value == expected.value or (np.isnan(actual.value) and np.isnan(expected.value))
+
+
+def test_calc():
+    lookbacks = properties.get("fund.lookbacks")
+    actual_list = batch_indicators.calc(HISTORIC_PRICES_LIST, lookbacks)
+    for historic_prices, actual in zip(HISTORIC_PRICES_LIST, actual_list):
+        expected = {indicator.get_key(): indicator.calc(historic_prices=historic_prices)
+                    for indicator in get_all_indicators() if indicator.get_key() in actual}
+        assert len(expected) == 4 + 2 * len(lookbacks)
+        for key, indicator in expected.items():
+            _assert_indicators_equal(actual[key], indicator)
+
+
+@pytest.mark.skipif(batch_indicators._rust_batch_indicators is None,
+                    reason="rust_indicators built without batch_indicators, rebuild the wheels with ffi/rust/build")
+def test_rust_batch_indicators():
+    args = ([historic_prices.index.asi8 for historic_prices in HISTORIC_PRICES_LIST],
+            [historic_prices.to_numpy(dtype=np.float64) for historic_prices in HISTORIC_PRICES_LIST],
+            [np.array([base_ilocs(historic_prices.index, pd.DateOffset(months=1))],
+                      dtype=np.int64).reshape(1, len(historic_prices))
+             for historic_prices in HISTORIC_PRICES_LIST])
+    np.testing.assert_array_equal(batch_indicators._rust_batch_indicators(*args),
+                                  batch_indicators._batch_indicators(*args))
+
+
+def test_calc_unsupported():
+    unsorted = SAMPLE_HISTORIC_PRICES.iloc[::-1]
+    missing = SAMPLE_HISTORIC_PRICES.copy()
+    missing.iloc[3] = np.nan
+    assert batch_indicators.calc([unsorted, missing], ["1M"]) == [dict(), dict()]
+
+
+def test_calc_indicators():
+    missing = SAMPLE_HISTORIC_PRICES.copy()
+    missing.iloc[3] = np.nan
+    indicators = get_all_indicators()
+    for historic_prices, actual in zip([SAMPLE_HISTORIC_PRICES, missing],
+                                       calc_indicators([indicators, indicators],
+                                                       [SAMPLE_HISTORIC_PRICES, missing])):
+        assert list(actual) == [indicator.get_key() for indicator in indicators]
+        for indicator in indicators:
+            _assert_indicators_equal(actual[indicator.get_key()], indicator.calc(historic_prices=historic_prices))
@@ -0,0 +1,70 @@
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+import pandas as pd
+
+from lib.indicators import indicator_utils
+from lib.util.logging_utils import log_debug
+
+T = TypeVar('T')
+
+
+class FeatureStore:
+    """
+    Memoises indicator panels (dates x isins) computed over one prices DataFrame,
+    so that strategies and tie breakers asking for the same (indicator, params) share one computation.
+    Panels are shared between callers and must not be modified.
+    """
+
+    def __init__(self, prices_df: pd.DataFrame):
+        self.prices_df = prices_df
+        self.hits = 0
+        self.misses = 0
+        self._panels: Dict[Hashable, Any] = dict()
+
+    def get(self, key: Hashable, compute: Callable[[], T]) -> T:
+        """
+        Returns the panel stored under key, computing it first if missing.
+        :param key: indicator name and params
+        :param compute: computes the panel over prices_df
+        :return: panel
+        """
+        if key in self._panels:
+            self.hits += 1
+        else:
+            self.misses += 1
+            log_debug(f"Feature store miss: {key} (hits: {self.hits}, misses: {self.misses}).")
+            self._panels[key] = compute()
+        return self._panels[key]
+
+    def smoothed_prices(self, timeperiod: int) -> pd.DataFrame:
+        return self.get(("smoothed_prices", timeperiod),
+                        lambda: self.prices_df.rolling(timeperiod).mean())
+
+    def support_resistance(self, smoothing: Optional[int] = None) \
+            -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """
+        support_resistance() of prices, or of their rolling mean over smoothing periods if supplied.
+        """
+        return self.get(("support_resistance", smoothing),
+                        lambda: indicator_utils.support_resistance(
+                            self.prices_df if smoothing is None else self.smoothed_prices(smoothing)))
+
+    def price_channels(self, timeperiod: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        return self.get(("price_channels", timeperiod),
+                        lambda: indicator_utils.price_channels(self.prices_df, timeperiod=timeperiod))
+
+    def bollinger_bands(self, timeperiod: int = 5, stdev: int = 1) \
+            -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        return self.get(("bollinger_bands", timeperiod, stdev),
+                        lambda: indicator_utils.bollinger_bands(self.prices_df, timeperiod=timeperiod, stdev=stdev))
+
+    def adx(self, timeperiod: int = 14) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        return self.get(("adx", timeperiod),
+                        lambda: indicator_utils.adx(self.prices_df, timeperiod=timeperiod))
+
+    def ppo(self, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        return self.get(("ppo", fast, slow, signal),
+                        lambda: indicator_utils.ppo(self.prices_df, fast=fast, slow=slow, signal=signal))
+
+    def pct_change(self) -> pd.DataFrame:
+        return self.get(("pct_change",), lambda: self.prices_df.pct_change())
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from lib.indicators.feature_store import FeatureStore
+from lib.indicators.indicator_utils import price_channels, support_resistance
+
+
+def test_get():
+    features = FeatureStore(pd.DataFrame())
+    num_computed = 0
+
+    def compute() -> int:
+        nonlocal num_computed
+        num_computed += 1
+        return num_computed
+
+    assert features.get(("key", 1), compute) == 1
+    assert features.get(("key", 1), compute) == 1
+    assert features.get(("key", 2), compute) == 2
+    assert (features.hits, features.misses) == (1, 2)
+
+
+def test_panels():
+    prices_df = pd.DataFrame(np.cumsum(np.random.default_rng(0).normal(size=(100, 3)), axis=0) + 100,
+                             index=pd.date_range("2001-01-01", periods=100, freq="B"),
+                             columns=["isin1", "isin2", "isin3"])
+    features = FeatureStore(prices_df)
+
+    for actual, expected in zip(features.price_channels(20), price_channels(prices_df, timeperiod=20)):
+        assert_frame_equal(actual, expected)
+    assert features.price_channels(20) is features.price_channels(20)
+
+    for actual, expected in zip(features.support_resistance(smoothing=14),
+                                support_resistance(prices_df.rolling(14).mean())):
+        assert_frame_equal(actual, expected)
+    assert features.smoothed_prices(14) is features.smoothed_prices(14)
+    assert (features.hits, features.misses) == (4, 3)
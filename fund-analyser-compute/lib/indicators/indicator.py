@@ -1,15 +1,20 @@
 from abc import ABC, abstractmethod
 from enum import Enum
+from typing import Generic, Tuple, TypeVar, cast
+
+import pandas as pd
 
 from lib.fund.fund import FundHistoricPrices, FundIndicator
 
+S = TypeVar("S")  # state of update()
+
 
 class DisplayFormat(Enum):
     DEFAULT = "default"
     PERCENT = "percent"
 
 
-class Indicator(ABC):
+class Indicator(ABC, Generic[S]):
     @abstractmethod
     def get_key(self) -> str:
         pass
@@ -24,3 +29,23 @@ class Indicator(ABC):
     @abstractmethod
     def calc(self, historic_prices: FundHistoricPrices) -> FundIndicator:
         pass
+
+    def init_state(self) -> S:
+        """
+        State of update() before any prices.
+        States are immutable and picklable, so they can be persisted between updates.
+        By default, the state is the whole price history.
+        """
+        return cast(S, pd.Series(index=pd.DatetimeIndex([], name="date"), name="price", dtype=float))
+
+    def update(self, state: S, new_prices: FundHistoricPrices) -> Tuple[FundIndicator, S]:
+        """
+        Computes the indicator over all prices seen so far, processing only new_prices where possible.
+        The result is identical to calc() of the whole price history.
+        :param state: init_state(), or the state returned by the previous update()
+        :param new_prices: prices dated after those already seen
+        :return: indicator, state for the next update()
+        """
+        history = cast(FundHistoricPrices, state)
+        historic_prices = pd.concat([history, new_prices]) if len(history) else new_prices
+        return self.calc(historic_prices), cast(S, historic_prices)
@@ -1,4 +1,4 @@
-from typing import Tuple
+from typing import Callable, List, Tuple
 
 import numpy as np
 import pandas as pd
@@ -10,49 +10,32 @@ from lib.util.pandas_utils import take_nan
 
 
 def bollinger_bands(prices_df: pd.DataFrame, timeperiod=5, stdev=1) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    prices_arr = prices_df.to_numpy()
-    upper_band, middle_band, lower_band = \
-        np.empty_like(prices_arr), np.empty_like(prices_arr), np.empty_like(prices_arr)
-    for col in range(prices_arr.shape[1]):
-        try:
-            upper_band[:, col], middle_band[:, col], lower_band[:, col] = talib.BBANDS(prices_arr[:, col],
-                                                                                       timeperiod=timeperiod,
-                                                                                       nbdevup=stdev, nbdevdn=stdev,
-                                                                                       matype=MA_Type.SMA)
-        except:
-            upper_band[:, col], middle_band[:, col], lower_band[:, col] = np.nan, np.nan, np.nan
-    return (pd.DataFrame(upper_band, dtype=prices_arr.dtype, index=prices_df.index, columns=prices_df.columns),
-            pd.DataFrame(middle_band, dtype=prices_arr.dtype, index=prices_df.index, columns=prices_df.columns),
-            pd.DataFrame(lower_band, dtype=prices_arr.dtype, index=prices_df.index, columns=prices_df.columns))
+    upper_band, middle_band, lower_band = _talib_by_column(
+        prices_df,
+        lambda series: talib.BBANDS(series, timeperiod=timeperiod, nbdevup=stdev, nbdevdn=stdev, matype=MA_Type.SMA),
+        num_outputs=3)
+    return upper_band, middle_band, lower_band
 
 
 def adx(prices_df: pd.DataFrame, timeperiod=14) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    prices_arr = prices_df.to_numpy()
-    adxs, plus_dis, minus_dis = \
-        np.empty_like(prices_arr), np.empty_like(prices_arr), np.empty_like(prices_arr)
-    for col in range(prices_arr.shape[1]):
-        series = prices_arr[:, col]
-        adxs[:, col] = talib.ADX(high=series, low=series, close=series, timeperiod=timeperiod)
-        plus_dis[:, col] = talib.PLUS_DI(high=series, low=series, close=series, timeperiod=timeperiod)
-        minus_dis[:, col] = talib.MINUS_DI(high=series, low=series, close=series, timeperiod=timeperiod)
-    return (pd.DataFrame(adxs, dtype=prices_arr.dtype, index=prices_df.index, columns=prices_df.columns),
-            pd.DataFrame(plus_dis, dtype=prices_arr.dtype, index=prices_df.index, columns=prices_df.columns),
-            pd.DataFrame(minus_dis, dtype=prices_arr.dtype, index=prices_df.index, columns=prices_df.columns))
+    adxs, plus_dis, minus_dis = _talib_by_column(
+        prices_df,
+        lambda series: (talib.ADX(high=series, low=series, close=series, timeperiod=timeperiod),
+                        talib.PLUS_DI(high=series, low=series, close=series, timeperiod=timeperiod),
+                        talib.MINUS_DI(high=series, low=series, close=series, timeperiod=timeperiod)),
+        num_outputs=3)
+    return adxs, plus_dis, minus_dis
 
 
 def ppo(prices_df: pd.DataFrame, fast=12, slow=26, signal=9) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    prices_arr = prices_df.to_numpy()
-    ppos, pposignals = np.empty_like(prices_arr), np.empty_like(prices_arr)
-    for col in range(prices_arr.shape[1]):
-        ppos[:, col] = talib.PPO(prices_arr[:, col], fastperiod=fast, slowperiod=slow, matype=MA_Type.EMA)
-        try:
-            pposignals[:, col] = talib.EMA(ppo, timeperiod=signal)
-        except:
-            pposignals[:, col] = np.nan
+    [ppos] = _talib_by_column(
+        prices_df,
+        lambda series: (talib.PPO(series, fastperiod=fast, slowperiod=slow, matype=MA_Type.EMA),),
+        num_outputs=1)
+    # signal line (and hence histogram) is all nan, as the signal EMA has never been applied to the ppo values
+    pposignals = pd.DataFrame(np.nan, index=prices_df.index, columns=prices_df.columns)
     ppohists = ppos - pposignals
-    return (pd.DataFrame(ppos, dtype=prices_arr.dtype, index=prices_df.index, columns=prices_df.columns),
-            pd.DataFrame(pposignals, dtype=prices_arr.dtype, index=prices_df.index, columns=prices_df.columns),
-            pd.DataFrame(ppohists, dtype=prices_arr.dtype, index=prices_df.index, columns=prices_df.columns))
+    return ppos, pposignals, ppohists
 
 
 def support_resistance(prices_df: pd.DataFrame) -> \
@@ -79,13 +62,25 @@ def stability(prices_df: pd.DataFrame) -> pd.Series:
 
 
 def momentum(prices_df: pd.DataFrame, timeperiod=10) -> pd.DataFrame:
-    prices_arr = prices_df.to_numpy()
-    moms = np.empty_like(prices_arr)
-    for col in range(prices_arr.shape[1]):
-        moms[:, col] = talib.MOM(prices_arr[:, col], timeperiod=timeperiod)
-    return pd.DataFrame(moms, dtype=prices_arr.dtype, index=prices_df.index,
-                        columns=prices_df.columns) / prices_df.shift(timeperiod)
+    shifted_prices_df = prices_df.shift(timeperiod)
+    # talib.MOM
+    moms = prices_df - shifted_prices_df
+    return moms / shifted_prices_df
 
 
 def price_channels(prices_df: pd.DataFrame, timeperiod=25) -> Tuple[pd.DataFrame, pd.DataFrame]:
     return prices_df.rolling(timeperiod).min().shift(), prices_df.rolling(timeperiod).max().shift()
+
+
+def _talib_by_column(prices_df: pd.DataFrame, func: Callable[[np.ndarray], Tuple[np.ndarray, ...]],
+                     num_outputs: int) -> List[pd.DataFrame]:
+    """
+    Applies talib func to every column, giving nan for columns without any prices (which talib rejects).
+    Prices are copied into one column-major block first, so that talib reads each column contiguously.
+    """
+    prices_arr = np.asfortranarray(prices_df.to_numpy(dtype=np.float64))
+    outputs = [np.full(prices_arr.shape, np.nan, order="F") for _ in range(num_outputs)]
+    for col in np.flatnonzero(~np.isnan(prices_arr).all(axis=0)):
+        for output, values in zip(outputs, func(prices_arr[:, col])):
+            output[:, col] = values
+    return [pd.DataFrame(output, index=prices_df.index, columns=prices_df.columns) for output in outputs]
@@ -2,9 +2,33 @@ from datetime import date
 
 import numpy as np
 import pandas as pd
+import pytest
+import talib
 from pandas._testing import assert_frame_equal, assert_series_equal
+from talib import MA_Type
 
-from lib.indicators.indicator_utils import stability, support_resistance
+from lib.indicators.indicator_utils import adx, bollinger_bands, momentum, ppo, stability, support_resistance
+
+
+@pytest.fixture
+def prices_df() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (300, 6)), axis=0))
+    prices[:37, 1] = np.nan  # late start
+    prices[:290, 2] = np.nan  # too short for any indicator
+    prices[100:200, 3] = prices[99, 3]  # constant
+    prices[:, 4] = np.nan  # no prices
+    return pd.DataFrame(prices,
+                        index=pd.date_range(date(2001, 1, 1), periods=300),
+                        columns=[f"isin{i}" for i in range(6)])
+
+
+def _talib_by_column(prices_df: pd.DataFrame, func) -> pd.DataFrame:
+    def apply(col: pd.Series) -> np.ndarray:
+        values = col.to_numpy()
+        return np.full(len(values), np.nan) if np.isnan(values).all() else func(values)
+
+    return prices_df.apply(apply)
 
 
 def test_support_resistance():
@@ -102,3 +126,37 @@ def test_stability():
     expected = pd.Series([0.25, 0.25], index=["isin1", "isin2"])
     actual = stability(prices_df)
     assert_series_equal(actual, expected)
+
+
+@pytest.mark.parametrize("timeperiod,stdev", [(5, 1), (20, 2)])
+def test_bollinger_bands(prices_df, timeperiod, stdev):
+    actual = bollinger_bands(prices_df, timeperiod=timeperiod, stdev=stdev)
+    for k in range(3):
+        expected = _talib_by_column(prices_df, lambda values: talib.BBANDS(
+            values, timeperiod=timeperiod, nbdevup=stdev, nbdevdn=stdev, matype=MA_Type.SMA)[k])
+        assert_frame_equal(actual[k], expected, check_exact=True)
+
+
+def test_adx(prices_df):
+    adxs, plus_dis, minus_dis = adx(prices_df)
+    assert_frame_equal(adxs, _talib_by_column(prices_df, lambda values: talib.ADX(values, values, values)),
+                       check_exact=True)
+    assert_frame_equal(plus_dis, _talib_by_column(prices_df, lambda values: talib.PLUS_DI(values, values, values)),
+                       check_exact=True)
+    assert_frame_equal(minus_dis, _talib_by_column(prices_df, lambda values: talib.MINUS_DI(values, values, values)),
+                       check_exact=True)
+
+
+@pytest.mark.parametrize("fast,slow", [(12, 26), (3, 6)])
+def test_ppo(prices_df, fast, slow):
+    ppos, pposignals, ppohists = ppo(prices_df, fast=fast, slow=slow)
+    expected_ppos = _talib_by_column(prices_df, lambda values: talib.PPO(
+        values, fastperiod=fast, slowperiod=slow, matype=MA_Type.EMA))
+    assert_frame_equal(ppos, expected_ppos, check_exact=True)
+    assert pposignals.isna().all(axis=None)
+    assert ppohists.isna().all(axis=None)
+
+
+def test_momentum(prices_df):
+    expected = _talib_by_column(prices_df, lambda values: talib.ROCR(values, timeperiod=10)) - 1
+    assert_frame_equal(momentum(prices_df), expected)
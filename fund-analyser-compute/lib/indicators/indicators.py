@@ -1,9 +1,11 @@
 from functools import lru_cache
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
-from lib.fund.fund import Fund
+from lib.fund.fund import Fund, FundHistoricPrices, FundIndicators
+from lib.indicators import batch_indicators
 from lib.indicators.indicator import Indicator
 from lib.indicators.mdt import MDT
+from lib.indicators.returns import calc_returns
 from lib.util import properties
 
 
@@ -17,7 +19,8 @@ def get_all_indicators() -> List[Indicator]:
     from .returns import MaxReturns, MinReturns
     from .rsi import RSI
     lookbacks = properties.get("fund.lookbacks")
-    return [MDD(), MDT(), NumBreakouts(), PPO(), RSI(), SharpeRatio(), Stability()] \
+    indicators: List[Indicator] = [MDD(), MDT(), NumBreakouts(), PPO(), RSI(), SharpeRatio(), Stability()]
+    return indicators \
            + [MaxReturns(lookback) for lookback in lookbacks] \
            + [MinReturns(lookback) for lookback in lookbacks]
 
@@ -29,3 +32,40 @@ def get_all_fund_indicators(fund: Fund) -> List[Indicator]:
 
 def get_all_stock_indicators() -> List[Indicator]:
     return get_all_indicators()
+
+
+def calc_indicators(indicators_list: List[List[Indicator]], historic_prices_list: List[FundHistoricPrices]) \
+        -> List[FundIndicators]:
+    """
+    Computes indicators for each of historic_prices_list, computing those supported by batch_indicators
+    for all series in one call and the rest one at a time.
+    :param indicators_list: indicators to compute, for each of historic_prices_list
+    :param historic_prices_list: list of price series
+    :return: indicators by key, in the order of indicators, for each of historic_prices_list
+    """
+    lookbacks = properties.get("fund.lookbacks")
+    batched_list = batch_indicators.calc(historic_prices_list, lookbacks)
+    # returns over all lookbacks in one go, for series batch_indicators leaves out
+    batched_list = [batched or calc_returns(historic_prices, lookbacks)
+                    for historic_prices, batched in zip(historic_prices_list, batched_list)]
+    return [{indicator.get_key(): batched[indicator.get_key()] if indicator.get_key() in batched
+             else indicator.calc(historic_prices=historic_prices)
+             for indicator in indicators}
+            for indicators, historic_prices, batched in zip(indicators_list, historic_prices_list, batched_list)]
+
+
+def update_indicators(indicators: List[Indicator], states: Optional[Dict[str, Any]],
+                      new_prices: FundHistoricPrices) -> Tuple[FundIndicators, Dict[str, Any]]:
+    """
+    Incrementally computes indicators from their states before new_prices, see Indicator.update().
+    :param indicators: indicators to compute
+    :param states: states by indicator key returned by the previous call, or None to start afresh
+    :param new_prices: prices dated after those already seen
+    :return: indicators by key, states by indicator key for the next call
+    """
+    results, new_states = dict(), dict()
+    for indicator in indicators:
+        key = indicator.get_key()
+        state = indicator.init_state() if states is None or key not in states else states[key]
+        results[key], new_states[key] = indicator.update(state, new_prices)
+    return results, new_states
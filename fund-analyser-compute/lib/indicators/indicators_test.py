@@ -0,0 +1,45 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lib.fund.fund import Fund
+from lib.indicators.batch_indicators_test import _random_historic_prices
+from lib.indicators.indicators import get_all_fund_indicators, update_indicators
+from lib.indicators.returns_test import SAMPLE_HISTORIC_PRICES
+
+
+def _with_missing(historic_prices: pd.Series, ilocs) -> pd.Series:
+    historic_prices = historic_prices.copy()
+    historic_prices.iloc[ilocs] = np.nan
+    return historic_prices
+
+
+def _with_flat(historic_prices: pd.Series, start: int, end: int) -> pd.Series:
+    historic_prices = historic_prices.copy()
+    historic_prices.iloc[start:end] = historic_prices.iloc[start - 1]
+    return historic_prices
+
+
+@pytest.mark.parametrize("historic_prices", [
+    SAMPLE_HISTORIC_PRICES,
+    _random_historic_prices(2, seed=1),
+    _random_historic_prices(40, seed=2),
+    _random_historic_prices(1200, seed=3),
+    _with_missing(_random_historic_prices(300, seed=4), [1, 2, 3]),
+    _with_missing(_random_historic_prices(300, seed=5), [50, 120]),
+    _with_flat(_random_historic_prices(300, seed=6), 100, 140)
+])
+@pytest.mark.parametrize("splits", [[], [1], [5, 6, 7], [30, 100, 101, 250]])
+def test_update_indicators(historic_prices, splits):
+    indicators = get_all_fund_indicators(Fund(isin="isin", ocf=0.01, returns={"1Y": 0.1}))
+    bounds = [0] + [split for split in splits if split < len(historic_prices)] + [len(historic_prices)]
+    states = None
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        actual, states = update_indicators(indicators, states, historic_prices.iloc[start:end])
+        states = pickle.loads(pickle.dumps(states))
+        for indicator in indicators:
+            expected = indicator.calc(historic_prices=historic_prices.iloc[:end])
+            assert actual[indicator.get_key()].metadata == expected.metadata
+            np.testing.assert_equal(actual[indicator.get_key()].value, expected.value)
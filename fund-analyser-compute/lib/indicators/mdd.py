@@ -1,4 +1,7 @@
+from typing import NamedTuple, Optional, Tuple
+
 import numpy as np
+import pandas as pd
 from ffn.core import to_drawdown_series
 from overrides import overrides
 
@@ -7,7 +10,13 @@ from lib.indicators.indicator import DisplayFormat, Indicator
 from lib.util.dates import format_date
 
 
-class MDD(Indicator):
+class MDDState(NamedTuple):
+    peak: float = -np.inf  # highest price so far
+    mdd: float = np.nan
+    date: Optional[pd.Timestamp] = None
+
+
+class MDD(Indicator[MDDState]):
     def get_key(self) -> str:
         return "mdd"
 
@@ -26,3 +35,24 @@ class MDD(Indicator):
             return FundIndicator(drawdown_series[date], metadata={"date": format_date(date)})
         except:
             return FundIndicator(np.nan)
+
+    @overrides
+    def init_state(self) -> MDDState:
+        return MDDState()
+
+    @overrides
+    def update(self, state: MDDState, new_prices: FundHistoricPrices) -> Tuple[FundIndicator, MDDState]:
+        prices = new_prices.to_numpy(dtype=np.float64)
+        if len(prices):
+            # missing prices carry the previous drawdown, which can't be a new (first) min
+            peaks = np.fmax.accumulate(np.concatenate([[state.peak], prices]))[1:]
+            with np.errstate(invalid="ignore"):
+                drawdowns = prices / peaks - 1.0
+            if not np.isnan(drawdowns).all():
+                i = np.nanargmin(drawdowns)
+                if np.isnan(state.mdd) or drawdowns[i] < state.mdd:
+                    state = state._replace(mdd=drawdowns[i], date=new_prices.index[i])
+            state = state._replace(peak=peaks[-1])
+        if state.date is None:
+            return FundIndicator(np.nan), state
+        return FundIndicator(state.mdd, metadata={"date": format_date(state.date)}), state
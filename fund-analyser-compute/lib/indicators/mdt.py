@@ -1,4 +1,7 @@
+from typing import NamedTuple, Optional, Tuple, cast
+
 import numpy as np
+import pandas as pd
 from overrides import overrides
 from pandas import DatetimeIndex
 
@@ -7,8 +10,16 @@ from lib.indicators.indicator import DisplayFormat, Indicator
 from lib.util.dates import format_date
 
 
+class MDTState(NamedTuple):
+    peak: float = np.nan  # highest price so far
+    recovery_date: Optional[pd.Timestamp] = None  # date of the first price or the latest new high
+    last_date: Optional[pd.Timestamp] = None  # date of the latest price
+    mdt: Optional[pd.Timedelta] = None  # longest downtime ended by a new high
+    date: Optional[pd.Timestamp] = None
+
+
 # Max downtime
-class MDT(Indicator):
+class MDT(Indicator[MDTState]):
     def get_key(self) -> str:
         return "mdt"
 
@@ -34,3 +45,32 @@ class MDT(Indicator):
             return FundIndicator(mdt, metadata={"date": format_date(date)})
         except:
             return FundIndicator(np.nan)
+
+    @overrides
+    def init_state(self) -> MDTState:
+        return MDTState()
+
+    @overrides
+    def update(self, state: MDTState, new_prices: FundHistoricPrices) -> Tuple[FundIndicator, MDTState]:
+        new_prices = new_prices.dropna()
+        if len(new_prices) and state.recovery_date is None:
+            state = state._replace(peak=new_prices.iloc[0], recovery_date=new_prices.index[0])
+        if len(new_prices):
+            prices = new_prices.to_numpy(dtype=np.float64)
+            peaks = np.maximum.accumulate(np.concatenate([[state.peak], prices]))
+            new_highs = new_prices.index[prices > peaks[:-1]]
+            if len(new_highs):
+                recovery_dates = new_highs.insert(0, state.recovery_date)
+                recovery_times = recovery_dates[1:] - recovery_dates[:-1]
+                i = recovery_times.argmax()
+                if state.mdt is None or recovery_times[i] > state.mdt:
+                    state = state._replace(mdt=recovery_times[i], date=recovery_dates[i + 1])
+                state = state._replace(recovery_date=new_highs[-1])
+            state = state._replace(peak=peaks[-1], last_date=new_prices.index[-1])
+        if state.recovery_date is None:
+            return FundIndicator(np.nan), state
+        # the downtime since the latest new high only counts if it's strictly the longest
+        mdt, date = state.mdt, state.date
+        if mdt is None or state.last_date - state.recovery_date > mdt:
+            mdt, date = state.last_date - state.recovery_date, state.last_date
+        return FundIndicator(mdt.days, metadata={"date": format_date(cast(pd.Timestamp, date))}), state
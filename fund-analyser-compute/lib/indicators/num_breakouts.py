@@ -1,10 +1,19 @@
+from typing import NamedTuple, Tuple
+
+import numpy as np
 from overrides import overrides
 
 from lib.fund.fund import FundHistoricPrices, FundIndicator
 from lib.indicators.indicator import DisplayFormat, Indicator
 
 
-class NumBreakouts(Indicator):
+class NumBreakoutsState(NamedTuple):
+    peak: float = np.nan  # highest price so far
+    last_price: float = np.nan
+    num_breakouts: int = 0
+
+
+class NumBreakouts(Indicator[NumBreakoutsState]):
     def get_key(self) -> str:
         return "num_breakouts"
 
@@ -20,3 +29,19 @@ class NumBreakouts(Indicator):
         return FundIndicator(
             float((historic_prices - historic_prices.shift().cummax()).gt(0).sum())
         )
+
+    @overrides
+    def init_state(self) -> NumBreakoutsState:
+        return NumBreakoutsState()
+
+    @overrides
+    def update(self, state: NumBreakoutsState, new_prices: FundHistoricPrices) -> Tuple[FundIndicator, NumBreakoutsState]:
+        prices = new_prices.to_numpy(dtype=np.float64)
+        if len(prices):
+            prev_prices = np.concatenate([[state.last_price], prices[:-1]])
+            peaks = np.fmax.accumulate(np.concatenate([[state.peak], prices]))
+            # as in calc(), a price right after a missing one is never a breakout
+            breakouts = ~np.isnan(prev_prices) & (prices > peaks[:-1])
+            state = NumBreakoutsState(peak=peaks[-1], last_price=prices[-1],
+                                       num_breakouts=state.num_breakouts + int(breakouts.sum()))
+        return FundIndicator(float(state.num_breakouts)), state
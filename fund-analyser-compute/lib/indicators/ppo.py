@@ -1,12 +1,25 @@
+from typing import NamedTuple, Tuple
+
 import numpy as np
 import talib
 from overrides import overrides
+from talib._ta_lib import MA_Type
 
 from lib.fund.fund import FundHistoricPrices, FundIndicator
 from lib.indicators.indicator import Indicator
 
+FAST_PERIOD, SLOW_PERIOD = 12, 26  # talib.PPO defaults
+
+
+class PPOState(NamedTuple):
+    window: Tuple[float, ...] = ()  # latest SLOW_PERIOD - 1 prices, from the first non nan one
+    num_prices: int = 0
+    fast_total: float = 0.0  # running sums, in the same order as talib's
+    slow_total: float = 0.0
+    ppo: float = np.nan
+
 
-class PPO(Indicator):
+class PPO(Indicator[PPOState]):
     def get_key(self) -> str:
         return "ppo"
 
@@ -18,5 +31,37 @@ class PPO(Indicator):
         if historic_prices.empty:
             return FundIndicator(np.nan)
         else:
-            ppo_series = talib.PPO(historic_prices)
+            # simple moving averages, as followed by update()
+            ppo_series = talib.PPO(historic_prices, matype=MA_Type.SMA)
             return FundIndicator(ppo_series.iloc[-1])
+
+    @overrides
+    def init_state(self) -> PPOState:
+        return PPOState()
+
+    @overrides
+    def update(self, state: PPOState, new_prices: FundHistoricPrices) -> Tuple[FundIndicator, PPOState]:
+        """
+        Follows talib.PPO step by step (which skips leading nans), so that results are identical.
+        """
+        window, num_prices, fast_total, slow_total, ppo = state
+        prices = list(window)
+        for price in new_prices.to_numpy(dtype=np.float64):
+            if np.isnan(price) and not num_prices:
+                continue
+            num_prices += 1
+            fast_total += price
+            slow_total += price
+            if num_prices >= FAST_PERIOD:
+                fast = fast_total / FAST_PERIOD
+                fast_total -= prices[-(FAST_PERIOD - 1)]
+            if num_prices >= SLOW_PERIOD:
+                slow = slow_total / SLOW_PERIOD
+                ppo = 0.0 if -1e-8 < slow < 1e-8 else ((fast - slow) / slow) * 100.0
+                slow_total -= prices[0]
+            prices.append(price)
+            if len(prices) >= SLOW_PERIOD:
+                prices.pop(0)
+        state = PPOState(window=tuple(prices), num_prices=num_prices, fast_total=fast_total,
+                          slow_total=slow_total, ppo=ppo)
+        return FundIndicator(ppo), state
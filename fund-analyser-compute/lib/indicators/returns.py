@@ -1,11 +1,12 @@
+import operator
 from datetime import datetime
-from typing import Callable
+from typing import Callable, List, NamedTuple, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from overrides import overrides
 
-from lib.fund.fund import FundHistoricPrices, FundIndicator
+from lib.fund.fund import FundHistoricPrices, FundIndicator, FundIndicators
 from lib.indicators.indicator import DisplayFormat, Indicator
 from lib.util.dates import format_date
 from lib.util.pandas_utils import drop_duplicate_index, pd_offset_from_lookback
@@ -24,7 +25,101 @@ def _reduce_returns(historic_prices_series: FundHistoricPrices, offset: pd.DateO
         return FundIndicator(np.nan)
 
 
-class MaxReturns(Indicator):
+def calc_returns(historic_prices: FundHistoricPrices, lookbacks: List[str]) -> FundIndicators:
+    """
+    Computes MaxReturns and MinReturns for all of lookbacks in one pass per lookback,
+    by binary searching each date's base price in the sorted dates instead of reindexing.
+    Results are identical to MaxReturns(lookback).calc() / MinReturns(lookback).calc().
+    :param historic_prices: price series
+    :param lookbacks: lookbacks of MaxReturns / MinReturns
+    :return: indicators by MaxReturns / MinReturns key
+    """
+    supported = _is_sorted_unique(historic_prices)
+    prices = historic_prices.to_numpy(dtype=np.float64) if supported else None
+    indicators = dict()
+    for lookback in lookbacks:
+        offset = pd_offset_from_lookback(lookback)
+        if prices is None or offset is None:
+            # where only reindexing behaves the same (e.g. unsorted or duplicate dates)
+            max_returns = _reduce_returns(historic_prices, offset, lambda s: s.idxmax())
+            min_returns = _reduce_returns(historic_prices, offset, lambda s: s.idxmin())
+        else:
+            ilocs = base_ilocs(historic_prices.index, offset)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                base_prices = np.where(ilocs >= 0, prices[ilocs], np.nan)
+                returns = (prices - base_prices) / base_prices
+            max_returns = _extreme_returns(historic_prices.index, returns, np.nanargmax)
+            min_returns = _extreme_returns(historic_prices.index, returns, np.nanargmin)
+        indicators[f"returns_{lookback}_max"] = max_returns
+        indicators[f"returns_{lookback}_min"] = min_returns
+    return indicators
+
+
+def _is_sorted_unique(historic_prices: FundHistoricPrices) -> bool:
+    return isinstance(historic_prices, pd.Series) \
+           and isinstance(historic_prices.index, pd.DatetimeIndex) \
+           and historic_prices.index.is_monotonic_increasing \
+           and historic_prices.index.is_unique
+
+
+def _extreme_returns(index: pd.DatetimeIndex, returns: np.ndarray,
+                     nanargfunc: Callable[[np.ndarray], int]) -> FundIndicator:
+    if np.isnan(returns).all():
+        return FundIndicator(np.nan)
+    # first occurrence, as with idxmax() / idxmin()
+    i = nanargfunc(returns)
+    return FundIndicator(returns[i], metadata={"date": format_date(index[i])})
+
+
+def base_ilocs(index: pd.DatetimeIndex, offset: pd.DateOffset) -> np.ndarray:
+    """
+    For each date, the iloc of the price its returns over offset are measured from, or -1 if none.
+    Same as drop_duplicate_index(historic_prices.shift(freq=offset)).reindex(index, method="ffill").
+    """
+    return _base_ilocs((index + offset).asi8, index.asi8)
+
+
+def _base_ilocs(shifted_dates: np.ndarray, dates: np.ndarray) -> np.ndarray:
+    ilocs = shifted_dates.searchsorted(dates, side="right") - 1
+    # dates shifted onto the same date (e.g. month ends) keep the earliest
+    return np.where(ilocs >= 0, shifted_dates.searchsorted(shifted_dates[ilocs], side="left"), -1)
+
+
+class ReturnsState(NamedTuple):
+    # latest prices, from the base price of the latest date, with their dates (+ offset) as ns since epoch
+    dates: np.ndarray = np.array([], dtype=np.int64)
+    shifted_dates: np.ndarray = np.array([], dtype=np.int64)
+    prices: np.ndarray = np.array([], dtype=np.float64)
+    returns: float = np.nan  # max / min returns so far
+    date: Optional[pd.Timestamp] = None
+
+
+def _update_reduced_returns(state: ReturnsState, new_prices: FundHistoricPrices, offset: pd.DateOffset,
+                            nanargfunc: Callable[[np.ndarray], int],
+                            better: Callable[[float, float], bool]) -> Tuple[FundIndicator, ReturnsState]:
+    if len(new_prices):
+        new_values = new_prices.to_numpy(dtype=np.float64)
+        dates = np.concatenate([state.dates, new_prices.index.asi8])
+        shifted_dates = np.concatenate([state.shifted_dates, (new_prices.index + offset).asi8])
+        prices = np.concatenate([state.prices, new_values])
+        new_ilocs = _base_ilocs(shifted_dates, new_prices.index.asi8)
+        with np.errstate(invalid="ignore"):
+            base_prices = np.where(new_ilocs >= 0, prices[new_ilocs], np.nan)
+            new_returns = (new_values - base_prices) / base_prices
+        if not np.isnan(new_returns).all():
+            i = nanargfunc(new_returns)
+            # earlier returns win ties, as with idxmax() / idxmin()
+            if np.isnan(state.returns) or better(new_returns[i], state.returns):
+                state = state._replace(returns=new_returns[i], date=new_prices.index[i])
+        # later dates are measured from the same base price or a later one
+        start = max(new_ilocs[-1], 0)
+        state = state._replace(dates=dates[start:], shifted_dates=shifted_dates[start:], prices=prices[start:])
+    if state.date is None:
+        return FundIndicator(np.nan), state
+    return FundIndicator(state.returns, metadata={"date": format_date(state.date)}), state
+
+
+class MaxReturns(Indicator[ReturnsState]):
     def __init__(self, lookback: str):
         self._lookback = lookback
         self._offset = pd_offset_from_lookback(lookback)
@@ -41,10 +136,18 @@ class MaxReturns(Indicator):
 
     @overrides
     def calc(self, historic_prices: FundHistoricPrices) -> FundIndicator:
-        return _reduce_returns(historic_prices, self._offset, lambda s: s.idxmax())
+        return calc_returns(historic_prices, [self._lookback])[self.get_key()]
+
+    @overrides
+    def init_state(self) -> ReturnsState:
+        return ReturnsState()
+
+    @overrides
+    def update(self, state: ReturnsState, new_prices: FundHistoricPrices) -> Tuple[FundIndicator, ReturnsState]:
+        return _update_reduced_returns(state, new_prices, self._offset, np.nanargmax, operator.gt)
 
 
-class MinReturns(Indicator):
+class MinReturns(Indicator[ReturnsState]):
     def __init__(self, lookback: str):
         self._lookback = lookback
         self._offset = pd_offset_from_lookback(lookback)
@@ -61,4 +164,12 @@ class MinReturns(Indicator):
 
     @overrides
     def calc(self, historic_prices: FundHistoricPrices) -> FundIndicator:
-        return _reduce_returns(historic_prices, self._offset, lambda s: s.idxmin())
+        return calc_returns(historic_prices, [self._lookback])[self.get_key()]
+
+    @overrides
+    def init_state(self) -> ReturnsState:
+        return ReturnsState()
+
+    @overrides
+    def update(self, state: ReturnsState, new_prices: FundHistoricPrices) -> Tuple[FundIndicator, ReturnsState]:
+        return _update_reduced_returns(state, new_prices, self._offset, np.nanargmin, operator.lt)
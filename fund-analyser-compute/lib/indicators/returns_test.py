@@ -2,9 +2,9 @@ import numpy as np
 import pandas as pd
 import pytest
 
-from lib.indicators.returns import MaxReturns, MinReturns
+from lib.indicators.returns import MaxReturns, MinReturns, _reduce_returns, calc_returns
 from lib.util import properties
-from lib.util.pandas_utils import pd_historic_prices_from_json
+from lib.util.pandas_utils import pd_historic_prices_from_json, pd_offset_from_lookback
 
 SAMPLE_HISTORIC_PRICES = pd_historic_prices_from_json([
     {"date": "2017-03-10T00:00:00Z", "price": 486.0},
@@ -75,3 +75,29 @@ def test_returns(lookback: str, expected_max: float, expected_min: float):
         assert np.isnan(actual_max.value)
     else:
         assert actual_max.value == pytest.approx(expected_max, abs=0.01)
+
+
+def _month_end_historic_prices() -> pd.Series:
+    # consecutive dates shifted onto the same month end, e.g. 2017-03-29 and 2017-03-31 + 1M
+    historic_prices = pd.Series(np.linspace(100, 130, 200),
+                                index=pd.date_range("2017-01-01", periods=200, name="date"), name="price")
+    historic_prices.iloc[[5, 60]] = np.nan
+    return historic_prices
+
+
+@pytest.mark.parametrize("historic_prices", [
+    SAMPLE_HISTORIC_PRICES,
+    SAMPLE_HISTORIC_PRICES.iloc[::-1],
+    SAMPLE_HISTORIC_PRICES.iloc[[0, 2, 1, 3]],
+    _month_end_historic_prices(),
+    pd.Series(dtype=float)
+])
+def test_calc_returns(historic_prices: pd.Series):
+    lookbacks = properties.get("fund.lookbacks")
+    actual = calc_returns(historic_prices, lookbacks)
+    for lookback in lookbacks:
+        for key, reduce in [(f"returns_{lookback}_max", lambda s: s.idxmax()),
+                            (f"returns_{lookback}_min", lambda s: s.idxmin())]:
+            expected = _reduce_returns(historic_prices, pd_offset_from_lookback(lookback), reduce)
+            assert actual[key].metadata == expected.metadata
+            np.testing.assert_equal(actual[key].value, expected.value)
@@ -1,3 +1,5 @@
+from typing import NamedTuple, Tuple
+
 import numpy as np
 import talib
 from overrides import overrides
@@ -5,8 +7,17 @@ from overrides import overrides
 from lib.fund.fund import FundHistoricPrices, FundIndicator
 from lib.indicators.indicator import Indicator
 
+TIMEPERIOD = 14  # talib.RSI default
+
+
+class RSIState(NamedTuple):
+    last_price: float = np.nan  # nan until the first price
+    num_changes: int = 0
+    gain: float = 0.0  # sum of gains over the first TIMEPERIOD changes, then Wilder's average
+    loss: float = 0.0
+
 
-class RSI(Indicator):
+class RSI(Indicator[RSIState]):
     def get_key(self) -> str:
         return "rsi"
 
@@ -20,3 +31,33 @@ class RSI(Indicator):
         else:
             rsi_series = talib.RSI(historic_prices)
             return FundIndicator(rsi_series.iloc[-1])
+
+    @overrides
+    def init_state(self) -> RSIState:
+        return RSIState()
+
+    @overrides
+    def update(self, state: RSIState, new_prices: FundHistoricPrices) -> Tuple[FundIndicator, RSIState]:
+        """
+        Follows talib.RSI step by step (which skips leading nans), so that results are identical.
+        """
+        last_price, num_changes, gain, loss = state
+        for price in new_prices.to_numpy(dtype=np.float64):
+            if np.isnan(last_price) and not num_changes:
+                last_price = price
+                continue
+            change, last_price = price - last_price, price
+            num_changes += 1
+            if num_changes > TIMEPERIOD:
+                gain, loss = gain * (TIMEPERIOD - 1), loss * (TIMEPERIOD - 1)
+            if change < 0:
+                loss -= change
+            else:
+                gain += change
+            if num_changes >= TIMEPERIOD:
+                gain, loss = gain / TIMEPERIOD, loss / TIMEPERIOD
+        state = RSIState(last_price=last_price, num_changes=num_changes, gain=gain, loss=loss)
+        if num_changes < TIMEPERIOD:
+            return FundIndicator(np.nan), state
+        total = gain + loss
+        return FundIndicator(0.0 if -1e-8 < total < 1e-8 else 100 * (gain / total)), state
@@ -1,3 +1,6 @@
+from typing import Dict, NamedTuple, Tuple
+
+import numpy as np
 from overrides import overrides
 
 from lib.fund.fund import FundHistoricPrices, FundIndicator
@@ -5,7 +8,15 @@ from lib.indicators.indicator import Indicator
 from lib.util.maths import format_float
 
 
-class Stability(Indicator):
+class StabilityState(NamedTuple):
+    num_prices: int = 0
+    last_price: float = np.nan
+    direction: float = 0.0  # of the last daily return, unchanged prices keeping the previous direction
+    streak: int = 0  # consecutive days in the current direction
+    streak_counts: Dict[int, int] = dict()  # number of (ended) streaks by length
+
+
+class Stability(Indicator[StabilityState]):
     def get_key(self) -> str:
         return "stability"
 
@@ -24,3 +35,50 @@ class Stability(Indicator):
                                  "min": format_float(consecutive_days.min()),
                                  "median": format_float(consecutive_days.median())
                              })
+
+    @overrides
+    def init_state(self) -> StabilityState:
+        return StabilityState()
+
+    @overrides
+    def update(self, state: StabilityState, new_prices: FundHistoricPrices) -> Tuple[FundIndicator, StabilityState]:
+        prices = new_prices.to_numpy(dtype=np.float64)
+        daily_returns = np.diff(np.concatenate([[state.last_price], prices])) if state.num_prices \
+            else np.diff(prices)
+        if len(daily_returns):
+            signs = np.sign(daily_returns)
+            # unchanged prices take the previous sign (including nan, as replace(0, method="ffill") does)
+            ilocs = np.maximum.accumulate(np.where(signs != 0, np.arange(len(signs)), -1))
+            signs = np.where(ilocs >= 0, signs[ilocs], state.direction)
+            prev_signs = np.concatenate([[state.direction], signs[:-1]])
+            with np.errstate(invalid="ignore"):
+                turns = np.flatnonzero(signs * prev_signs < 0)
+            # the current streak continues up to the first turn, which starts a new one
+            streaks = np.diff(np.concatenate([[-state.streak], turns, [len(signs)]]))
+            streak_counts = dict(state.streak_counts)
+            for streak in streaks[:-1]:
+                streak_counts[streak] = streak_counts.get(streak, 0) + 1
+            state = state._replace(direction=signs[-1], streak=int(streaks[-1]), streak_counts=streak_counts)
+        if len(prices):
+            state = state._replace(num_prices=state.num_prices + len(prices), last_price=prices[-1])
+        return self._result(state), state
+
+    @staticmethod
+    def _result(state: StabilityState) -> FundIndicator:
+        streak_counts = dict(state.streak_counts)
+        if state.streak:
+            streak_counts[state.streak] = streak_counts.get(state.streak, 0) + 1
+        if not streak_counts:
+            return FundIndicator(np.nan, metadata={"max": "nan", "min": "nan", "median": "nan"})
+        lengths = np.array(sorted(streak_counts))
+        counts = np.array([streak_counts[length] for length in lengths])
+        num_streaks = counts.sum()
+        # median from the middle one or two streaks by length
+        ends = np.cumsum(counts)
+        middle = lengths[np.searchsorted(ends, [(num_streaks - 1) // 2 + 1, num_streaks // 2 + 1])]
+        return FundIndicator((lengths * counts).sum() / num_streaks,
+                             metadata={
+                                 "max": format_float(lengths[-1]),
+                                 "min": format_float(lengths[0]),
+                                 "median": format_float(middle.mean())
+                             })
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import logging
+import os
 import sys
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date
-from typing import Iterable, List, NamedTuple, Optional
+from functools import partial
+from threading import Lock
+from typing import Dict, Iterable, List, NamedTuple, Optional
 
 import matplotlib
 import matplotlib.pyplot as plt
@@ -13,10 +17,13 @@ from ffn import calc_max_drawdown
 
 from lib.fund import fund_cache
 from lib.fund.fund import Fund
-from lib.fund.fund_utils import calc_fees, calc_returns, calc_sharpe_ratio, DAILY_PLATFORM_FEES
+from lib.fund.fund_utils import calc_fees, calc_sharpe_ratio, DAILY_PLATFORM_FEES
+from lib.indicators.feature_store import FeatureStore
 from lib.simulate.strategy.strategy import Strategy
 from lib.simulate.tiebreaker.tie_breaker import TieBreaker
+from lib.util import properties
 from lib.util.dates import BDAY
+from lib.util.logging_utils import log_debug
 
 pd.set_option('display.max_colwidth', 1000)
 
@@ -27,6 +34,7 @@ class Simulator:
         fees_df: pd.DataFrame
         num_portfolio: int
         hold_interval: pd.DateOffset
+        features: FeatureStore  # indicator panels over prices_df, shared by strategy and tie breaker
 
     class Prediction(NamedTuple):
         date: date
@@ -44,6 +52,7 @@ class Simulator:
     DEFAULT_NUM_PORTFOLIO = 1
     DEFAULT_HOLD_INTERVAL = 5 * BDAY
     DEFAULT_BUY_SELL_GAP = BDAY
+    MULTI_MAX_WORKERS = properties.get("simulate.multi.workers") or os.cpu_count() or 1
 
     def __init__(self,
                  strategy: Strategy,
@@ -74,17 +83,34 @@ class Simulator:
         self._prices_df = fund_cache.get_prices(isins)
         self._fees_df = calc_fees(funds)
         self._last_valid_date = self._prices_df.last_valid_index()
+        self._features = FeatureStore(self._prices_df)
+        self._funds = {fund.isin: fund for fund in funds}
+
+        # array views for the backtest engine
+        self._prices = self._prices_df.to_numpy(dtype=np.float64)
+        self._date_ilocs = {dt: i for i, dt in enumerate(self._prices_df.index)}
+        self._isin_ilocs = {isin: i for i, isin in enumerate(self._prices_df.columns)}
+        self._one_off_fees = self._fees_df["total_one_off_fees"].to_numpy(dtype=np.float64)
+        self._annual_fees = self._fees_df["total_annual_fees"].to_numpy(dtype=np.float64)
+        self._fees_ilocs = {isin: i for i, isin in enumerate(self._fees_df.index)}
+        self._sorted_fees_ilocs = np.argsort(self._fees_df.index.to_numpy(), kind="stable")
+        self._selection: Optional[np.ndarray] = None
+        # strategy and tie breaker output only depends on date, so is shared across runs (and their threads)
+        self._predictions: Dict[pd.Timestamp, Future] = dict()
+        self._lock = Lock()  # guards _predictions and computing _selection
 
         self._broadcast_data(Simulator.Data(
             prices_df=self._prices_df,
             fees_df=self._fees_df,
             num_portfolio=self._num_portfolio,
-            hold_interval=self._hold_interval
+            hold_interval=self._hold_interval,
+            features=self._features
         ))
 
     def _broadcast_data(self, data: Simulator.Data) -> None:
         self._strategy.on_data_ready(data)
         self._tie_breaker.on_data_ready(data)
+        log_debug(f"Feature store hits: {data.features.hits}, misses: {data.features.misses}.")
 
     def run(self,
             start_date: date = (date.today() - pd.DateOffset(years=5)).date(),
@@ -118,21 +144,16 @@ class Simulator:
 
         while dt < end_date:
             trunc_date = dt - self._buy_sell_gap
-            prediction = self.predict(trunc_date)
-            max_funds = prediction.funds
-            max_isins = [fund.isin for fund in max_funds]
+            max_isins = self._select(trunc_date)
 
             curr_hold_interval = self._hold_interval
             # curr_hold_interval = calc_hold_interval(self._prices_df, dt, max_isins, self._hold_interval)
 
-            if len(max_funds):
+            if len(max_isins):
                 next_dt = (dt + curr_hold_interval).date()
-                max_names = [f.name for f in max_funds]
+                max_names = [self._funds[isin].name for isin in max_isins]
 
-                next_return = calc_returns(self._prices_df[max_isins],
-                                           next_dt,
-                                           curr_hold_interval,
-                                           self._fees_df).mean()
+                next_return = self._calc_mean_returns(max_isins, next_dt, curr_hold_interval)
                 account_list.append(
                     AccountRow(dt=next_dt,
                                value=account_list[-1].value * (1 + next_return),
@@ -167,15 +188,100 @@ class Simulator:
             end_date=end_date
         )
 
+    def _select(self, dt: date) -> List[str]:
+        """
+        Runs strategy then tie breaker at dt, looking up the strategy's selection matrix where available.
+        Memoised per date - if another thread is already predicting dt, waits for that instead of predicting again.
+        :param dt: date of prediction
+        :return: selected isins
+        """
+        key = pd.Timestamp(dt)
+        with self._lock:
+            prediction = self._predictions.get(key)
+            owner = prediction is None
+            if prediction is None:
+                prediction = self._predictions[key] = Future()
+        if owner:
+            try:
+                prediction.set_result(self._run_strategy(dt))
+            except Exception as e:
+                with self._lock:
+                    del self._predictions[key]
+                prediction.set_exception(e)
+                raise
+        return list(prediction.result())
+
+    def _run_strategy(self, dt: date) -> List[str]:
+        with self._lock:
+            if self._selection is None:
+                selection_df = self._strategy.run_all(self._prices_df.index, self._prices_df, self._fees_df)
+                self._selection = np.zeros((0, 0), dtype=np.bool_) if selection_df is None \
+                    else selection_df.to_numpy(dtype=np.bool_)
+
+        date_iloc = self._date_ilocs.get(pd.Timestamp(dt)) if len(self._selection) else None
+        if date_iloc is not None:
+            allowed_isins = self._prices_df.columns[self._selection[date_iloc]].tolist()
+        else:
+            allowed_isins = self._strategy.run(dt, self._prices_df, self._fees_df)
+        return list(self._tie_breaker.run(allowed_isins,
+                                          self._num_portfolio,
+                                          dt,
+                                          self._prices_df,
+                                          self._fees_df))
+
+    def _calc_mean_returns(self, isins: List[str], dt: date, duration: pd.DateOffset) -> float:
+        """
+        Array equivalent of calc_returns(self._prices_df[isins], dt, duration, self._fees_df).mean(),
+        gathering the window's first and last prices by position instead of slicing the DataFrame.
+        Returns are summed in the same order as pandas would (over the union of isins and the fees index)
+        so that results match to the last bit.
+        """
+        index = self._prices_df.index
+        start = index.searchsorted(pd.Timestamp(dt - duration), side="left")
+        end = index.searchsorted(pd.Timestamp(dt), side="right")
+        num_bdays = end - start - 1
+        prorated_total_fees = self._one_off_fees + ((1 + self._annual_fees) ** (num_bdays / 252) - 1)
+
+        if end <= start:
+            # no prices in window - returns before fees are 0 for every fund
+            returns_after_fees = 0 - prorated_total_fees
+        else:
+            isin_ilocs = [self._isin_ilocs[isin] for isin in isins]
+            first, last = self._prices[start, isin_ilocs], self._prices[end - 1, isin_ilocs]
+            fees_ilocs = [self._fees_ilocs[isin] for isin in isins]
+            # pandas aligns the returns with the fees, keeping the fees order only if the indices are identical
+            if isins == self._fees_df.index.tolist():
+                union_ilocs = np.arange(len(isins))
+            else:
+                union_ilocs = self._sorted_fees_ilocs
+            returns_after_fees = np.full(len(self._fees_df.index), np.nan)
+            returns_after_fees[fees_ilocs] = (last - first) / first - prorated_total_fees[fees_ilocs]
+            returns_after_fees = returns_after_fees[union_ilocs]
+
+        present = ~np.isnan(returns_after_fees)
+        num_present = present.sum()
+        if not num_present:
+            return np.nan
+        return np.where(present, returns_after_fees, 0).sum() / num_present
+
     def _run_multi(self, start_date: date, end_date: date) -> List[Simulator.Result]:
-        return [
-            self._run_single(start_date=cycle_start_timestamp.date(),
-                             end_date=end_date)
-            for cycle_start_timestamp
-            in pd.date_range(start=start_date,
-                             end=start_date + self._hold_interval,
-                             freq=BDAY)
-        ]
+        """
+        Runs one simulation per start date in [start_date, start_date + hold_interval] across a pool of threads,
+        which share this simulator, including its price arrays and prediction memo.
+        Threads rather than processes, as forking this (multi threaded) server can deadlock,
+        and other start methods would have to pickle the simulator and couldn't share predictions.
+        """
+        start_dates = [cycle_start_timestamp.date()
+                       for cycle_start_timestamp
+                       in pd.date_range(start=start_date,
+                                        end=start_date + self._hold_interval,
+                                        freq=BDAY)]
+        num_workers = min(self.MULTI_MAX_WORKERS, len(start_dates))
+        if num_workers <= 1:
+            return [self._run_single(start_date=dt, end_date=end_date) for dt in start_dates]
+
+        with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="simulator") as executor:
+            return list(executor.map(partial(self._run_single, end_date=end_date), start_dates))
 
     def predict(self, dt: Optional[date] = None) -> Prediction:
         """
@@ -185,13 +291,7 @@ class Simulator:
         """
         if dt is None:
             dt = self._last_valid_date
-        allowed_isins = self._strategy.run(dt, self._prices_df, self._fees_df)
-        max_isins = self._tie_breaker.run(allowed_isins,
-                                          self._num_portfolio,
-                                          dt,
-                                          self._prices_df,
-                                          self._fees_df)
-        return Simulator.Prediction(date=dt, funds=fund_cache.get(max_isins))
+        return Simulator.Prediction(date=dt, funds=fund_cache.get(self._select(dt)))
 
     @classmethod
     def describe_and_plot(cls, results: Iterable[Simulator.Result]) -> None:
@@ -236,3 +336,4 @@ class Simulator:
         max_returns.account.loc[:, ["value"]].plot(title=f"Max returns series. Begin date: {max_returns.start_date}")
 
         plt.show()
+
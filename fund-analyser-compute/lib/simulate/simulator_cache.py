@@ -0,0 +1,74 @@
+import copy
+from collections import OrderedDict
+from threading import Lock
+from typing import FrozenSet, Iterable, NamedTuple, Optional
+
+from lib.fund import fund_cache
+from lib.simulate.simulator import Simulator
+from lib.simulate.strategy.strategy import Strategy
+from lib.util import properties
+from lib.util.logging_utils import log_debug
+
+MAX_SIZE = properties.get("simulate.cache.size") or 16
+
+
+class Key(NamedTuple):
+    strategy: str
+    isins: Optional[FrozenSet[str]]
+    num_portfolio: Optional[int]
+    version: int  # fund cache version the simulator was built from
+
+
+_simulators: "OrderedDict[Key, Simulator]" = OrderedDict()  # least recently used first
+_version: Optional[int] = None  # fund cache version of cached simulators
+_lock = Lock()  # guards the above, never held while building a simulator
+_hits = 0
+_misses = 0
+
+
+def get(strategy: Strategy,
+        isins: Optional[Iterable[str]] = None,
+        num_portfolio: Optional[int] = None) -> Simulator:
+    """
+    Returns a simulator for the given parameters, reusing a previously built one if the fund cache
+    hasn't been refreshed since. Simulators memoise their predictions, so repeated predict() calls are cheap.
+    :param strategy: strategy, identified by its class name
+    :param isins: iterable of isins, in any order
+    :param num_portfolio: number of funds to hold
+    :return: simulator
+    """
+    global _version, _hits, _misses
+    key = Key(strategy=strategy.__class__.__name__,
+              isins=None if isins is None else frozenset(isins),
+              num_portfolio=num_portfolio,
+              version=fund_cache.version())
+    with _lock:
+        if _version != key.version:
+            # fund cache refreshed - existing simulators are stale
+            _simulators.clear()
+            _version = key.version
+        simulator = _simulators.get(key)
+        if simulator is not None:
+            _simulators.move_to_end(key)
+            _hits += 1
+            return simulator
+        _misses += 1
+
+    log_debug(f"Simulator cache miss: {key.strategy} (hits: {_hits}, misses: {_misses}).")
+    # strategies hold per simulator state, so each simulator needs its own copy
+    simulator = Simulator(strategy=copy.copy(strategy),
+                          isins=None if key.isins is None else sorted(key.isins),
+                          num_portfolio=num_portfolio)
+    with _lock:
+        if _version == key.version:
+            _simulators[key] = simulator
+            while len(_simulators) > MAX_SIZE:
+                _simulators.popitem(last=False)
+    return simulator
+
+
+def clear() -> None:
+    global _version
+    with _lock:
+        _simulators.clear()
+        _version = None
@@ -0,0 +1,73 @@
+from datetime import date
+from typing import List
+
+import pandas as pd
+import pytest
+from overrides import overrides
+
+from lib.fund import fund_cache
+from lib.simulate import simulator_cache
+from lib.simulate.simulator import Simulator
+from lib.simulate.simulator_test import mock_fundcache_get, mock_fundcache_get_prices
+from lib.simulate.strategy.strategy import SelectAll, Strategy
+
+
+class MockStrategy(Strategy):
+    @overrides
+    def run(self, dt: date, prices_df: pd.DataFrame, fees_df: pd.DataFrame) -> List[str]:
+        return list(self.columns)
+
+    @overrides
+    def on_data_ready(self, data: Simulator.Data) -> None:
+        self.columns = data.prices_df.columns
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests(monkeypatch):
+    monkeypatch.setattr(fund_cache, "get", mock_fundcache_get)
+    monkeypatch.setattr(fund_cache, "get_prices", mock_fundcache_get_prices)
+    monkeypatch.setattr(fund_cache, "_version", 0)
+    simulator_cache.clear()
+    yield
+    simulator_cache.clear()
+
+
+def test_get():
+    strategy = MockStrategy()
+    simulator = simulator_cache.get(strategy, ["isin1", "isin2"], 1)
+    assert simulator_cache.get(strategy, ["isin2", "isin1"], 1) is simulator
+    assert simulator_cache.get(MockStrategy(), ["isin1", "isin2"], 1) is simulator
+    assert simulator_cache.get(strategy, ["isin1", "isin2"], 2) is not simulator
+    assert simulator_cache.get(SelectAll(), ["isin1", "isin2"], 1) is not simulator
+    assert simulator_cache.get(strategy, ["isin1"], 1) is not simulator
+
+
+def test_get_copies_strategy():
+    strategy = MockStrategy()
+    simulator1 = simulator_cache.get(strategy, ["isin1", "isin2"], 1)
+    simulator2 = simulator_cache.get(strategy, ["isin1"], 1)
+    assert simulator1._strategy is not simulator2._strategy
+    assert list(simulator1._strategy.columns) == ["isin1", "isin2"]
+    assert list(simulator2._strategy.columns) == ["isin1"]
+
+
+def test_get_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(simulator_cache, "MAX_SIZE", 2)
+    strategy = SelectAll()
+    simulator1 = simulator_cache.get(strategy, ["isin1"], 1)
+    simulator2 = simulator_cache.get(strategy, ["isin2"], 1)
+    assert simulator_cache.get(strategy, ["isin1"], 1) is simulator1
+    simulator_cache.get(strategy, ["isin1", "isin2"], 1)
+    assert simulator_cache.get(strategy, ["isin1"], 1) is simulator1
+    assert simulator_cache.get(strategy, ["isin2"], 1) is not simulator2
+
+
+def test_get_invalidated_on_refresh(monkeypatch):
+    strategy = SelectAll()
+    simulator = simulator_cache.get(strategy, ["isin1", "isin2"], 1)
+    prediction = simulator.predict(date(2001, 1, 3))
+    assert simulator.predict(date(2001, 1, 3)) == prediction
+
+    monkeypatch.setattr(fund_cache, "_version", 1)
+    assert simulator_cache.get(strategy, ["isin1", "isin2"], 1) is not simulator
+    assert len(simulator_cache._simulators) == 1
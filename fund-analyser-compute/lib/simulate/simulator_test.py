@@ -1,6 +1,7 @@
 from datetime import date, datetime
 from typing import Iterable, List, Optional
 
+import numpy as np
 import pandas as pd
 import pytest
 from overrides import overrides
@@ -8,8 +9,17 @@ from pandas.testing import assert_frame_equal
 
 from lib.fund import fund_cache
 from lib.fund.fund import Fund
+from lib.fund.fund_utils import calc_returns
+from lib.indicators.feature_store import FeatureStore
 from lib.simulate.simulator import Simulator
-from lib.simulate.strategy.strategy import Strategy
+from lib.simulate.strategy.bollinger_returns import BollingerReturns
+from lib.simulate.strategy.compound.and_strategy import AndStrategy
+from lib.simulate.strategy.fibonacci_returns import FibonacciReturns
+from lib.simulate.strategy.momentum_returns import MomentumReturns
+from lib.simulate.strategy.strategy import SelectAll, Strategy
+from lib.simulate.strategy.target_returns import TargetReturns
+from lib.simulate.strategy.upside_ratio_returns import UpsideRatioReturns
+from lib.simulate.tiebreaker.max_upside_tie_breaker import MaxUpsideTieBreaker
 from lib.simulate.tiebreaker.no_op_tie_breaker import NoOpTieBreaker
 from lib.util.dates import BDAY
 
@@ -76,6 +86,120 @@ def test_run():
     assert result.end_date == date(2001, 1, 12)
 
 
+def test_run_all_matches_run(monkeypatch):
+    _mock_random_funds(monkeypatch)
+    prices_df, fees_df = fund_cache.get_prices(), Simulator(SelectAll())._fees_df
+    data = Simulator.Data(prices_df=prices_df, fees_df=fees_df, num_portfolio=1, hold_interval=5 * BDAY,
+                          features=FeatureStore(prices_df))
+    dates = prices_df.index[30:]
+
+    for strategy in [SelectAll(), TargetReturns(), BollingerReturns(), FibonacciReturns(), UpsideRatioReturns(),
+                     AndStrategy(BollingerReturns(), TargetReturns())]:
+        strategy.on_data_ready(data)
+        selection_df = strategy.run_all(dates, prices_df, fees_df)
+        assert selection_df.index.equals(dates) and selection_df.columns.equals(prices_df.columns)
+        for dt, row in selection_df.iterrows():
+            assert set(row.index[row]) == set(strategy.run(dt, prices_df, fees_df)), (strategy, dt)
+
+
+def test_run_with_selection_matrix(monkeypatch):
+    class PerDate(Strategy):
+        def __init__(self, strategy: Strategy):
+            self._strategy = strategy
+
+        @overrides
+        def run(self, dt: date, prices_df: pd.DataFrame, fees_df: pd.DataFrame) -> List[str]:
+            return self._strategy.run(dt, prices_df, fees_df)
+
+        @overrides
+        def on_data_ready(self, data: Simulator.Data) -> None:
+            self._strategy.on_data_ready(data)
+
+    _mock_random_funds(monkeypatch)
+    for strategy in [SelectAll(), BollingerReturns(), AndStrategy(BollingerReturns(), TargetReturns())]:
+        [expected] = Simulator(strategy=PerDate(strategy), num_portfolio=3) \
+            .run(start_date=date(2001, 2, 3), end_date=date(2002, 6, 1))
+        [result] = Simulator(strategy=strategy, num_portfolio=3) \
+            .run(start_date=date(2001, 2, 3), end_date=date(2002, 6, 1))
+        assert_frame_equal(result.account, expected.account, check_exact=True)
+        assert result._replace(account=None) == expected._replace(account=None)
+
+
+def test_run_multi(monkeypatch):
+    class CountingStrategy(Strategy):
+        def __init__(self):
+            self.run_dates: List[date] = []
+            self._strategy = BollingerReturns()
+
+        @overrides
+        def run(self, dt: date, prices_df: pd.DataFrame, fees_df: pd.DataFrame) -> List[str]:
+            self.run_dates.append(dt)
+            return self._strategy.run(dt, prices_df, fees_df)
+
+        @overrides
+        def on_data_ready(self, data: Simulator.Data) -> None:
+            self._strategy.on_data_ready(data)
+
+    _mock_random_funds(monkeypatch)
+    monkeypatch.setattr(Simulator, "MULTI_MAX_WORKERS", 1)
+    strategy = CountingStrategy()
+    simulator = Simulator(strategy=strategy, num_portfolio=2)
+    expected = simulator.run(start_date=date(2001, 2, 5), end_date=date(2002, 6, 1), multi=True)
+    assert [r.start_date for r in expected] == [dt.date() for dt in pd.date_range(date(2001, 2, 5), periods=6, freq=BDAY)]
+    # predictions are shared across start dates
+    assert len(strategy.run_dates) == len(simulator._predictions) < sum(len(r.account) for r in expected)
+
+    monkeypatch.setattr(Simulator, "MULTI_MAX_WORKERS", 4)
+    strategy = CountingStrategy()
+    simulator = Simulator(strategy=strategy, num_portfolio=2)
+    results = simulator.run(start_date=date(2001, 2, 5), end_date=date(2002, 6, 1), multi=True)
+    # threads wait for each other's predictions rather than repeating them
+    assert len(strategy.run_dates) == len(set(strategy.run_dates)) == len(simulator._predictions)
+    assert len(results) == len(expected)
+    for result, expected_result in zip(results, expected):
+        assert_frame_equal(result.account, expected_result.account, check_exact=True)
+        assert result._replace(account=None) == expected_result._replace(account=None)
+
+
+def test_features_shared(monkeypatch):
+    _mock_random_funds(monkeypatch)
+    simulator = Simulator(strategy=AndStrategy(MomentumReturns(), FibonacciReturns(), TargetReturns()),
+                          tie_breaker=MaxUpsideTieBreaker())
+    # smoothed prices shared by momentum and fibonacci, price channels shared by target and tie breaker
+    assert (simulator._features.hits, simulator._features.misses) == (2, 3)
+
+
+def test_calc_mean_returns(monkeypatch):
+    _mock_random_funds(monkeypatch)
+    simulator = Simulator(strategy=SelectAll())
+    prices_df, fees_df = simulator._prices_df, simulator._fees_df
+    rng = np.random.default_rng(1)
+
+    for dt in [date(2000, 1, 3), date(2001, 1, 1), date(2001, 6, 2), date(2002, 12, 31), date(2005, 1, 1)]:
+        for duration in [BDAY, 10 * BDAY, pd.DateOffset(months=6)]:
+            for isins in [list(fees_df.index), sorted(fees_df.index), rng.choice(fees_df.index, 3, replace=False).tolist()]:
+                expected = calc_returns(prices_df[isins], dt, duration, fees_df).mean()
+                actual = simulator._calc_mean_returns(isins, dt, duration)
+                assert actual == expected or (np.isnan(actual) and np.isnan(expected))
+
+
+def _mock_random_funds(monkeypatch, num_funds: int = 20) -> None:
+    rng = np.random.default_rng(0)
+    isins = [f"isin{i}" for i in rng.permutation(num_funds)]
+    index = pd.date_range(datetime(2001, 1, 1), datetime(2002, 12, 31), freq="B")
+    prices_df = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0.0003, 0.01, (len(index), num_funds)), axis=0)),
+                             index=index, columns=isins)
+    prices_df.iloc[:50, 0] = np.nan
+    funds = [mock_fundcache_get()[0]._replace(isin=isin, name=f"Fund {isin}", ocf=rng.uniform(0, 0.01),
+                                               bidAskSpread=rng.uniform(0, 0.005))
+             for isin in isins]
+    funds_by_isin = {fund.isin: fund for fund in funds}
+    monkeypatch.setattr(fund_cache, "get",
+                        lambda isins=None: funds if isins is None else [funds_by_isin[isin] for isin in isins])
+    monkeypatch.setattr(fund_cache, "get_prices",
+                        lambda isins=None: prices_df if isins is None else prices_df[list(isins)])
+
+
 def mock_fundcache_get(isins: Optional[Iterable[str]] = None) -> List[Fund]:
     funds = [
         Fund(
@@ -6,7 +6,6 @@ from typing import List
 import pandas as pd
 from overrides import overrides
 
-from lib.indicators.indicator_utils import adx
 from lib.simulate.simulator import Simulator
 from lib.simulate.strategy.strategy import Strategy
 from lib.util.dates import BDAY
@@ -39,7 +38,7 @@ class AdxReturns(Strategy):
 
     @overrides
     def on_data_ready(self, data: Simulator.Data) -> None:
-        adxs, plus_dis, minus_dis = adx(data.prices_df)
+        adxs, plus_dis, minus_dis = data.features.adx()
         self._adxs_strong_sign = adxs.gt(25)
         adxs_grad_sign = adxs.diff().gt(0)
         diff_dis = plus_dis - minus_dis
@@ -1,12 +1,11 @@
 from __future__ import annotations
 
 from datetime import date
-from typing import List
+from typing import List, Optional
 
 import pandas as pd
 from overrides import overrides
 
-from lib.indicators.indicator_utils import bollinger_bands
 from lib.simulate.simulator import Simulator
 from lib.simulate.strategy.strategy import Strategy
 from lib.util.dates import BDAY
@@ -33,8 +32,13 @@ class BollingerReturns(Strategy):
         return self._avoid_bollinger_top(dt, prices_df)
         # return self._avoid_bollinger_top_t_1(dt, prices_df)
 
+    @overrides
+    def run_all(self, dates: pd.DatetimeIndex, prices_df: pd.DataFrame,
+                fees_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        return self._below_lower_band.reindex(index=dates, columns=prices_df.columns, fill_value=False)
+
     @overrides
     def on_data_ready(self, data: Simulator.Data) -> None:
-        upper_bands, middle_bands, lower_bands = bollinger_bands(data.prices_df, stdev=1)
+        upper_bands, middle_bands, lower_bands = data.features.bollinger_bands(stdev=1)
         self._below_lower_band = data.prices_df < lower_bands
-        self._rising = data.prices_df.pct_change().gt(0)
+        self._rising = data.features.pct_change().gt(0)
@@ -1,5 +1,5 @@
 from datetime import date
-from typing import List
+from typing import List, Optional
 
 import pandas as pd
 from overrides import overrides
@@ -22,6 +22,17 @@ class AndStrategy(Strategy):
             *(strategy.run(dt, prices_df, fees_df) for strategy in self.strategies)
         )
 
+    @overrides
+    def run_all(self, dates: pd.DatetimeIndex, prices_df: pd.DataFrame,
+                fees_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        selected = None
+        for strategy in self.strategies:
+            strategy_selected = strategy.run_all(dates, prices_df, fees_df)
+            if strategy_selected is None:
+                return None
+            selected = strategy_selected if selected is None else selected & strategy_selected
+        return selected
+
     @overrides
     def on_data_ready(self, data: Simulator.Data) -> None:
         for strategy in self.strategies:
@@ -1,12 +1,11 @@
 from __future__ import annotations
 
 from datetime import date
-from typing import List
+from typing import List, Optional
 
 import pandas as pd
 from overrides import overrides
 
-from lib.indicators.indicator_utils import support_resistance
 from lib.simulate.simulator import Simulator
 from lib.simulate.strategy.strategy import Strategy
 from lib.util.lang import intersection
@@ -48,15 +47,26 @@ class FibonacciReturns(Strategy):
         )
         return isins
 
+    @overrides
+    def run_all(self, dates: pd.DatetimeIndex, prices_df: pd.DataFrame,
+                fees_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        prev_support_prices = self._prev_support_prices.reindex(index=dates, columns=prices_df.columns)
+        prev_resistance_prices = self._prev_resistance_prices.reindex(index=dates, columns=prices_df.columns)
+        prices = prices_df.reindex(index=dates)
+        retracement = (prices - prev_support_prices) / (prev_resistance_prices - prev_support_prices)
+        large_gap = self._gap_prices_pct.reindex(index=dates, columns=prices_df.columns) >= 0.02  # 2%
+        rising = self._rising.reindex(index=dates, columns=prices_df.columns, fill_value=False)
+        return (retracement >= 0.38) & (retracement <= 0.62) & large_gap & rising
+
     @overrides
     def on_data_ready(self, data: Simulator.Data) -> None:
-        smoothed_prices = data.prices_df.rolling(2).mean()
+        smoothed_prices = data.features.smoothed_prices(2)
 
         self._prev_support_dates, \
         self._prev_support_prices, \
         self._prev_resistance_dates, \
         self._prev_resistance_prices \
-            = support_resistance(data.prices_df)
+            = data.features.support_resistance()
 
         # sr = support_resistance(smoothed_prices)
         self._rising = smoothed_prices.diff().gt(0)
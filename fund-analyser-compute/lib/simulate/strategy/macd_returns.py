@@ -6,7 +6,6 @@ from typing import List
 import pandas as pd
 from overrides import overrides
 
-from lib.indicators.indicator_utils import ppo
 from lib.simulate.simulator import Simulator
 from lib.simulate.strategy.strategy import Strategy
 
@@ -35,6 +34,6 @@ class MacdReturns(Strategy):
 
     @overrides
     def on_data_ready(self, data: Simulator.Data) -> None:
-        self._slow_ppo, self._slow_pposignal, self._slow_ppohist = ppo(data.prices_df, fast=20, slow=60)
-        self._fast_ppo, self._fast_pposignal, self._fast_ppohist = ppo(data.prices_df, fast=3, slow=6)
+        self._slow_ppo, self._slow_pposignal, self._slow_ppohist = data.features.ppo(fast=20, slow=60)
+        self._fast_ppo, self._fast_pposignal, self._fast_ppohist = data.features.ppo(fast=3, slow=6)
         self._num_portfolio = data.num_portfolio
@@ -35,7 +35,7 @@ class MomentumReturns(Strategy):
 
     @overrides
     def on_data_ready(self, data: Simulator.Data) -> None:
-        smoothed_prices = data.prices_df.rolling(2).mean()
+        smoothed_prices = data.features.smoothed_prices(2)
         global_gradient = smoothed_prices.pct_change()
         global_convexity = global_gradient.diff()
         self._global_convexity_signs = global_convexity > 0
@@ -6,7 +6,6 @@ from typing import List
 import pandas as pd
 from overrides import overrides
 
-from lib.indicators.indicator_utils import price_channels
 from lib.simulate.simulator import Simulator
 from lib.simulate.strategy.strategy import Strategy
 from lib.util.dates import BDAY
@@ -56,6 +55,6 @@ class PriceChannelReturns(Strategy):
 
     @overrides
     def on_data_ready(self, data: Simulator.Data) -> None:
-        self._lower_channel, self._upper_channel = price_channels(data.prices_df, timeperiod=25)
+        self._lower_channel, self._upper_channel = data.features.price_channels(25)
         self._btw_channel = (self._lower_channel < data.prices_df) & (data.prices_df < self._upper_channel)
-        self._daily_returns = data.prices_df.pct_change()
+        self._daily_returns = data.features.pct_change()
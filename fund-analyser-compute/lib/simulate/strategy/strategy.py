@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from datetime import date
-from typing import List
+from typing import List, Optional
 
 import pandas as pd
 from overrides import overrides
@@ -18,6 +18,18 @@ class Strategy(ABC):
     def on_data_ready(self, data: simulator.Simulator.Data) -> None:
         pass
 
+    def run_all(self, dates: pd.DatetimeIndex, prices_df: pd.DataFrame,
+                fees_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """
+        Vectorised equivalent of run() over many dates at once.
+        :param dates: dates to run on
+        :param prices_df:
+        :param fees_df:
+        :return: boolean selection matrix (dates x isins of prices_df), true where run() would select the isin,
+                 or None if not supported, in which case run() is called date by date.
+        """
+        return None
+
 
 class SelectAll(Strategy):
     from lib.simulate import simulator
@@ -28,3 +40,8 @@ class SelectAll(Strategy):
     @overrides
     def on_data_ready(self, data: simulator.Simulator.Data) -> None:
         pass
+
+    @overrides
+    def run_all(self, dates: pd.DatetimeIndex, prices_df: pd.DataFrame,
+                fees_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        return pd.DataFrame(True, index=dates, columns=prices_df.columns)
@@ -1,12 +1,11 @@
 from __future__ import annotations
 
 from datetime import date
-from typing import List
+from typing import List, Optional
 
 import pandas as pd
 from overrides import overrides
 
-from lib.indicators.indicator_utils import price_channels
 from lib.simulate.simulator import Simulator
 from lib.simulate.strategy.strategy import Strategy
 
@@ -26,9 +25,14 @@ class TargetReturns(Strategy):
     def run(self, dt: date, prices_df: pd.DataFrame, fees_df: pd.DataFrame) -> List[str]:
         return self._with_upside(dt)
 
+    @overrides
+    def run_all(self, dates: pd.DatetimeIndex, prices_df: pd.DataFrame,
+                fees_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        return self.has_upside.reindex(index=dates, columns=prices_df.columns, fill_value=False)
+
     @overrides
     def on_data_ready(self, data: Simulator.Data) -> None:
         time_period_1m = 20
-        lower_channel, upper_channel = price_channels(data.prices_df, timeperiod=time_period_1m)
+        lower_channel, upper_channel = data.features.price_channels(time_period_1m)
         upsides = (upper_channel - data.prices_df) / data.prices_df
         self.has_upside = upsides.ge(self._target_returns)
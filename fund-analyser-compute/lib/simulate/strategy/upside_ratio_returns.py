@@ -1,11 +1,10 @@
 from datetime import date
-from typing import List
+from typing import List, Optional
 
 import numpy as np
 import pandas as pd
 from overrides import overrides
 
-from lib.indicators.indicator_utils import support_resistance
 from lib.simulate.simulator import Simulator
 from lib.simulate.strategy.strategy import Strategy
 from lib.util.lang import intersection
@@ -22,6 +21,12 @@ class UpsideRatioReturns(Strategy):
         )
         return isins
 
+    @overrides
+    def run_all(self, dates: pd.DatetimeIndex, prices_df: pd.DataFrame,
+                fees_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        selected = self._has_upside_ratio & self._rising & self._has_margin
+        return selected.reindex(index=dates, columns=prices_df.columns, fill_value=False)
+
     def _with_upside_ratio(self, dt: date) -> List[str]:
         row = self._has_upside_ratio.loc[dt, :]
         isins = row.index[row].tolist()
@@ -38,13 +43,13 @@ class UpsideRatioReturns(Strategy):
         return isins
 
     def on_data_ready(self, data: Simulator.Data) -> None:
-        smoothed_prices = data.prices_df.rolling(14).mean()
+        smoothed_prices = data.features.smoothed_prices(14)
 
         self._prev_support_dates, \
         self._prev_support_prices, \
         self._prev_resistance_dates, \
         self._prev_resistance_prices \
-            = support_resistance(smoothed_prices)
+            = data.features.support_resistance(smoothing=14)
 
         upside_ratio = (self._prev_resistance_prices - data.prices_df) / (
                 data.prices_df - self._prev_support_prices)
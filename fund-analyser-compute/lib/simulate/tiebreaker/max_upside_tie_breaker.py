@@ -5,7 +5,6 @@ import pandas as pd
 from overrides import overrides
 
 from lib.fund.fund_utils import calc_returns
-from lib.indicators.indicator_utils import price_channels
 from lib.simulate import simulator
 from lib.simulate.tiebreaker.tie_breaker import TieBreaker
 
@@ -30,5 +29,5 @@ class MaxUpsideTieBreaker(TieBreaker):
     @overrides
     def on_data_ready(self, data: simulator.Simulator.Data) -> None:
         price_channel_1m = 20
-        lower_channel, upper_channel = price_channels(data.prices_df, timeperiod=price_channel_1m)
+        lower_channel, upper_channel = data.features.price_channels(price_channel_1m)
         self._upsides = (upper_channel - data.prices_df) / data.prices_df
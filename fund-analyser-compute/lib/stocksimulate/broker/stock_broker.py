@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import List
 
+import numpy as np
 from overrides import overrides
 
 from lib.stocksimulate.stock_trade import StockAction
@@ -12,9 +13,27 @@ class StockBroker(ABC):
         pass
 
     @abstractmethod
-    def calc_fees(self, stock_actions: List[StockAction]) -> float:
+    def calc_fees_all(self, orders: np.ndarray, shares: np.ndarray, prices: np.ndarray,
+                      num_orders: int) -> np.ndarray:
+        """
+        Vectorised calc_fees() over the trades of many orders at once, e.g. of every day of a simulation.
+        :param orders: order of each trade, between 0 and num_orders - 1
+        :param shares: shares of each trade
+        :param prices: price of each trade
+        :param num_orders: number of orders
+        :return: fees of each order
+        """
         pass
 
+    def calc_fees(self, stock_actions: List[StockAction]) -> float:
+        """
+        Fees of stock_actions, placed as one order.
+        """
+        return self.calc_fees_all(np.zeros(len(stock_actions), dtype=np.int64),
+                                  np.array([action.shares for action in stock_actions], dtype=np.float64),
+                                  np.array([action.price for action in stock_actions], dtype=np.float64),
+                                  num_orders=1).item()
+
 
 class CharlesSchwab(StockBroker):
     @overrides
@@ -22,8 +41,9 @@ class CharlesSchwab(StockBroker):
         return False
 
     @overrides
-    def calc_fees(self, stock_actions: List[StockAction]) -> float:
-        return 0
+    def calc_fees_all(self, orders: np.ndarray, shares: np.ndarray, prices: np.ndarray,
+                      num_orders: int) -> np.ndarray:
+        return np.zeros(num_orders)
 
 
 class Trading212(StockBroker):
@@ -32,8 +52,9 @@ class Trading212(StockBroker):
         return True
 
     @overrides
-    def calc_fees(self, stock_actions: List[StockAction]) -> float:
-        return 0
+    def calc_fees_all(self, orders: np.ndarray, shares: np.ndarray, prices: np.ndarray,
+                      num_orders: int) -> np.ndarray:
+        return np.zeros(num_orders)
 
 
 class IBKRPro(StockBroker):
@@ -48,13 +69,11 @@ class IBKRPro(StockBroker):
         return True
 
     @overrides
-    def calc_fees(self, stock_actions: List[StockAction]) -> float:
-        total = 0.0
-        trade_value = 0.0
-        for action in stock_actions:
-            total += self._fee_per_share * action.shares
-            trade_value += action.shares * action.price
+    def calc_fees_all(self, orders: np.ndarray, shares: np.ndarray, prices: np.ndarray,
+                      num_orders: int) -> np.ndarray:
+        totals = np.bincount(orders, weights=self._fee_per_share * shares, minlength=num_orders)
+        trade_values = np.bincount(orders, weights=shares * prices, minlength=num_orders)
 
         fees_lower_bound = self._min_per_order  # Assuming ComboOrder
-        fees_upper_bound = self._max_pct_trade_value * trade_value
-        return min(fees_upper_bound, max(fees_lower_bound, total))
+        fees_upper_bound = self._max_pct_trade_value * trade_values
+        return np.minimum(fees_upper_bound, np.maximum(fees_lower_bound, totals))
@@ -0,0 +1,43 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from lib.stocksimulate.broker.stock_broker import CharlesSchwab, IBKRPro, StockBroker, Trading212
+from lib.stocksimulate.stock_trade import StockAction, StockSide
+
+
+def test_ibkr_pro_calc_fees():
+    broker = IBKRPro()
+    assert broker.calc_fees([]) == 0
+    # 0.005 per share, at least 1.0 per order, at most 1% of trade value
+    assert broker.calc_fees([StockAction(side=StockSide.BUY, dt=date(2021, 1, 4), shares=100, price=10)]) == 1.0
+    assert broker.calc_fees([StockAction(side=StockSide.BUY, dt=date(2021, 1, 4), shares=1000, price=10),
+                             StockAction(side=StockSide.SELL, dt=date(2021, 1, 4), shares=200, price=10)]) == 6.0
+    assert broker.calc_fees([StockAction(side=StockSide.BUY, dt=date(2021, 1, 4), shares=10, price=5)]) == 0.5
+
+
+def _random_orders(num_orders: int):
+    rng = np.random.default_rng(0)
+    orders = np.sort(rng.integers(0, num_orders, 300))
+    return orders, rng.uniform(0, 500, len(orders)), rng.uniform(1, 200, len(orders))
+
+
+@pytest.mark.parametrize("broker", [CharlesSchwab(), Trading212()])
+def test_calc_fees_all_free(broker: StockBroker):
+    orders, shares, prices = _random_orders(50)
+    np.testing.assert_array_equal(broker.calc_fees_all(orders, shares, prices, 50), np.zeros(50))
+
+
+def test_ibkr_pro_calc_fees_all():
+    orders, shares, prices = _random_orders(50)
+
+    fees = IBKRPro().calc_fees_all(orders, shares, prices, 50)
+
+    for order in range(50):
+        # same as summing over the order's actions one by one
+        total = trade_value = 0.0
+        for order_shares, price in zip(shares[orders == order], prices[orders == order]):
+            total += 0.005 * order_shares
+            trade_value += order_shares * price
+        assert fees[order] == min(0.01 * trade_value, max(1.0, total))
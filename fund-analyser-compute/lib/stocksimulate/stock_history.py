@@ -1,13 +1,118 @@
 from datetime import date
-from typing import Dict, List, Optional
+from typing import Iterable, Iterator, List, Mapping, Optional
 
+import numpy as np
+import pandas as pd
+
+from lib.stocksimulate.broker.stock_broker import StockBroker
 from lib.stocksimulate.stock_trade import StockAction, StockSide
 
-TradeHistory = Dict[str, List[StockAction]]
 
+class TradeHistory(Mapping[str, List[StockAction]]):
+    """
+    Ledger of trades, as columns of symbol, day, side, shares and price that grow as trades are added.
+    Also keeps the last buy of each symbol, so that strategies can look it up in O(1) every day.
+    Maps symbols that were traded to their trades, in the order of their first trade.
+    """
+
+    def __init__(self, symbols: Iterable[str], dates: pd.DatetimeIndex):
+        self.symbols = list(symbols)
+        self.dates = dates
+        self._symbol_ilocs = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._date_ilocs = {dt: i for i, dt in enumerate(dates)}
+        self._size = 0
+        self._symbol_ids = np.empty(0, dtype=np.int32)
+        self._days = np.empty(0, dtype=np.int32)
+        self._buys = np.empty(0, dtype=bool)
+        self._shares = np.empty(0, dtype=np.float64)
+        self._prices = np.empty(0, dtype=np.float64)
+        self._last_buys = np.full(len(self.symbols), -1, dtype=np.int64)  # row of the last buy of each symbol
+
+    def add(self, symbol: str, action: StockAction) -> None:
+        """
+        Appends a trade of symbol on one of dates.
+        """
+        if self._size == len(self._shares):
+            self._grow()
+        row, symbol_id = self._size, self._symbol_ilocs[symbol]
+        self._symbol_ids[row] = symbol_id
+        self._days[row] = self._date_ilocs[action.dt]
+        self._buys[row] = action.side == StockSide.BUY
+        self._shares[row] = action.shares
+        self._prices[row] = action.price
+        if action.side == StockSide.BUY:
+            self._last_buys[symbol_id] = row
+        self._size += 1
+
+    def last_bought_date(self, symbol: str) -> Optional[date]:
+        row = self._last_buys[self._symbol_ilocs[symbol]]
+        return None if row < 0 else self.dates[self._days[row]]
+
+    def last_bought_dates(self, symbols: Iterable[str]) -> pd.DatetimeIndex:
+        """
+        Vectorised last_bought_date() of symbols, NaT for those never bought.
+        """
+        rows = self._last_buys[[self._symbol_ilocs[symbol] for symbol in symbols]]
+        bought = rows >= 0
+        last_bought_dates = np.full(len(rows), np.datetime64("NaT"), dtype="datetime64[ns]")
+        last_bought_dates[bought] = self.dates.values[self._days[rows[bought]]]
+        return pd.DatetimeIndex(last_bought_dates)
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        Trade log, one row per trade in the order they were added.
+        :return: DataFrame of symbol, date, side, shares, price and amount (shares x price)
+        """
+        trades = slice(0, self._size)
+        return pd.DataFrame({
+            "symbol": np.array(self.symbols, dtype=object)[self._symbol_ids[trades]],
+            "date": self.dates[self._days[trades]],
+            "side": np.where(self._buys[trades], StockSide.BUY.value, StockSide.SELL.value),
+            "shares": self._shares[trades],
+            "price": self._prices[trades],
+            "amount": self._shares[trades] * self._prices[trades]
+        })
+
+    def turnover(self) -> pd.Series:
+        """
+        Amount bought and sold on each of dates.
+        """
+        trades = slice(0, self._size)
+        return pd.Series(np.bincount(self._days[trades], weights=self._shares[trades] * self._prices[trades],
+                                     minlength=len(self.dates)),
+                         index=self.dates)
+
+    def calc_fees(self, broker: StockBroker) -> pd.Series:
+        """
+        Fees that broker charges for the trades of each of dates, in one call for the whole history,
+        e.g. to compare brokers over the trades of a simulation.
+        """
+        trades = slice(0, self._size)
+        return pd.Series(broker.calc_fees_all(self._days[trades], self._shares[trades], self._prices[trades],
+                                              num_orders=len(self.dates)),
+                         index=self.dates)
+
+    def __getitem__(self, symbol: str) -> List[StockAction]:
+        symbol_id = self._symbol_ilocs[symbol]
+        rows = np.flatnonzero(self._symbol_ids[:self._size] == symbol_id)
+        if not len(rows):
+            raise KeyError(symbol)
+        return [StockAction(side=StockSide.BUY if buy else StockSide.SELL, dt=self.dates[day], shares=shares,
+                            price=price)
+                for day, buy, shares, price in zip(self._days[rows].tolist(), self._buys[rows].tolist(),
+                                                   self._shares[rows].tolist(), self._prices[rows].tolist())]
+
+    def __iter__(self) -> Iterator[str]:
+        symbol_ids, first_rows = np.unique(self._symbol_ids[:self._size], return_index=True)
+        return iter([self.symbols[symbol_id] for symbol_id in symbol_ids[np.argsort(first_rows)].tolist()])
+
+    def __len__(self) -> int:
+        return len(np.unique(self._symbol_ids[:self._size]))
 
-def last_bought_date(symbol: str, history: TradeHistory) -> Optional[date]:
-    return next((stock_action.dt
-                 for stock_action in reversed(history[symbol])
-                 if stock_action.side == StockSide.BUY),
-                None)
+    def _grow(self) -> None:
+        capacity = max(2 * len(self._shares), 64)
+        for column in ("_symbol_ids", "_days", "_buys", "_shares", "_prices"):
+            values = getattr(self, column)
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:len(values)] = values
+            setattr(self, column, grown)
@@ -0,0 +1,67 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from lib.stocksimulate.broker.stock_broker import IBKRPro
+from lib.stocksimulate.stock_history import TradeHistory
+from lib.stocksimulate.stock_trade import StockAction, StockSide
+
+DATES = pd.date_range("2021-01-04", periods=4, freq="B")
+TRADES = [("B", StockAction(side=StockSide.BUY, dt=DATES[0], shares=2, price=10)),
+          ("A", StockAction(side=StockSide.BUY, dt=DATES[0], shares=1, price=5)),
+          ("B", StockAction(side=StockSide.SELL, dt=DATES[1], shares=2, price=11)),
+          ("B", StockAction(side=StockSide.BUY, dt=DATES[3], shares=0.5, price=12))]
+
+
+def _history() -> TradeHistory:
+    history = TradeHistory(["A", "B", "C"], DATES)
+    for symbol, action in TRADES:
+        history.add(symbol, action)
+    return history
+
+
+def test_get():
+    history = _history()
+    assert history == {"B": [action for symbol, action in TRADES if symbol == "B"],
+                       "A": [TRADES[1][1]]}
+    assert list(history) == ["B", "A"]
+    assert "C" not in history
+
+
+def test_last_bought_date():
+    history = _history()
+    assert history.last_bought_date("A") == DATES[0]
+    assert history.last_bought_date("B") == DATES[3]
+    assert history.last_bought_date("C") is None
+    pd.testing.assert_index_equal(history.last_bought_dates(["C", "B", "A"]),
+                                  pd.DatetimeIndex([pd.NaT, DATES[3], DATES[0]]))
+
+
+def test_to_df():
+    pd.testing.assert_frame_equal(_history().to_df(), pd.DataFrame({
+        "symbol": ["B", "A", "B", "B"],
+        "date": [DATES[0], DATES[0], DATES[1], DATES[3]],
+        "side": ["buy", "buy", "sell", "buy"],
+        "shares": [2, 1, 2, 0.5],
+        "price": [10.0, 5, 11, 12],
+        "amount": [20, 5, 22, 6.0]
+    }))
+
+
+def test_turnover():
+    pd.testing.assert_series_equal(_history().turnover(), pd.Series([25.0, 22, 0, 6], index=DATES))
+
+
+def test_grow():
+    history = TradeHistory(["A"], DATES)
+    for i in range(200):
+        history.add("A", StockAction(side=StockSide.BUY, dt=DATES[i % 4], shares=i, price=1))
+    assert len(history["A"]) == 200
+    np.testing.assert_array_equal(history.to_df()["shares"], np.arange(200))
+    assert history.last_bought_date("A") == DATES[3]
+    assert pickle.loads(pickle.dumps(history)) == history
+
+
+def test_calc_fees():
+    pd.testing.assert_series_equal(_history().calc_fees(IBKRPro()), pd.Series([0.25, 0.22, 0, 0.06], index=DATES))
@@ -0,0 +1,50 @@
+from datetime import date
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class Positions:
+    """
+    Running state of positions by symbol, e.g. for trailing stops in exit strategies: the price on the day of
+    the last buy, and the max price on the days since (excluding the day of the buy).
+    Costs O(1) per position a day, as long as update() is asked for the held symbols every day.
+    """
+
+    def __init__(self, prices_df: pd.DataFrame):
+        self._prices = prices_df.to_numpy(dtype=np.float64)
+        self._rows = {dt: row for row, dt in enumerate(prices_df.index)}
+        self._column_ilocs = {symbol: column for column, symbol in enumerate(prices_df.columns)}
+        self._bought_prices = np.full(prices_df.shape[1], np.nan)
+        self._max_prices = np.full(prices_df.shape[1], np.nan)
+        self._updated_rows = np.zeros(prices_df.shape[1], dtype=np.int64)  # last row in max prices
+
+    def on_buy(self, symbol: str, dt: date) -> None:
+        """
+        Starts tracking symbol from dt, e.g. from StockStrategy.on_trade().
+        """
+        column, row = self._column_ilocs[symbol], self._rows[dt]
+        self._bought_prices[column] = self._prices[row, column]
+        self._max_prices[column] = np.nan
+        self._updated_rows[column] = row
+
+    def update(self, dt: date, symbols: pd.Index) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Adds the prices up to dt to the max prices of symbols.
+        :param dt: current day
+        :param symbols: held symbols, e.g. prices_df.columns in should_execute()
+        :return: prices on dt, prices on the day of the last buy, max prices since the day of the last buy
+                 (nan if none) of symbols
+        """
+        row = self._rows[dt]
+        columns = np.array([self._column_ilocs[symbol] for symbol in symbols], dtype=np.int64)
+        # days skipped since the last update, if any
+        for column in columns[self._updated_rows[columns] < row - 1]:
+            skipped_prices = self._prices[self._updated_rows[column] + 1:row, column]
+            self._max_prices[column] = np.fmax.reduce(skipped_prices, initial=self._max_prices[column])
+        prices = self._prices[row, columns]
+        max_prices = np.fmax(self._max_prices[columns], prices)
+        self._max_prices[columns] = max_prices
+        self._updated_rows[columns] = np.maximum(self._updated_rows[columns], row)
+        return prices, self._bought_prices[columns], max_prices
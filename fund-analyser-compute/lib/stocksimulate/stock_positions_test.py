@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from lib.stocksimulate.stock_positions import Positions
+
+DATES = pd.date_range("2021-01-04", periods=6, freq="B")
+PRICES_DF = pd.DataFrame({"A": [10.0, 12, 11, np.nan, 9, 13],
+                          "B": [5.0, 4, 6, 7, 3, 2]}, index=DATES)
+
+
+def test_positions():
+    positions = Positions(PRICES_DF)
+    positions.on_buy("A", DATES[0])
+    positions.on_buy("B", DATES[1])
+
+    prices, bought_prices, max_prices = positions.update(DATES[1], pd.Index(["A"]))
+    np.testing.assert_array_equal(prices, [12])
+    np.testing.assert_array_equal(bought_prices, [10])
+    np.testing.assert_array_equal(max_prices, [12])
+
+    # not updated on days 2 and 3, where A has no price on day 3
+    prices, bought_prices, max_prices = positions.update(DATES[4], pd.Index(["A", "B"]))
+    np.testing.assert_array_equal(prices, [9, 3])
+    np.testing.assert_array_equal(bought_prices, [10, 4])
+    np.testing.assert_array_equal(max_prices, [12, 7])
+
+    # bought again, max since then excludes the day of the buy
+    positions.on_buy("B", DATES[4])
+    prices, bought_prices, max_prices = positions.update(DATES[5], pd.Index(["B", "A"]))
+    np.testing.assert_array_equal(prices, [2, 13])
+    np.testing.assert_array_equal(bought_prices, [3, 10])
+    np.testing.assert_array_equal(max_prices, [2, 13])
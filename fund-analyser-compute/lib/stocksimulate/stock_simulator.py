@@ -1,10 +1,11 @@
 import math
-from collections import defaultdict
 from datetime import date
-from typing import Dict, Iterable, List, Set, Tuple
+from typing import Iterable, List, NamedTuple, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
+from lib.indicators.feature_store import FeatureStore
 from lib.stock import stock_cache
 from lib.stocksimulate.broker.stock_broker import StockBroker
 from lib.stocksimulate.stock_history import TradeHistory
@@ -14,6 +15,10 @@ from lib.util.dates import BDAY
 
 
 class StockSimulator:
+    class Data(NamedTuple):
+        prices_df: pd.DataFrame  # simulated business days x symbols, nan where missing
+        volume_df: pd.DataFrame
+        features: FeatureStore  # indicator panels over prices_df, shared by entry and exit strategies
 
     def __init__(self,
                  symbols: Iterable[str],
@@ -21,9 +26,10 @@ class StockSimulator:
                  exit_strategy: StockStrategy,
                  broker: StockBroker,
                  initial_cash: float = 100.0):
-        self._symbols = set(symbols)
-        prices_df, volume_df = stock_cache.get_prices(symbols)
+        self._symbols = list(dict.fromkeys(symbols))
+        prices_df, volume_df = stock_cache.get_prices(self._symbols)
         self._prices_df = prices_df
+        self._volume_df = volume_df
         self._entry_strategy = entry_strategy
         self._exit_strategy = exit_strategy
         self._broker = broker
@@ -33,51 +39,76 @@ class StockSimulator:
     def run(self,
             start_date: date = (date.today() - pd.DateOffset(years=5)).date(),
             end_date: date = date.today() - BDAY) -> Tuple[pd.DataFrame, TradeHistory]:
+        """
+        Simulates trading symbols from start_date to end_date.
+        Works on positional arrays of prices (days x symbols) and holdings, so that each day only costs
+        the strategies' windows (see StockStrategy.get_lookback()) rather than slicing all prices so far.
+        :return: account value and held symbols on each business day, trade history by symbol
+        """
+        date_range = pd.date_range(start_date, end_date, freq="B")
+        # days without prices (e.g. after the last cached date) are nan
+        prices = self._prices_df.reindex(index=date_range, columns=self._symbols).to_numpy(dtype=np.float64)
+        prices.flags.writeable = False  # strategies are handed views
+        symbols = np.array(self._symbols, dtype=object)
+        prices_df = pd.DataFrame(prices, index=date_range, columns=self._symbols, copy=False)
+        data = StockSimulator.Data(
+            prices_df=prices_df,
+            volume_df=self._volume_df.reindex(index=date_range, columns=self._symbols),
+            features=FeatureStore(prices_df))
+        self._entry_strategy.on_data_ready(data)
+        self._exit_strategy.on_data_ready(data)
+        columns = {symbol: i for i, symbol in enumerate(self._symbols)}
+        all_columns = np.arange(len(self._symbols))
+
         cash = self._initial_cash
-        curr_holdings: Dict[str, float] = defaultdict(float)
-        history: TradeHistory = defaultdict(list)
+        holdings = np.zeros(len(self._symbols))  # shares held, by column
+        opened = np.zeros(len(self._symbols), dtype=np.int64)  # when each holding was opened, to keep their order
+        num_opened = 0
+        history = TradeHistory(self._symbols, date_range)
+        values = np.empty(len(date_range))
+        held_symbols: List[str] = []
 
-        date_range = pd.date_range(start_date, end_date, freq="B")
-        account = pd.DataFrame(index=date_range, columns=["value", "holdings"])
-        prices_df = self._prices_df[start_date: end_date]  # type:ignore
+        for day, dt in enumerate(date_range):
+            day_prices = prices[day]
 
-        for dt in date_range:
             # check sell
-            sold_symbols: Set[str] = set()
+            sold = np.zeros(len(self._symbols), dtype=bool)
             day_actions: List[StockAction] = []
 
-            if curr_holdings:
-                curr_symbols = curr_holdings.keys()
-                confidences = self._exit_strategy.should_execute(dt, prices_df.loc[:dt, curr_symbols], history)
+            held = _in_order(np.flatnonzero(holdings), opened)
+            if len(held):
+                confidences = self._exit_strategy.should_execute(
+                    dt, _window(prices, date_range, symbols, day, held, self._exit_strategy.get_lookback()), history)
                 for symbol, confidence in confidences.items():
-                    bought_shares = curr_holdings[symbol]
+                    column = columns[symbol]
+                    bought_shares = holdings[column]
                     if confidence > 0 and bought_shares > 0:
-                        price = prices_df.loc[dt, symbol]
-                        sell_price = price * (1 - self._avg_spread / 2)
+                        sell_price = day_prices[column] * (1 - self._avg_spread / 2)
                         sell_shares = confidence * bought_shares
                         sell_amount = sell_shares * sell_price
 
-                        curr_holdings[symbol] -= sell_shares
-                        if curr_holdings[symbol] == 0:
-                            del curr_holdings[symbol]
+                        holdings[column] -= sell_shares
                         cash += sell_amount
 
                         sell_action = StockAction(
                             side=StockSide.SELL, dt=dt, shares=sell_shares, price=sell_price)
 
                         day_actions.append(sell_action)
-                        history[symbol].append(sell_action)
-                        sold_symbols.add(symbol)
+                        history.add(symbol, sell_action)
+                        self._entry_strategy.on_trade(symbol, sell_action)
+                        self._exit_strategy.on_trade(symbol, sell_action)
+                        sold[column] = True
 
             # check buy
-            can_buy_symbols = self._symbols.difference(sold_symbols)
-            confidences = self._entry_strategy.should_execute(dt, prices_df.loc[:dt, list(can_buy_symbols)], history)
+            can_buy = np.flatnonzero(~sold) if sold.any() else all_columns
+            confidences = self._entry_strategy.should_execute(
+                dt, _window(prices, date_range, symbols, day, can_buy, self._entry_strategy.get_lookback()), history)
             buy_confidences = {k: v for k, v in confidences.items() if v > 0}
             if len(buy_confidences) and cash > 0:
                 budget = cash / len(buy_confidences)
                 for symbol, confidence in buy_confidences.items():
-                    price = prices_df.loc[dt, symbol]
-                    buy_price = price * (1 + self._avg_spread / 2)
+                    column = columns[symbol]
+                    buy_price = day_prices[column] * (1 + self._avg_spread / 2)
                     buy_budget = confidence * budget
 
                     if self._broker.fractional_shares():
@@ -88,25 +119,44 @@ class StockSimulator:
                     if bought_shares > 0:
                         buy_amount = bought_shares * buy_price
 
-                        curr_holdings[symbol] += bought_shares
+                        if not holdings[column]:
+                            num_opened += 1
+                            opened[column] = num_opened
+                        holdings[column] += bought_shares
                         cash -= buy_amount
 
                         buy_action = StockAction(
                             side=StockSide.BUY, dt=dt, shares=bought_shares, price=buy_price)
 
                         day_actions.append(buy_action)
-                        history[symbol].append(buy_action)
+                        history.add(symbol, buy_action)
+                        self._entry_strategy.on_trade(symbol, buy_action)
+                        self._exit_strategy.on_trade(symbol, buy_action)
 
             # fees
             day_fees = self._broker.calc_fees(day_actions)
             cash -= day_fees
 
             # valuation
-            valuation = cash
-            for symbol, bought_shares in curr_holdings.items():
-                price = prices_df.loc[dt, symbol]
-                valuation += bought_shares * price
-
-            account.at[dt] = [valuation, ','.join(curr_holdings.keys())]
+            held = _in_order(np.flatnonzero(holdings), opened)
+            values[day] = cash + holdings[held] @ day_prices[held]
+            held_symbols.append(",".join(symbols[held]))
 
+        account = pd.DataFrame({"value": values, "holdings": held_symbols}, index=date_range)
         return account, history
+
+
+def _in_order(columns: np.ndarray, opened: np.ndarray) -> np.ndarray:
+    return columns[np.argsort(opened[columns], kind="stable")]
+
+
+def _window(prices: np.ndarray, date_range: pd.DatetimeIndex, symbols: np.ndarray, day: int,
+            columns: np.ndarray, lookback: Optional[int]) -> pd.DataFrame:
+    """
+    Prices of the last lookback days up to day (all days if None) for columns, as a DataFrame.
+    A view of prices if all columns are asked for in order, otherwise only the asked columns of the window are copied.
+    """
+    start = 0 if lookback is None else max(day + 1 - lookback, 0)
+    all_columns = len(columns) == len(symbols) and (columns == np.arange(len(symbols))).all()
+    values = prices[start:day + 1] if all_columns else prices[start:day + 1, columns]
+    return pd.DataFrame(values, index=date_range[start:day + 1], columns=symbols[columns], copy=False)
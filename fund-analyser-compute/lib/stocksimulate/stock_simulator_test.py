@@ -0,0 +1,133 @@
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from overrides import overrides
+
+from lib.stock import stock_cache
+from lib.stocksimulate.broker.stock_broker import CharlesSchwab, IBKRPro, Trading212
+from lib.stocksimulate.stock_history import TradeHistory
+from lib.stocksimulate.stock_simulator import StockSimulator
+from lib.stocksimulate.stock_trade import StockAction, StockSide
+from lib.stocksimulate.strategy.stock_strategy import Confidences, DailyPanel, StockStrategy
+
+DATES = pd.date_range("2021-01-04", periods=5, freq="B")
+PRICES_DF = pd.DataFrame({"A": [10.0, 11, 12, 13, 14],
+                          "B": [20.0, 20, 30, 40, 50],
+                          "C": [5.0, 4, 3, 2, 1]}, index=DATES)
+
+
+class ScheduledStrategy(StockStrategy):
+    """
+    Executes the given confidences on each date, and records the prices_df it was given.
+    """
+
+    def __init__(self, schedule: Dict[pd.Timestamp, Confidences], lookback: Optional[int]):
+        self._schedule = schedule
+        self._lookback = lookback
+        self.windows: List[Tuple[pd.Timestamp, List[pd.Timestamp], List[str]]] = []
+
+    @overrides
+    def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
+        self.windows.append((dt, list(prices_df.index), list(prices_df.columns)))
+        return {symbol: confidence for symbol, confidence in self._schedule.get(dt, dict()).items()
+                if symbol in prices_df.columns}
+
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return self._lookback
+
+
+def test_run(monkeypatch):
+    monkeypatch.setattr(stock_cache, "get_prices", lambda symbols: (PRICES_DF[symbols], PRICES_DF[symbols]))
+    entry_strategy = ScheduledStrategy({DATES[0]: {"C": 1, "A": 1}, DATES[2]: {"B": 1, "C": 1}}, lookback=2)
+    exit_strategy = ScheduledStrategy({DATES[1]: {"C": 1}, DATES[3]: {"A": 0.5}}, lookback=None)
+
+    account, history = StockSimulator(["A", "B", "C"], entry_strategy, exit_strategy, Trading212()).run(
+        DATES[0].date(), DATES[-1].date())
+
+    # day 0: buy 5 A @ 10, 10 C @ 5. day 1: sell 10 C @ 4, 40 cash
+    # day 2: buy 20 / 30 B and 20 / 3 C, all cash. day 3: sell 2.5 A @ 13, 32.5 cash. day 4: nothing
+    np.testing.assert_allclose(account["value"], [100, 95, 100, 2.5 * 13 + 32.5 + 80 / 3 + 40 / 3,
+                                                  2.5 * 14 + 32.5 + 100 / 3 + 20 / 3])
+    assert account["holdings"].tolist() == ["C,A", "A", "A,B,C", "A,B,C", "A,B,C"]
+    assert history == {
+        "A": [StockAction(side=StockSide.BUY, dt=DATES[0], shares=5, price=10),
+              StockAction(side=StockSide.SELL, dt=DATES[3], shares=2.5, price=13)],
+        "B": [StockAction(side=StockSide.BUY, dt=DATES[2], shares=20 / 30, price=30)],
+        "C": [StockAction(side=StockSide.BUY, dt=DATES[0], shares=10, price=5),
+              StockAction(side=StockSide.SELL, dt=DATES[1], shares=10, price=4),
+              StockAction(side=StockSide.BUY, dt=DATES[2], shares=20 / 3, price=3)]
+    }
+
+    # entry sees the last 2 days of symbols not just sold, exit sees all days of held symbols in order of purchase
+    assert entry_strategy.windows == [(DATES[0], list(DATES[:1]), ["A", "B", "C"]),
+                                      (DATES[1], list(DATES[:2]), ["A", "B"]),
+                                      (DATES[2], list(DATES[1:3]), ["A", "B", "C"]),
+                                      (DATES[3], list(DATES[2:4]), ["B", "C"]),
+                                      (DATES[4], list(DATES[3:5]), ["A", "B", "C"])]
+    assert exit_strategy.windows == [(DATES[1], list(DATES[:2]), ["C", "A"]),
+                                     (DATES[2], list(DATES[:3]), ["A"]),
+                                     (DATES[3], list(DATES[:4]), ["A", "B", "C"]),
+                                     (DATES[4], list(DATES[:5]), ["A", "B", "C"])]
+
+
+def test_run_whole_shares(monkeypatch):
+    monkeypatch.setattr(stock_cache, "get_prices", lambda symbols: (PRICES_DF[symbols], PRICES_DF[symbols]))
+    entry_strategy = ScheduledStrategy({DATES[0]: {"B": 1}}, lookback=1)
+    exit_strategy = ScheduledStrategy(dict(), lookback=1)
+
+    account, history = StockSimulator(["B"], entry_strategy, exit_strategy, CharlesSchwab(), initial_cash=50).run(
+        DATES[0].date(), DATES[-1].date())
+
+    np.testing.assert_allclose(account["value"], [50, 50, 70, 90, 110])
+    assert history == {"B": [StockAction(side=StockSide.BUY, dt=DATES[0], shares=2, price=20)]}
+
+
+def test_run_fees(monkeypatch):
+    monkeypatch.setattr(stock_cache, "get_prices", lambda symbols: (PRICES_DF[symbols], PRICES_DF[symbols]))
+    entry_strategy = ScheduledStrategy({DATES[0]: {"C": 1, "A": 1}}, lookback=1)
+    exit_strategy = ScheduledStrategy({DATES[1]: {"C": 1}}, lookback=1)
+    broker = IBKRPro()
+
+    account, history = StockSimulator(["A", "B", "C"], entry_strategy, exit_strategy, broker).run(
+        DATES[0].date(), DATES[-1].date())
+
+    # day 0: 1.0 minimum fees on 100 bought. day 1: 1% of 40 sold
+    np.testing.assert_allclose(history.calc_fees(broker), [1, 0.4, 0, 0, 0])
+    np.testing.assert_allclose(account["value"], [99, 100 - 1 - 10 - 0.4 + 5, 100 - 1 - 10 - 0.4 + 10,
+                                                  100 - 1 - 10 - 0.4 + 15, 100 - 1 - 10 - 0.4 + 20])
+
+
+class PrecomputedStrategy(StockStrategy):
+    """
+    Buys symbols that rose on the day, from a DailyPanel precomputed over all simulated days.
+    """
+
+    @overrides
+    def on_data_ready(self, data: StockSimulator.Data) -> None:
+        self.data = data
+        self._rose = DailyPanel(data.prices_df.diff().gt(0))
+
+    @overrides
+    def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
+        return self._rose.get(dt, prices_df.columns).astype('int').to_dict()
+
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
+
+
+def test_run_precomputed(monkeypatch):
+    monkeypatch.setattr(stock_cache, "get_prices", lambda symbols: (PRICES_DF[symbols], PRICES_DF[symbols]))
+    entry_strategy = PrecomputedStrategy()
+
+    account, history = StockSimulator(["A", "B", "C"], entry_strategy, ScheduledStrategy(dict(), lookback=1),
+                                      Trading212()).run(DATES[1].date(), DATES[3].date())
+
+    pd.testing.assert_frame_equal(entry_strategy.data.prices_df, PRICES_DF.loc[DATES[1]:DATES[3]], check_freq=False)
+    # nothing before the first simulated day to compare with, then A and B rise, and all cash is spent on day 2
+    assert account["holdings"].tolist() == ["", "A,B", "A,B"]
+    assert history == {"A": [StockAction(side=StockSide.BUY, dt=DATES[2], shares=50 / 12, price=12)],
+                       "B": [StockAction(side=StockSide.BUY, dt=DATES[2], shares=50 / 30, price=30)]}
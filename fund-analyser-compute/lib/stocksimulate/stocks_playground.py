@@ -1,125 +1,232 @@
 import logging
 import sys
 from datetime import date, datetime
+from typing import Optional
 
 import matplotlib
 import matplotlib.pyplot as plt
-import numpy as np
 import pandas as pd
 from ffn import calc_max_drawdown
 from overrides import overrides
 
-from lib.indicators.indicator_utils import bollinger_bands
 from lib.stock import stock_cache
 from lib.stocksimulate.broker.stock_broker import Trading212
-from lib.stocksimulate.stock_history import last_bought_date, TradeHistory
+from lib.stocksimulate.stock_history import TradeHistory
+from lib.stocksimulate.stock_positions import Positions
 from lib.stocksimulate.stock_simulator import StockSimulator
-from lib.stocksimulate.strategy.stock_strategy import Confidences, StockStrategy
+from lib.stocksimulate.stock_trade import StockAction, StockSide
+from lib.stocksimulate.strategy.stock_strategy import Confidences, DailyPanel, StockStrategy
 from lib.util.dates import BDAY
 from lib.util.lang import intersection
 from lib.util.logging_utils import log_debug
 
+SP500_SYMBOLS = ["AAPL", "MSFT", "AMZN", "GOOGL", "BRK.B", "TSLA", "NVDA", "GOOG", "UNH", "XOM", "JNJ", "JPM",
+                 "META", "V", "PG", "HD", "MA", "CVX", "MRK", "ABBV", "LLY", "PEP", "BAC", "PFE", "KO", "AVGO",
+                 "COST", "TMO", "WMT", "CSCO", "MCD", "DIS", "ABT", "WFC", "ACN", "VZ", "CMCSA", "DHR", "CRM",
+                 "LIN", "ADBE", "TXN", "PM", "BMY", "NKE", "NFLX", "RTX", "NEE", "QCOM", "T", "ORCL", "HON", "COP",
+                 "UPS", "MS", "AMGN", "LOW", "CAT", "AMD", "GS", "SCHW", "SBUX", "IBM", "UNP", "DE", "ELV", "SPGI",
+                 "BA", "CVS", "INTU", "PLD", "MDT", "LMT", "INTC", "GILD", "AXP", "BLK", "C", "ADI", "AMAT", "BKNG",
+                 "AMT", "ADP", "GE", "MDLZ", "TJX", "CI", "NOW", "TMUS", "SYK", "CB", "PYPL", "MO", "PGR", "ISRG",
+                 "MMC", "REGN", "ZTS", "TGT", "VRTX", "DUK", "SLB", "FISV", "SO", "NOC", "EOG", "BDX", "ETN", "CME",
+                 "BSX", "ITW", "LRCX", "EQIX", "USB", "HUM", "AON", "CSX", "PNC", "TFC", "CL", "MU", "APD", "MMM",
+                 "FCX", "CCI", "GM", "ICE", "MPC", "EL", "WM", "ATVI", "HCA", "SNPS", "KLAC", "CDNS", "ORLY", "GD",
+                 "SHW", "MRNA", "MCK", "NSC", "DG", "VLO", "PXD", "SRE", "AZO", "FDX", "EMR", "F", "D", "GIS",
+                 "PSX", "MET", "ADSK", "AEP", "EW", "NXPI", "MCO", "PSA", "APH", "MAR", "AIG", "ADM", "ROP", "CTVA",
+                 "TRV", "PH", "MSI", "MCHP", "DXCM", "KMB", "CMG", "JCI", "NUE", "OXY", "A", "MSCI", "TT", "COF",
+                 "EXC", "CNC", "CHTR", "O", "DOW", "LHX", "TEL", "FIS", "IDXX", "BIIB", "SYY", "HLT", "SPG", "FTNT",
+                 "ROST", "MNST", "IQV", "AFL", "ECL", "AJG", "PCAR", "TDG", "WMB", "CTAS", "HES", "BK", "YUM",
+                 "AMP", "CARR", "XEL", "PRU", "DD", "STZ", "ALL", "WELL", "PAYX", "HSY", "CMI", "DVN", "NEM",
+                 "OTIS", "KMI", "ON", "WBD", "CTSH", "ANET", "ROK", "ED", "MTD", "AME", "HAL", "STT", "VICI",
+                 "ILMN", "GPN", "APTV", "KHC", "RMD", "ODFL", "URI", "DLR", "PEG", "DLTR", "BKR", "KDP", "PPG",
+                 "DFS", "CPRT", "GWW", "OKE", "EA", "CSGP", "FAST", "KR", "ALB", "WEC", "DHI", "KEYS", "SBAC",
+                 "ULTA", "CBRE", "ENPH", "CDW", "VRSK", "ES", "MTB", "AWK", "RSG", "HPQ", "IT", "EBAY", "GEHC",
+                 "GLW", "ZBH", "ABC", "WTW", "WBA", "TSCO", "CEG", "EIX", "TROW", "EFX", "ACGL", "PCG", "HIG",
+                 "AVB", "FITB", "GPC", "LEN", "FANG", "IFF", "LYB", "VMC", "FTV", "DAL", "ARE", "IR", "ANSS", "WY",
+                 "FRC", "WST", "MLM", "AEE", "ALGN", "LH", "ETR", "RF", "EQR", "DTE", "FE", "MPWR", "HBAN", "RJF",
+                 "DOV", "PWR", "BAX", "CFG", "EXR", "PFG", "CAH", "HPE", "PPL", "CHD", "HOLX", "STLD", "LUV", "TDY",
+                 "CINF", "VTR", "NTRS", "NDAQ", "WAT", "MKC", "VRSN", "WAB", "LVS", "OMC", "MAA", "CLX", "INVH",
+                 "CTRA", "STE", "XYL", "DRI", "BALL", "TSN", "CNP", "EPAM", "SWKS", "K", "CMS", "TTWO", "MOS",
+                 "CAG", "EXPD", "MOH", "TRGP", "CF", "IEX", "BR", "KEY", "BBY", "DGX", "AMCR", "AES", "SIVB", "COO",
+                 "SEDG", "FSLR", "FMC", "ETSY", "PKI", "EXPE", "ATO", "SYF", "SJM", "MRO", "UAL", "FDS", "TER",
+                 "ZBRA", "FLT", "RCL", "TXT", "NVR", "HWM", "J", "JBHT", "GRMN", "RE", "AVY", "ESS", "LKQ", "INCY",
+                 "NTAP", "PAYC", "IRM", "LW", "IPG", "POOL", "MGM", "TYL", "EVRG", "VTRS", "LDOS", "WRB", "CBOE",
+                 "UDR", "PTC", "PEAK", "MKTX", "TRMB", "LNT", "HRL", "IP", "BRO", "SNA", "STX", "PKG", "SWK", "DPZ",
+                 "KIM", "CPT", "CHRW", "APA", "MTCH", "WDC", "PHM", "AKAM", "JKHY", "CTLT", "HST", "MAS", "NDSN",
+                 "BWA", "GEN", "L", "BF.B", "PARA", "EQT", "CZR", "TECH", "CDAY", "CE", "HSIC", "WYNN", "KMX",
+                 "FOXA", "NI", "TFX", "GL", "CRL", "TPR", "CCL", "CPB", "LYV", "QRVO", "EMN", "BIO", "JNPR", "ALLE",
+                 "AAL", "TAP", "UHS", "BXP", "BBWI", "REG", "CMA", "PNR", "RHI", "HII", "AAP", "FFIV", "AOS", "PNW",
+                 "ROL", "BEN", "VFC", "WRK", "IVZ", "NRG", "FRT", "WHR", "XRAY", "ZION", "GNRC", "HAS", "SBNY",
+                 "SEE", "NCLH", "AIZ", "NWSA", "OGN", "DXC", "ALK", "MHK", "NWL", "RL", "LNC", "FOX", "DVA", "LUMN",
+                 "DISH", "NWS"]
+
 
 class AlwaysEntryStrategy(StockStrategy):
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
         return {symbol: 1 for symbol in prices_df.columns}
 
 
 class TrailingExitStrategy(StockStrategy):
+    @overrides
+    def on_data_ready(self, data: StockSimulator.Data) -> None:
+        self._positions = Positions(data.prices_df)
+
+    @overrides
+    def on_trade(self, symbol: str, action: StockAction) -> None:
+        if action.side == StockSide.BUY:
+            self._positions.on_buy(symbol, action.dt)
+
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
         threshold = 0.05  # 5%
         log_debug(f"Trailing exit for date {dt}")
 
-        prices_df_since_bought = prices_df.copy()
-        for symbol in prices_df.columns:
-            bought_dt = last_bought_date(symbol, history)
-            prices_df_since_bought.loc[:bought_dt, symbol] = np.nan  # type: ignore
-        thresholds = prices_df_since_bought.loc[:dt, :].max() * (1 - threshold)  # type: ignore
+        prices, bought_prices, max_prices = self._positions.update(dt, prices_df.columns)
+        thresholds = max_prices * (1 - threshold)
 
-        return prices_df.loc[dt, :].lt(thresholds).astype('int').to_dict()
+        return dict(zip(prices_df.columns, (prices < thresholds).astype('int').tolist()))
 
 
 class ProfitTrailingExitStrategy(StockStrategy):
+    @overrides
+    def on_data_ready(self, data: StockSimulator.Data) -> None:
+        self._positions = Positions(data.prices_df)
+
+    @overrides
+    def on_trade(self, symbol: str, action: StockAction) -> None:
+        if action.side == StockSide.BUY:
+            self._positions.on_buy(symbol, action.dt)
+
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
         profit_exit_threshold = 0.01  # 2%
         stop_loss_threshold = 0.005  # 1%
         log_debug(f"Profit trailing exit for date {dt}")
 
-        prices_df_since_bought = prices_df.copy()
-        bought_prices_df = prices_df.copy()
-        for symbol in prices_df.columns:
-            bought_dt = last_bought_date(symbol, history)
-            prices_df_since_bought.loc[:bought_dt, symbol] = np.nan  # type: ignore
+        prices, bought_prices, max_prices = self._positions.update(dt, prices_df.columns)
+        profit_exit_thresholds = bought_prices * (1 + profit_exit_threshold)
+        stop_loss_thresholds = max_prices * (1 - stop_loss_threshold)
 
-            bought_prices_df.loc[:bought_dt, symbol] = np.nan
-            bought_prices_df.loc[bought_dt:, symbol] = prices_df.loc[bought_dt, symbol]
+        return dict(zip(prices_df.columns,
+                        ((prices >= profit_exit_thresholds) | (prices < stop_loss_thresholds)).astype('int').tolist()))
 
-        profit_exit_thresholds = bought_prices_df.loc[dt, :] * (1 + profit_exit_threshold)
-        stop_loss_thresholds = prices_df_since_bought.loc[:dt, :].max() * (1 - stop_loss_threshold)  # type: ignore
 
-        return (
-                (prices_df.loc[dt, :].ge(profit_exit_thresholds)) |
-                (prices_df.loc[dt, :].lt(stop_loss_thresholds))
-        ).astype('int').to_dict()
+class BollingerLowEntryStrategy(StockStrategy):
+    @overrides
+    def on_data_ready(self, data: StockSimulator.Data) -> None:
+        upper_band, middle_band, lower_band = data.features.bollinger_bands(stdev=1)
+        self._cond = DailyPanel(data.prices_df.lt(lower_band) & data.prices_df.diff().gt(0))
 
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
 
-class BollingerLowEntryStrategy(StockStrategy):
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
         log_debug(f"BollingerLowEntryStrategy for date: {dt}")
-        upper_band, middle_band, lower_band = bollinger_bands(prices_df, stdev=1)
-        cond = prices_df.lt(lower_band) & prices_df.diff().gt(0)
-        return cond.loc[dt, :].astype('int').to_dict()
+        return self._cond.get(dt, prices_df.columns).astype('int').to_dict()
 
 
 class BollingerHighExitStrategy(StockStrategy):
+    @overrides
+    def on_data_ready(self, data: StockSimulator.Data) -> None:
+        upper_band, middle_band, lower_band = data.features.bollinger_bands()
+        self._cond = DailyPanel(data.prices_df.gt(upper_band))
+
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
-        upper_band, middle_band, lower_band = bollinger_bands(prices_df)
-        return prices_df.gt(upper_band).loc[dt, :].astype('int').to_dict()
+        return self._cond.get(dt, prices_df.columns).astype('int').to_dict()
 
 
 class WorstFallEntryStrategy(StockStrategy):
+    @overrides
+    def on_data_ready(self, data: StockSimulator.Data) -> None:
+        self._pct_change = DailyPanel(data.features.pct_change())
+
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
         log_debug(f"WorstFallEntryStrategy for date: {dt}")
-        return prices_df.pct_change(1).loc[dt, :].nsmallest(10).lt(0).astype('int').to_dict()
+        return self._pct_change.get(dt, prices_df.columns).nsmallest(10).lt(0).astype('int').to_dict()
 
 
 class HighestRiseEntryStrategy(StockStrategy):
+    @overrides
+    def on_data_ready(self, data: StockSimulator.Data) -> None:
+        self._pct_change = DailyPanel(data.features.pct_change())
+
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
         log_debug(f"HighestRiseEntryStrategy for date: {dt}")
-        return prices_df.pct_change(1).loc[dt, :].nlargest(20).gt(0).astype('int').to_dict()
+        return self._pct_change.get(dt, prices_df.columns).nlargest(20).gt(0).astype('int').to_dict()
 
 
 class RisingEntryStrategy(StockStrategy):
+    @overrides
+    def on_data_ready(self, data: StockSimulator.Data) -> None:
+        self._cond = DailyPanel(data.prices_df.pct_change(5).gt(0.5))
+
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
-        return prices_df.pct_change(5).gt(0.5).loc[dt, :].astype('int').to_dict()
+        return self._cond.get(dt, prices_df.columns).astype('int').to_dict()
 
 
 class ContinuousRiseEntryStrategy(StockStrategy):
+    @overrides
+    def on_data_ready(self, data: StockSimulator.Data) -> None:
+        prices_df = data.prices_df
+        lookback = 60
+        # risen since lookback days ago (up to 10 days ago), then every day of the last 9
+        continuous_rise_df = (prices_df.diff(lookback - 10).shift(9).gt(0)
+                              & prices_df.diff().gt(0).rolling(9).sum().eq(9))
+        continuous_rise_df.iloc[:lookback, :] = False  # needs more than lookback days
+        self._continuous_rise = DailyPanel(continuous_rise_df)
+        self._pct_change = DailyPanel(prices_df.pct_change(lookback))
+
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
         log_debug(f"ContinuousRiseEntryStrategy for date: {dt}")
-        recent_df = prices_df.loc[:dt, :]  # type: ignore
-        lookback = 60
-        if len(recent_df) <= lookback:
-            return {}
-        else:
-            continuous_rise_df = recent_df.iloc[[-lookback, -10, -9, -8, -7, -6, -5, -4, -3, -2, -1], :].diff().iloc[1:,
-                                 :].gt(
-                0).all()
-            continuous_rise_symbols = continuous_rise_df[continuous_rise_df].index
-            return prices_df.pct_change(lookback).loc[dt, continuous_rise_symbols].nlargest(10).gt(0).astype(
-                'int').to_dict()
+        continuous_rise = self._continuous_rise.get(dt, prices_df.columns)
+        continuous_rise_symbols = continuous_rise[continuous_rise].index
+        return self._pct_change.get(dt, continuous_rise_symbols).nlargest(10).gt(0).astype('int').to_dict()
 
 
 class AbsRisingEntryStrategy(StockStrategy):
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 3
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
         window = prices_df.loc[dt - 2 * BDAY: dt, :]  # type: ignore
@@ -128,20 +235,38 @@ class AbsRisingEntryStrategy(StockStrategy):
 
 
 class AboveMaxEntryStrategy(StockStrategy):
+    @overrides
+    def on_data_ready(self, data: StockSimulator.Data) -> None:
+        self._cond = DailyPanel(data.prices_df.eq(data.prices_df.cummax()))
+
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
-        max_prices_df = prices_df.loc[:dt, :].max()  # type: ignore
-        return prices_df.loc[dt, :].eq(max_prices_df).astype('int').to_dict()
+        return self._cond.get(dt, prices_df.columns).astype('int').to_dict()
 
 
 class BelowMaxExitStrategy(StockStrategy):
+    @overrides
+    def on_data_ready(self, data: StockSimulator.Data) -> None:
+        self._cond = DailyPanel(data.prices_df.lt(data.prices_df.cummax()))
+
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
-        max_prices_df = prices_df.loc[:dt, :].max()  # type: ignore
-        return prices_df.loc[dt, :].lt(max_prices_df).astype('int').to_dict()
+        return self._cond.get(dt, prices_df.columns).astype('int').to_dict()
 
 
 class AbsFallingExitStrategy(StockStrategy):
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 2
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
         window = prices_df.loc[dt - BDAY: dt, :]  # type: ignore
@@ -150,17 +275,15 @@ class AbsFallingExitStrategy(StockStrategy):
 
 
 class HoldingDaysExitStrategy(StockStrategy):
+    @overrides
+    def get_lookback(self) -> Optional[int]:
+        return 1
+
     @overrides
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
         hold_days = 1  # business days
-        confidences: Confidences = {}
-        for symbol in prices_df.columns:
-            bought_dt = last_bought_date(symbol, history)
-            if bought_dt + hold_days * BDAY <= dt:
-                confidences[symbol] = 1
-            else:
-                confidences[symbol] = 0
-        return confidences
+        held_long_enough = history.last_bought_dates(prices_df.columns) + hold_days * BDAY <= dt
+        return dict(zip(prices_df.columns, held_long_enough.astype('int').tolist()))
 
 
 def _describe_and_plot(account: pd.DataFrame) -> None:
@@ -177,46 +300,8 @@ def _describe_and_plot(account: pd.DataFrame) -> None:
 
 
 if __name__ == "__main__":
-    sp500_symbols = ["AAPL", "MSFT", "AMZN", "GOOGL", "BRK.B", "TSLA", "NVDA", "GOOG", "UNH", "XOM", "JNJ", "JPM",
-                     "META", "V", "PG", "HD", "MA", "CVX", "MRK", "ABBV", "LLY", "PEP", "BAC", "PFE", "KO", "AVGO",
-                     "COST", "TMO", "WMT", "CSCO", "MCD", "DIS", "ABT", "WFC", "ACN", "VZ", "CMCSA", "DHR", "CRM",
-                     "LIN", "ADBE", "TXN", "PM", "BMY", "NKE", "NFLX", "RTX", "NEE", "QCOM", "T", "ORCL", "HON", "COP",
-                     "UPS", "MS", "AMGN", "LOW", "CAT", "AMD", "GS", "SCHW", "SBUX", "IBM", "UNP", "DE", "ELV", "SPGI",
-                     "BA", "CVS", "INTU", "PLD", "MDT", "LMT", "INTC", "GILD", "AXP", "BLK", "C", "ADI", "AMAT", "BKNG",
-                     "AMT", "ADP", "GE", "MDLZ", "TJX", "CI", "NOW", "TMUS", "SYK", "CB", "PYPL", "MO", "PGR", "ISRG",
-                     "MMC", "REGN", "ZTS", "TGT", "VRTX", "DUK", "SLB", "FISV", "SO", "NOC", "EOG", "BDX", "ETN", "CME",
-                     "BSX", "ITW", "LRCX", "EQIX", "USB", "HUM", "AON", "CSX", "PNC", "TFC", "CL", "MU", "APD", "MMM",
-                     "FCX", "CCI", "GM", "ICE", "MPC", "EL", "WM", "ATVI", "HCA", "SNPS", "KLAC", "CDNS", "ORLY", "GD",
-                     "SHW", "MRNA", "MCK", "NSC", "DG", "VLO", "PXD", "SRE", "AZO", "FDX", "EMR", "F", "D", "GIS",
-                     "PSX", "MET", "ADSK", "AEP", "EW", "NXPI", "MCO", "PSA", "APH", "MAR", "AIG", "ADM", "ROP", "CTVA",
-                     "TRV", "PH", "MSI", "MCHP", "DXCM", "KMB", "CMG", "JCI", "NUE", "OXY", "A", "MSCI", "TT", "COF",
-                     "EXC", "CNC", "CHTR", "O", "DOW", "LHX", "TEL", "FIS", "IDXX", "BIIB", "SYY", "HLT", "SPG", "FTNT",
-                     "ROST", "MNST", "IQV", "AFL", "ECL", "AJG", "PCAR", "TDG", "WMB", "CTAS", "HES", "BK", "YUM",
-                     "AMP", "CARR", "XEL", "PRU", "DD", "STZ", "ALL", "WELL", "PAYX", "HSY", "CMI", "DVN", "NEM",
-                     "OTIS", "KMI", "ON", "WBD", "CTSH", "ANET", "ROK", "ED", "MTD", "AME", "HAL", "STT", "VICI",
-                     "ILMN", "GPN", "APTV", "KHC", "RMD", "ODFL", "URI", "DLR", "PEG", "DLTR", "BKR", "KDP", "PPG",
-                     "DFS", "CPRT", "GWW", "OKE", "EA", "CSGP", "FAST", "KR", "ALB", "WEC", "DHI", "KEYS", "SBAC",
-                     "ULTA", "CBRE", "ENPH", "CDW", "VRSK", "ES", "MTB", "AWK", "RSG", "HPQ", "IT", "EBAY", "GEHC",
-                     "GLW", "ZBH", "ABC", "WTW", "WBA", "TSCO", "CEG", "EIX", "TROW", "EFX", "ACGL", "PCG", "HIG",
-                     "AVB", "FITB", "GPC", "LEN", "FANG", "IFF", "LYB", "VMC", "FTV", "DAL", "ARE", "IR", "ANSS", "WY",
-                     "FRC", "WST", "MLM", "AEE", "ALGN", "LH", "ETR", "RF", "EQR", "DTE", "FE", "MPWR", "HBAN", "RJF",
-                     "DOV", "PWR", "BAX", "CFG", "EXR", "PFG", "CAH", "HPE", "PPL", "CHD", "HOLX", "STLD", "LUV", "TDY",
-                     "CINF", "VTR", "NTRS", "NDAQ", "WAT", "MKC", "VRSN", "WAB", "LVS", "OMC", "MAA", "CLX", "INVH",
-                     "CTRA", "STE", "XYL", "DRI", "BALL", "TSN", "CNP", "EPAM", "SWKS", "K", "CMS", "TTWO", "MOS",
-                     "CAG", "EXPD", "MOH", "TRGP", "CF", "IEX", "BR", "KEY", "BBY", "DGX", "AMCR", "AES", "SIVB", "COO",
-                     "SEDG", "FSLR", "FMC", "ETSY", "PKI", "EXPE", "ATO", "SYF", "SJM", "MRO", "UAL", "FDS", "TER",
-                     "ZBRA", "FLT", "RCL", "TXT", "NVR", "HWM", "J", "JBHT", "GRMN", "RE", "AVY", "ESS", "LKQ", "INCY",
-                     "NTAP", "PAYC", "IRM", "LW", "IPG", "POOL", "MGM", "TYL", "EVRG", "VTRS", "LDOS", "WRB", "CBOE",
-                     "UDR", "PTC", "PEAK", "MKTX", "TRMB", "LNT", "HRL", "IP", "BRO", "SNA", "STX", "PKG", "SWK", "DPZ",
-                     "KIM", "CPT", "CHRW", "APA", "MTCH", "WDC", "PHM", "AKAM", "JKHY", "CTLT", "HST", "MAS", "NDSN",
-                     "BWA", "GEN", "L", "BF.B", "PARA", "EQT", "CZR", "TECH", "CDAY", "CE", "HSIC", "WYNN", "KMX",
-                     "FOXA", "NI", "TFX", "GL", "CRL", "TPR", "CCL", "CPB", "LYV", "QRVO", "EMN", "BIO", "JNPR", "ALLE",
-                     "AAL", "TAP", "UHS", "BXP", "BBWI", "REG", "CMA", "PNR", "RHI", "HII", "AAP", "FFIV", "AOS", "PNW",
-                     "ROL", "BEN", "VFC", "WRK", "IVZ", "NRG", "FRT", "WHR", "XRAY", "ZION", "GNRC", "HAS", "SBNY",
-                     "SEE", "NCLH", "AIZ", "NWSA", "OGN", "DXC", "ALK", "MHK", "NWL", "RL", "LNC", "FOX", "DVA", "LUMN",
-                     "DISH", "NWS"]
     prices_df, volume_df = stock_cache.get_prices(symbols=None)
-    symbols = intersection(prices_df.columns, sp500_symbols)
+    symbols = intersection(prices_df.columns, SP500_SYMBOLS)
 
     start_date = datetime(2021, 1, 4)
     stock_simulator = StockSimulator(
@@ -233,5 +318,5 @@ if __name__ == "__main__":
                           start_date:start_date, symbols  # type: ignore
                           ].squeeze() * balance.at[start_date]
 
-_describe_and_plot(account)
-# pd.concat([stocks_adjusted, balance], axis=1).plot()
+    _describe_and_plot(account)
+    # pd.concat([stocks_adjusted, balance], axis=1).plot()
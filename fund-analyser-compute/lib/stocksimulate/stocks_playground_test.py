@@ -0,0 +1,27 @@
+import pandas as pd
+
+from lib.stocksimulate.stocks_playground import ProfitTrailingExitStrategy, SP500_SYMBOLS, TrailingExitStrategy
+from lib.stocksimulate.testing import RescanProfitTrailingExitStrategy, RescanTrailingExitStrategy, run_playground, \
+    synthetic_prices_df
+
+
+def test_trailing_exit():
+    prices_df = synthetic_prices_df(SP500_SYMBOLS[:100], 120)
+
+    rescan_account, rescan_history = run_playground(prices_df, RescanTrailingExitStrategy())
+    account, history = run_playground(prices_df, TrailingExitStrategy())
+
+    pd.testing.assert_frame_equal(account, rescan_account)
+    assert history == rescan_history
+    assert len(history)
+
+
+def test_profit_trailing_exit():
+    prices_df = synthetic_prices_df(SP500_SYMBOLS[:100], 120)
+
+    rescan_account, rescan_history = run_playground(prices_df, RescanProfitTrailingExitStrategy())
+    account, history = run_playground(prices_df, ProfitTrailingExitStrategy())
+
+    pd.testing.assert_frame_equal(account, rescan_account)
+    assert history == rescan_history
+    assert len(history)
@@ -1,10 +1,16 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
 from datetime import date
-from typing import Dict
+from typing import Dict, Optional, TYPE_CHECKING
 
 import pandas as pd
 
 from lib.stocksimulate.stock_history import TradeHistory
+from lib.stocksimulate.stock_trade import StockAction
+
+if TYPE_CHECKING:
+    from lib.stocksimulate.stock_simulator import StockSimulator
 
 Confidence = float
 
@@ -16,3 +22,49 @@ class StockStrategy(ABC):
     # return range between 0 and 1. 0 = don't execute. 1 = all in.
     def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
         pass
+
+    def on_data_ready(self, data: StockSimulator.Data) -> None:
+        """
+        Called once before the simulation starts, with prices over all simulated days,
+        e.g. to precompute indicators into DailyPanels for should_execute() to look up.
+        Indicators must only look at prices up to each day (e.g. rolling, pct_change), never ahead.
+        """
+        pass
+
+    def on_trade(self, symbol: str, action: StockAction) -> None:
+        """
+        Called on every buy and sell of the simulation as it happens, e.g. to keep running state of positions
+        rather than scanning history in should_execute().
+        """
+        pass
+
+    def get_lookback(self) -> Optional[int]:
+        """
+        Number of latest days (including dt) of prices_df that should_execute() looks at,
+        or None if it needs all prices since the start of the simulation.
+        """
+        return None
+
+
+class DailyPanel:
+    """
+    Panel of values (days x symbols), e.g. an indicator precomputed in on_data_ready(), looked up one day at a time.
+    """
+
+    def __init__(self, panel_df: pd.DataFrame):
+        self._values = panel_df.to_numpy()
+        self._columns = panel_df.columns
+        self._rows = {dt: row for row, dt in enumerate(panel_df.index)}
+        self._column_ilocs = {symbol: column for column, symbol in enumerate(panel_df.columns)}
+
+    def get(self, dt: date, symbols: pd.Index) -> pd.Series:
+        """
+        Returns the values on dt of symbols.
+        :param dt: day of the panel
+        :param symbols: symbols of the panel, e.g. prices_df.columns in should_execute()
+        :return: values by symbol
+        """
+        row = self._values[self._rows[dt]]
+        if symbols.equals(self._columns):
+            return pd.Series(row, index=symbols)
+        return pd.Series(row[[self._column_ilocs[symbol] for symbol in symbols]], index=symbols, dtype=row.dtype)
@@ -0,0 +1,13 @@
+import pandas as pd
+
+from lib.stocksimulate.strategy.stock_strategy import DailyPanel
+
+
+def test_daily_panel():
+    dates = pd.date_range("2021-01-04", periods=3, freq="B")
+    panel = DailyPanel(pd.DataFrame({"A": [1, 2, 3], "B": [4, 5, 6], "C": [7, 8, 9]}, index=dates))
+
+    pd.testing.assert_series_equal(panel.get(dates[1], pd.Index(["A", "B", "C"])),
+                                   pd.Series([2, 5, 8], index=["A", "B", "C"]))
+    pd.testing.assert_series_equal(panel.get(dates[2], pd.Index(["C", "A"])), pd.Series([9, 3], index=["C", "A"]))
+    assert panel.get(dates[0], pd.Index([])).empty
@@ -0,0 +1,81 @@
+from datetime import date
+from typing import List, Tuple
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from overrides import overrides
+
+from lib.stock import stock_cache
+from lib.stocksimulate.broker.stock_broker import Trading212
+from lib.stocksimulate.stock_history import TradeHistory
+from lib.stocksimulate.stock_simulator import StockSimulator
+from lib.stocksimulate.stocks_playground import WorstFallEntryStrategy
+from lib.stocksimulate.strategy.stock_strategy import Confidences, StockStrategy
+
+
+class RescanTrailingExitStrategy(StockStrategy):
+    """
+    TrailingExitStrategy as it was, rescanning history and all prices so far every day.
+    """
+
+    @overrides
+    def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
+        threshold = 0.05
+
+        prices_df_since_bought = prices_df.copy()
+        for symbol in prices_df.columns:
+            bought_dt = history.last_bought_date(symbol)
+            prices_df_since_bought.loc[:bought_dt, symbol] = np.nan  # type: ignore
+        thresholds = prices_df_since_bought.loc[:dt, :].max() * (1 - threshold)  # type: ignore
+
+        return prices_df.loc[dt, :].lt(thresholds).astype('int').to_dict()
+
+
+class RescanProfitTrailingExitStrategy(StockStrategy):
+    """
+    ProfitTrailingExitStrategy as it was, rescanning history and all prices so far every day.
+    """
+
+    @overrides
+    def should_execute(self, dt: date, prices_df: pd.DataFrame, history: TradeHistory) -> Confidences:
+        profit_exit_threshold = 0.01
+        stop_loss_threshold = 0.005
+
+        prices_df_since_bought = prices_df.copy()
+        bought_prices_df = prices_df.copy()
+        for symbol in prices_df.columns:
+            bought_dt = history.last_bought_date(symbol)
+            prices_df_since_bought.loc[:bought_dt, symbol] = np.nan  # type: ignore
+
+            bought_prices_df.loc[:bought_dt, symbol] = np.nan
+            bought_prices_df.loc[bought_dt:, symbol] = prices_df.loc[bought_dt, symbol]
+
+        profit_exit_thresholds = bought_prices_df.loc[dt, :] * (1 + profit_exit_threshold)
+        stop_loss_thresholds = prices_df_since_bought.loc[:dt, :].max() * (1 - stop_loss_threshold)  # type: ignore
+
+        return (
+                (prices_df.loc[dt, :].ge(profit_exit_thresholds)) |
+                (prices_df.loc[dt, :].lt(stop_loss_thresholds))
+        ).astype('int').to_dict()
+
+
+def synthetic_prices_df(symbols: List[str], num_days: int) -> pd.DataFrame:
+    """
+    Random walk prices of symbols over num_days business days, with the first symbols listed later.
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2021-01-04", periods=num_days, freq="B")
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (num_days, len(symbols))), axis=0))
+    prices[:num_days // 10, :len(symbols) // 50] = np.nan
+    return pd.DataFrame(prices, index=dates, columns=symbols)
+
+
+def run_playground(prices_df: pd.DataFrame, exit_strategy: StockStrategy) -> Tuple[pd.DataFrame, TradeHistory]:
+    """
+    Runs the playground's WorstFallEntryStrategy with exit_strategy over prices_df instead of cached prices.
+    """
+    symbols = list(prices_df.columns)
+    with mock.patch.object(stock_cache, "get_prices", lambda symbols: (prices_df[symbols], prices_df[symbols])):
+        stock_simulator = StockSimulator(symbols, WorstFallEntryStrategy(), exit_strategy, Trading212())
+    return stock_simulator.run(prices_df.index[0].date(), prices_df.index[-1].date())
@@ -1,9 +1,12 @@
+import glob
 import os
 import pickle
 import tempfile
-from typing import Any
+from typing import Any, List
+from uuid import uuid4
 
 import humanize
+import numpy as np
 
 from lib.util.logging_utils import log_debug
 
@@ -21,6 +24,41 @@ def read_from_disk(file_name: str) -> Any:
     return data
 
 
+def write_array_to_disk(file_name: str, arr: np.ndarray) -> None:
+    """
+    Writes a numeric array in .npy format, preserving its memory layout (C / Fortran order).
+    The file is written aside and then renamed, so that processes which have
+    already memory mapped a previous version keep reading consistent data.
+    """
+    staging_file_name = f"{file_name}.{uuid4().hex}.tmp"
+    with open(_get_tmp_file(staging_file_name), "wb") as file:
+        np.save(file, arr, allow_pickle=False)
+    os.replace(_get_tmp_file(staging_file_name), _get_tmp_file(file_name))
+    log_debug(f"Wrote {_get_file_size(file_name)} to array file: {_get_tmp_file(file_name)}")
+
+
+def read_array_from_disk(file_name: str) -> np.ndarray:
+    """
+    Opens an array written by write_array_to_disk as a read-only memory map.
+    Pages are loaded lazily and shared between all processes mapping the same file.
+    """
+    arr = np.load(_get_tmp_file(file_name), mmap_mode="r", allow_pickle=False)
+    log_debug(f"Mapped {_get_file_size(file_name)} from array file: {_get_tmp_file(file_name)}")
+    return arr
+
+
+def list_disk(pattern: str) -> List[str]:
+    return [os.path.basename(path) for path in glob.glob(_get_tmp_file(pattern))]
+
+
+def remove_from_disk(file_name: str) -> None:
+    try:
+        os.remove(_get_tmp_file(file_name))
+    except OSError as e:
+        # e.g. still mapped by another process on Windows, or already removed
+        log_debug(f"Failed to remove file: {_get_tmp_file(file_name)}. Cause: {repr(e)}")
+
+
 def _get_tmp_file(file_name: str) -> str:
     return os.path.join(tempfile.gettempdir(), file_name)
 
@@ -1,9 +1,10 @@
 from typing import Any
 from uuid import uuid4
 
+import numpy as np
 import pytest
 
-from lib.util.disk import write_to_disk, read_from_disk
+from lib.util.disk import read_array_from_disk, read_from_disk, remove_from_disk, write_array_to_disk, write_to_disk
 
 
 @pytest.mark.parametrize("data", [
@@ -17,3 +18,15 @@ def test_read_write_roundtrip(data: Any):
     data = None
     write_to_disk(file_name, data)
     return data == read_from_disk(file_name)
+
+
+def test_read_write_array_roundtrip():
+    file_name = f"{uuid4()}.npy"
+    arr = np.asfortranarray(np.arange(12, dtype=np.float64).reshape(4, 3))
+    write_array_to_disk(file_name, arr)
+    actual = read_array_from_disk(file_name)
+    assert isinstance(actual, np.memmap)
+    assert actual.flags.f_contiguous
+    assert not actual.flags.writeable
+    np.testing.assert_array_equal(actual, arr)
+    remove_from_disk(file_name)
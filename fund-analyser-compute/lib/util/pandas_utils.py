@@ -1,5 +1,5 @@
 import re
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -8,14 +8,65 @@ from lib.fund.fund import FundHistoricPrices
 from lib.stock.stock import StockHistoricPrices
 
 
-def pd_historic_prices_from_json(historic_prices_json: List[Dict]) -> Union[FundHistoricPrices, StockHistoricPrices]:
-    if not len(historic_prices_json):
+def pd_historic_prices_from_json(historic_prices_json: Union[List[Dict], Dict[str, np.ndarray]]) \
+        -> Union[FundHistoricPrices, StockHistoricPrices]:
+    if isinstance(historic_prices_json, dict) and len(historic_prices_json["date"]):
+        # already columnar
+        return pd.DataFrame({field: values for field, values in historic_prices_json.items() if field != "date"},
+                            index=pd.DatetimeIndex(historic_prices_json["date"], name="date")).squeeze(axis=1)
+    if isinstance(historic_prices_json, dict) or not len(historic_prices_json):
         return pd.Series(index=pd.DatetimeIndex([], name="date"), name="price")
     historic_prices = pd.DataFrame.from_records(historic_prices_json, index="date").squeeze(axis=1)
     historic_prices.index = pd.to_datetime(historic_prices.index).tz_convert(None)
     return historic_prices
 
 
+def np_historic_prices_from_json(historic_prices_json: Union[List[Dict], Dict[str, np.ndarray]]) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parses historic prices straight into arrays, without building any pandas objects.
+    Dates are the (UTC) calendar days of the timestamps.
+    :param historic_prices_json: list of {"date", "price"} records, or already columnar {"date": [], "price": []}
+    :return: (dates as datetime64[D], prices as float64)
+    """
+    if isinstance(historic_prices_json, dict):
+        return historic_prices_json["date"], historic_prices_json.get("price", np.empty(0))
+    dates = np.array([p["date"][:10] for p in historic_prices_json], dtype="datetime64[D]")
+    prices = np.array([p["price"] for p in historic_prices_json], dtype=np.float64)
+    return dates, prices
+
+
+def pd_prices_df_from_arrays(columns: List[str], dates: List[np.ndarray], prices: List[np.ndarray]) -> pd.DataFrame:
+    """
+    Fills a business day x columns price matrix from per column date / price arrays in one pass,
+    equivalent to pd.concat(series, axis=1).resample("B").asfreq().fillna(method="ffill").
+    :param columns: column names
+    :param dates: per column datetime64[D] arrays
+    :param prices: per column float64 arrays, aligned with dates
+    :return: forward filled prices DataFrame on the shared business day calendar
+    """
+    non_empty = [d for d in dates if len(d)]
+    if not non_empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([]), columns=columns, dtype=np.float64)
+    start = np.busday_offset(min(d.min() for d in non_empty), 0, roll="backward")
+    end = np.busday_offset(max(d.max() for d in non_empty), 0, roll="backward")
+    calendar = np.arange(start, end + 1, dtype="datetime64[D]")
+    calendar = calendar[np.is_busday(calendar)]
+
+    arr = np.full((len(calendar), len(columns)), np.nan, order="F")
+    for col, (col_dates, col_prices) in enumerate(zip(dates, prices)):
+        # prices on non business days are dropped, as in resample("B").asfreq()
+        pos = np.searchsorted(calendar, col_dates).clip(max=len(calendar) - 1)
+        on_calendar = calendar[pos] == col_dates
+        arr[pos[on_calendar], col] = col_prices[on_calendar]
+
+    # forward fill: each cell takes the value at the latest non nan row at or above it
+    row_ilocs = np.where(np.isnan(arr), 0, np.arange(len(calendar))[:, np.newaxis])
+    np.maximum.accumulate(row_ilocs, axis=0, out=row_ilocs)
+    arr = np.take_along_axis(arr, row_ilocs, axis=0)
+    return pd.DataFrame(arr, index=pd.DatetimeIndex(calendar, freq="B"), columns=columns, copy=False)
+
+
 def pd_offset_from_lookback(lookback: str) -> Optional[pd.DateOffset]:
     match = re.search(r"^(\d+)([DWMY])", lookback)
     if not match:
@@ -6,7 +6,8 @@ import pandas as pd
 import pytest
 from pandas._testing import assert_frame_equal, assert_series_equal
 
-from lib.util.pandas_utils import pd_historic_prices_from_json, pd_offset_from_lookback, take_nan
+from lib.util.pandas_utils import np_historic_prices_from_json, pd_historic_prices_from_json, pd_offset_from_lookback, \
+    pd_prices_df_from_arrays, take_nan
 
 
 @pytest.mark.parametrize("historic_prices,expected",
@@ -28,6 +29,34 @@ def test_pd_series_from_historic_prices(historic_prices: List[Dict], expected: p
     assert_series_equal(actual, expected, check_freq=False)
 
 
+def test_np_historic_prices_from_json():
+    dates, prices = np_historic_prices_from_json([
+        {"date": "2019-01-01T00:00:00.000Z", "price": 100},
+        {"date": "2019-01-02T00:00:00.000Z", "price": None},
+        {"date": "2019-01-03T00:00:00.000Z", "price": 300.5}
+    ])
+    np.testing.assert_array_equal(dates, np.array(["2019-01-01", "2019-01-02", "2019-01-03"], dtype="datetime64[D]"))
+    np.testing.assert_array_equal(prices, [100.0, np.nan, 300.5])
+
+
+def test_pd_prices_df_from_arrays():
+    rng = np.random.default_rng(0)
+    all_days = pd.date_range(datetime(2019, 1, 5), datetime(2019, 3, 3), freq="D")  # starts and ends on a weekend
+    series = []
+    for i in range(5):
+        days = np.sort(rng.choice(all_days, size=int(rng.integers(1, 30)), replace=False))
+        prices = rng.random(len(days))
+        prices[rng.random(len(days)) < 0.1] = np.nan
+        series.append(pd.Series(prices, index=pd.DatetimeIndex(days), name=f"col{i}"))
+    series.append(pd.Series([], index=pd.DatetimeIndex([]), name="empty", dtype=np.float64))
+
+    actual = pd_prices_df_from_arrays([s.name for s in series],
+                                      [s.index.to_numpy(dtype="datetime64[D]") for s in series],
+                                      [s.to_numpy() for s in series])
+    expected = pd.concat(series, axis=1).resample("B").asfreq().fillna(method="ffill")
+    assert_frame_equal(actual, expected)
+
+
 @pytest.mark.parametrize("lookback,expected",
                          [
                              ("1Y", pd.DateOffset(years=1)),
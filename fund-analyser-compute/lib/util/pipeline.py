@@ -0,0 +1,65 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Queue
+from threading import BoundedSemaphore, Event, Thread
+from typing import Callable, Iterable, Iterator, Optional, TypeVar, Union
+
+T = TypeVar('T')
+U = TypeVar('U')
+
+
+class _End:
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+
+def pipelined_map(func: Callable[[T], U], source: Iterable[T], max_workers: int = 4,
+                  max_pending: int = 64) -> Iterator[U]:
+    """
+    Lazily applies func to each item of source in order, like map(), but as a separate pipeline stage:
+    a reader thread pulls items from source (e.g. a network stream) while a pool of workers applies func,
+    and the caller consumes results as soon as they are ready.
+    At most max_pending items are in flight, so a slow consumer blocks the reader (back-pressure).
+    Stages can be chained by passing the result of one pipelined_map() as the source of another.
+    :param func: function applied by the workers
+    :param source: iterable consumed by the reader thread
+    :param max_workers: number of workers applying func
+    :param max_pending: max number of items read from source but not yet consumed
+    :return: iterator of func(item), in source order. Exceptions from source or func are re-raised on consumption.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+    slots = BoundedSemaphore(max_pending)
+    futures: "Queue[Union[Future, _End]]" = Queue()
+    stopped = Event()
+
+    def read() -> None:
+        try:
+            for item in source:
+                slots.acquire()
+                if stopped.is_set():
+                    return
+                futures.put(executor.submit(func, item))
+        except BaseException as e:
+            futures.put(_End(e))
+        else:
+            futures.put(_End())
+
+    reader = Thread(target=read, name="pipeline-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            future = futures.get()
+            if isinstance(future, _End):
+                if future.error is not None:
+                    raise future.error
+                return
+            result = future.result()
+            slots.release()
+            yield result
+    finally:
+        # consumer finished or gave up early - unblock the reader and drop pending work
+        stopped.set()
+        try:
+            slots.release()
+        except ValueError:
+            pass
+        executor.shutdown(wait=False, cancel_futures=True)
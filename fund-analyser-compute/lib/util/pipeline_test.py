@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from lib.util.pipeline import pipelined_map
+
+
+def test_pipelined_map():
+    def slow_square(x: int) -> int:
+        time.sleep(0.001 * (x % 3))
+        return x * x
+
+    assert list(pipelined_map(slow_square, range(100), max_workers=4, max_pending=8)) == [x * x for x in range(100)]
+
+
+def test_pipelined_map_chained():
+    squares = pipelined_map(lambda x: x * x, range(10))
+    assert list(pipelined_map(str, squares)) == [str(x * x) for x in range(10)]
+
+
+def test_pipelined_map_back_pressure():
+    num_read = 0
+
+    def source():
+        nonlocal num_read
+        for x in range(100):
+            num_read += 1
+            yield x
+
+    results = pipelined_map(lambda x: x, source(), max_pending=5)
+    assert next(results) == 0
+    time.sleep(0.1)
+    assert num_read <= 1 + 5 + 1
+    results.close()
+
+
+def test_pipelined_map_errors():
+    def fail_on_three(x: int) -> int:
+        if x == 3:
+            raise ValueError(x)
+        return x
+
+    def failing_source():
+        yield 1
+        raise IOError("connection reset")
+
+    with pytest.raises(ValueError):
+        list(pipelined_map(fail_on_three, range(10)))
+    with pytest.raises(IOError):
+        list(pipelined_map(lambda x: x, failing_source()))
@@ -0,0 +1,181 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lib.util.logging_utils import log_debug
+
+
+class RollingCorr:
+    """
+    Maintains running sums (Σx, Σx², Σxy and pairwise counts) over a trailing window of rows,
+    so that the correlation matrix can be updated in O(columns²) per added / dropped row,
+    instead of recomputing DataFrame.corr() in O(columns² x rows).
+
+    Like DataFrame.corr(), nans are excluded pairwise, i.e. each pair of columns
+    only uses rows where both are present.
+
+    The running sums are dense columns x columns matrices held for the lifetime of the instance,
+    see nbytes() - about 26 bytes per pair of columns, e.g. 650MB for 5000 columns.
+    Callers should check nbytes() against their memory budget before keeping one around.
+    """
+
+    # Recompute from scratch after this many incremental updates, to bound accumulated rounding errors
+    MAX_UPDATES = 20
+
+    _columns: pd.Index
+    _index: pd.Index
+    _window: np.ndarray
+    _shift: np.ndarray
+    _n: np.ndarray
+    _sx: np.ndarray
+    _sxx: np.ndarray
+    _sxy: np.ndarray
+    _num_updates: int
+
+    def __init__(self, window_df: pd.DataFrame):
+        self._recompute(window_df)
+
+    @staticmethod
+    def nbytes(num_columns: int, num_rows: int) -> int:
+        """
+        Memory held by an instance over a window of num_rows x num_columns:
+        Σx, Σx², Σxy (float64) and pairwise counts (small ints) per pair of columns, plus the window itself.
+        """
+        count_itemsize = np.dtype(_count_dtype(num_rows)).itemsize
+        return (3 * np.dtype(np.float64).itemsize + count_itemsize) * num_columns ** 2 \
+            + np.dtype(np.float64).itemsize * num_rows * num_columns
+
+    def update(self, window_df: pd.DataFrame) -> None:
+        """
+        Moves the window to window_df, by removing rows that dropped out (or whose values changed)
+        and adding the new ones. Falls back to exact recomputation where incremental updates don't pay off.
+        """
+        if not window_df.columns.equals(self._columns) \
+                or self._num_updates >= RollingCorr.MAX_UPDATES \
+                or len(window_df.index) > np.iinfo(self._n.dtype).max:
+            self._recompute(window_df)
+            return
+
+        window_arr = window_df.to_numpy(dtype=np.float64)
+        old_pos = self._index.get_indexer(window_df.index)
+        kept = old_pos >= 0
+        unchanged = np.zeros(len(window_df.index), dtype=np.bool_)
+        unchanged[kept] = _rows_equal(self._window[old_pos[kept]], window_arr[kept])
+
+        removed_rows = np.ones(len(self._index), dtype=np.bool_)
+        removed_rows[old_pos[unchanged]] = False
+        added_rows = ~unchanged
+
+        if removed_rows.sum() + added_rows.sum() >= len(window_df.index):
+            self._recompute(window_df)
+            return
+
+        log_debug(f"Rolling correlation: removing {removed_rows.sum()} rows, adding {added_rows.sum()} rows.")
+        self._accumulate(self._window[removed_rows], sign=-1)
+        self._accumulate(window_arr[added_rows], sign=1)
+        self._window, self._index = window_arr, window_df.index
+        self._num_updates += 1
+
+    def corr(self) -> pd.DataFrame:
+        corr = _pairwise_corr(self._n, self._sx, self._sx.T, self._sxx, self._sxx.T, self._sxy)
+        return pd.DataFrame(corr, index=self._columns, columns=self._columns)
+
+    def _recompute(self, window_df: pd.DataFrame) -> None:
+        window_arr = window_df.to_numpy(dtype=np.float64)
+        num_cols = window_arr.shape[1]
+        self._columns, self._index, self._window = window_df.columns, window_df.index, window_arr
+        # correlation is shift invariant, so subtract a per column reference to reduce cancellation errors
+        with np.errstate(all="ignore"):
+            self._shift = np.nan_to_num(np.nanmean(window_arr, axis=0)) if len(window_arr) else np.zeros(num_cols)
+        self._n = np.zeros((num_cols, num_cols), dtype=_count_dtype(len(window_arr)))
+        self._sx = np.zeros((num_cols, num_cols))
+        self._sxx = np.zeros((num_cols, num_cols))
+        self._sxy = np.zeros((num_cols, num_cols))
+        self._accumulate(window_arr, sign=1)
+        self._num_updates = 0
+
+    def _accumulate(self, rows: np.ndarray, sign: int) -> None:
+        """
+        Adds (sign=1) or removes (sign=-1) the contribution of rows to the running sums.
+        For each pair (i, j), sums only run over rows where both i and j are present:
+          n[i, j] = Σ 1,  sx[i, j] = Σ x_i,  sxx[i, j] = Σ x_i²,  sxy[i, j] = Σ x_i x_j
+        """
+        if not len(rows):
+            return
+        x, mask = _shifted_and_mask(rows, self._shift)
+        self._n += sign * (mask.T @ mask).astype(self._n.dtype)
+        self._sx += sign * (x.T @ mask)
+        self._sxx += sign * (np.square(x).T @ mask)
+        self._sxy += sign * (x.T @ x)
+
+
+def corr_neighbours(window_df: pd.DataFrame, threshold: float, limit: Optional[int] = None,
+                    block_size: int = 256) -> Dict[str, List[str]]:
+    """
+    Sparse equivalent of filtering window_df.corr() > threshold row by row.
+    Correlations are computed one block of columns at a time against all columns,
+    so memory is O(block_size x columns) and the dense columns x columns matrix is never built.
+    :param window_df: prices (rows) by isins (columns)
+    :param threshold: only pairs with correlation strictly above threshold are returned
+    :param limit: if supplied, keep at most this many most correlated neighbours per column
+    :return: column -> neighbouring columns (including itself if not constant), in column order
+    """
+    columns = window_df.columns
+    window_arr = window_df.to_numpy(dtype=np.float64)
+    with np.errstate(all="ignore"):
+        shift = np.nan_to_num(np.nanmean(window_arr, axis=0)) if len(window_arr) else np.zeros(len(columns))
+    x, mask = _shifted_and_mask(window_arr, shift)
+    x_sq = np.square(x)
+
+    neighbours: Dict[str, List[str]] = dict()
+    for start in range(0, len(columns), block_size):
+        block = slice(start, start + block_size)
+        x_b, mask_b, x_sq_b = x[:, block], mask[:, block], x_sq[:, block]
+        corr = _pairwise_corr(n=mask_b.T @ mask,
+                              sx=x_b.T @ mask,
+                              sy=mask_b.T @ x,
+                              sxx=x_sq_b.T @ mask,
+                              syy=mask_b.T @ x_sq,
+                              sxy=x_b.T @ x)
+        with np.errstate(invalid="ignore"):
+            above = corr > threshold
+        for i, row in enumerate(above):
+            col_ilocs = np.flatnonzero(row)
+            if limit is not None and len(col_ilocs) > limit:
+                top_k = np.argpartition(-corr[i, col_ilocs], limit - 1)[:limit]
+                col_ilocs = np.sort(col_ilocs[top_k])
+            neighbours[columns[start + i]] = columns[col_ilocs].tolist()
+    return neighbours
+
+
+def _count_dtype(num_rows: int) -> type:
+    """
+    Smallest signed integer type for pairwise counts, which are at most the number of rows.
+    """
+    return np.int16 if num_rows <= np.iinfo(np.int16).max else np.int32
+
+
+def _shifted_and_mask(rows: np.ndarray, shift: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    present = ~np.isnan(rows)
+    return np.where(present, rows - shift, 0.0), present.astype(np.float64)
+
+
+def _pairwise_corr(n: np.ndarray, sx: np.ndarray, sy: np.ndarray,
+                   sxx: np.ndarray, syy: np.ndarray, sxy: np.ndarray) -> np.ndarray:
+    """
+    Pearson correlation from sums over rows where both x and y are present, nan where undefined.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = n * sxy - sx * sy
+        var_x = n * sxx - np.square(sx)
+        var_y = n * syy - np.square(sy)
+        # rounding errors can leave tiny non zero variances for constant series
+        degenerate = (var_x <= 1e-10 * n * sxx) | (var_y <= 1e-10 * n * syy) | (n < 1)
+        corr = np.clip(cov / np.sqrt(var_x * var_y), -1, 1)
+    corr[degenerate] = np.nan
+    return corr
+
+
+def _rows_equal(rows1: np.ndarray, rows2: np.ndarray) -> np.ndarray:
+    return ((rows1 == rows2) | (np.isnan(rows1) & np.isnan(rows2))).all(axis=1)
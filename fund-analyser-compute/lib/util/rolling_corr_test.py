@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from lib.util.rolling_corr import corr_neighbours, RollingCorr
+
+
+def _random_prices(start: datetime, periods: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.01, size=(periods, 5)), axis=0)
+    prices[:10, 1] = np.nan  # late launch
+    prices[20:25, 2] = np.nan  # gap
+    prices[:, 3] = 50.0  # constant
+    prices[:-1, 4] = np.nan  # single data point
+    return pd.DataFrame(prices,
+                        index=pd.date_range(start, periods=periods, freq="B"),
+                        columns=["isin1", "isin2", "isin3", "isin4", "isin5"])
+
+
+def test_corr_exact():
+    prices_df = _random_prices(datetime(2001, 1, 1), 60)
+    assert_frame_equal(RollingCorr(prices_df).corr(), prices_df.corr())
+
+
+def test_corr_incremental():
+    prices_df = _random_prices(datetime(2001, 1, 1), 70)
+    rolling_corr = RollingCorr(prices_df.iloc[:60])
+
+    # move window by one day at a time
+    for end in range(61, 66):
+        window_df = prices_df.iloc[end - 60:end]
+        rolling_corr.update(window_df)
+        assert_frame_equal(rolling_corr.corr(), window_df.corr())
+
+    # revised historic prices within the window
+    window_df = prices_df.iloc[10:70].copy()
+    window_df.iloc[-3, 0] *= 1.01
+    rolling_corr.update(window_df)
+    assert_frame_equal(rolling_corr.corr(), window_df.corr())
+
+
+def test_nbytes():
+    prices_df = _random_prices(datetime(2001, 1, 1), 60)
+    rolling_corr = RollingCorr(prices_df)
+    assert rolling_corr._n.dtype == np.int16
+    sums_nbytes = sum(arr.nbytes for arr in [rolling_corr._n, rolling_corr._sx, rolling_corr._sxx, rolling_corr._sxy])
+    assert RollingCorr.nbytes(5, 60) == sums_nbytes + rolling_corr._window.nbytes
+    assert RollingCorr.nbytes(5000, 260) == 26 * 5000 ** 2 + 8 * 260 * 5000
+
+
+def test_corr_fallback_on_new_columns():
+    prices_df = _random_prices(datetime(2001, 1, 1), 60)
+    rolling_corr = RollingCorr(prices_df[["isin1", "isin2"]])
+    rolling_corr.update(prices_df)
+    assert_frame_equal(rolling_corr.corr(), prices_df.corr())
+
+
+def test_corr_neighbours():
+    prices_df = _random_prices(datetime(2001, 1, 1), 60)
+    prices_df["isin6"] = prices_df["isin1"] * 2 + 1
+    prices_df["isin7"] = prices_df["isin2"] + prices_df["isin1"]
+    corr_df = prices_df.corr()
+    expected = {isin: corr_series[corr_series > 0.5].index.tolist() for isin, corr_series in corr_df.iterrows()}
+    assert corr_neighbours(prices_df, threshold=0.5, block_size=3) == expected
+
+
+def test_corr_neighbours_limit():
+    prices_df = _random_prices(datetime(2001, 1, 1), 60)
+    prices_df["isin6"] = prices_df["isin1"] * 2 + 1
+    prices_df["isin7"] = prices_df["isin1"] + 0.1 * prices_df["isin3"]
+    actual = corr_neighbours(prices_df, threshold=0.5, limit=2)
+    assert actual["isin1"] == ["isin1", "isin6"]
@@ -1,7 +1,8 @@
-import pandas as pd
+from typing import List
 
 from client.funds import post_similar_funds, SimilarFundsEntry
 from lib.fund import fund_cache
+from lib.fund.fund import Fund
 from lib.fund.fund_utils import calc_fees
 
 THRESHOLD = 0.99
@@ -9,13 +10,11 @@ THRESHOLD = 0.99
 
 def update_similar_funds():
     funds = fund_cache.get()
-    corr_df = fund_cache.get_corr()
+    similar_isins_by_isin = fund_cache.get_similar([fund.isin for fund in funds], threshold=THRESHOLD)
     fees_df = calc_fees(funds)
 
-    def to_similar_funds_entry(isin: str, corr_series: pd.Series) -> SimilarFundsEntry:
-        similar_isins = corr_series[corr_series > THRESHOLD].index.tolist()
-
-        [fund] = fund_cache.get([isin])
+    def to_similar_funds_entry(fund: Fund, similar_isins: List[str]) -> SimilarFundsEntry:
+        isin = fund.isin
         fees_per_year = fees_df.at[isin, "total_one_off_fees"] + fees_df.at[isin, "total_annual_fees"]
         returns_per_year = fund.returns["1Y"]
         if returns_per_year:
@@ -30,7 +29,7 @@ def update_similar_funds():
         )
 
     similar_funds = [
-        to_similar_funds_entry(isin, corr_series)
-        for isin, corr_series in corr_df.iterrows()
+        to_similar_funds_entry(fund, similar_isins_by_isin[fund.isin])
+        for fund in funds
     ]
     post_similar_funds(similar_funds)
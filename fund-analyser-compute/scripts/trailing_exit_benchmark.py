@@ -0,0 +1,28 @@
+import argparse
+import time
+from typing import Dict
+
+from lib.stocksimulate.stocks_playground import ProfitTrailingExitStrategy, SP500_SYMBOLS
+from lib.stocksimulate.testing import RescanProfitTrailingExitStrategy, run_playground, synthetic_prices_df
+from lib.util.logging_utils import log_info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Times the S&P 500 playground run with trailing exits.")
+    parser.add_argument("-d", "--days", type=int, nargs="+", default=[250, 1000], help="numbers of business days")
+    args = parser.parse_args()
+
+    for num_days in args.days:
+        prices_df = synthetic_prices_df(SP500_SYMBOLS, num_days)
+        times: Dict[str, float] = dict()
+        for name, exit_strategy in [("rescan", RescanProfitTrailingExitStrategy()),
+                                    ("incremental", ProfitTrailingExitStrategy())]:
+            start = time.perf_counter()
+            run_playground(prices_df, exit_strategy)
+            times[name] = time.perf_counter() - start
+            log_info(f"S&P 500 playground run over {num_days} days with {name} trailing exit: {times[name]:.2f} s")
+        log_info(f"Speed-up over {num_days} days: {times['rescan'] / times['incremental']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,26 @@
 from __future__ import annotations
 
-from typing import Dict, NamedTuple
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Set
 
 import falcon
+import ujson
 
-from lib.fund.fund import Fund, FundHistoricPrices
-from lib.indicators.indicators import get_all_fund_indicators, get_all_stock_indicators
+from lib.fund.fund import Fund, FundHistoricPrices, FundIndicators
+from lib.indicators.indicators import calc_indicators, get_all_fund_indicators, get_all_stock_indicators
 from lib.stock.stock import Stock, StockHistoricPrices
+from lib.util import properties
+from lib.util.logging_utils import log_error
 from lib.util.pandas_utils import pd_historic_prices_from_json
 
+BATCH_MAX_WORKERS = properties.get("indicators.batch.workers") or os.cpu_count() or 1
+BATCH_CHUNK_SIZE = properties.get("indicators.batch.chunk.size") or 16  # instruments computed together
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+# shared by all batch requests, so that concurrent batches don't oversubscribe the cpus
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="indicators")
+
 
 class IndicatorsRoutes:
     class FundIndicatorParam(NamedTuple):
@@ -32,9 +44,23 @@ class IndicatorsRoutes:
 
     def on_post_fund(self, req: falcon.Request, resp: falcon.Response):
         param = IndicatorsRoutes.FundIndicatorParam.from_dict(req.media)
-        resp.media = {
-            indicator.get_key(): indicator.calc(historic_prices=param.historic_prices).as_dict()
-            for indicator in get_all_fund_indicators(param.fund)}
+        resp.media = _as_dict(self._calc_fund_indicators([param])[0])
+
+    def on_post_fund_batch(self, req: falcon.Request, resp: falcon.Response):
+        """
+        Computes indicators of a list of {fund, historicPrices}, streaming back one
+        {"isin", "indicators"} (or {"isin", "error"}) json line per fund as soon as it is computed.
+        """
+        _stream_batch(req, resp,
+                      parse=IndicatorsRoutes.FundIndicatorParam.from_dict,
+                      calc=self._calc_fund_indicators,
+                      to_line=lambda param, indicators: {"isin": param.fund.isin, "indicators": _as_dict(indicators)},
+                      identify=lambda d: {"isin": (d.get("fund") or dict()).get("isin")})
+
+    @staticmethod
+    def _calc_fund_indicators(params: List[IndicatorsRoutes.FundIndicatorParam]) -> List[FundIndicators]:
+        return calc_indicators([get_all_fund_indicators(param.fund) for param in params],
+                               [param.historic_prices for param in params])
 
     class StockIndicatorParam(NamedTuple):
         stock: Stock
@@ -57,12 +83,95 @@ class IndicatorsRoutes:
 
     def on_post_stock(self, req: falcon.Request, resp: falcon.Response):
         param = IndicatorsRoutes.StockIndicatorParam.from_dict(req.media)
-        historic_prices = param.historic_prices["price"] \
-            if isinstance(param.historic_prices, StockHistoricPrices) \
-            else param.historic_prices
-        resp.media = {
-            indicator.get_key(): indicator.calc(historic_prices=historic_prices).as_dict()
-            for indicator in get_all_stock_indicators()}
+        resp.media = _as_dict(self._calc_stock_indicators([param])[0])
+
+    def on_post_stock_batch(self, req: falcon.Request, resp: falcon.Response):
+        """
+        Computes indicators of a list of {stock, historicPrices}, streaming back one
+        {"symbol", "indicators"} (or {"symbol", "error"}) json line per stock as soon as it is computed.
+        """
+        _stream_batch(req, resp,
+                      parse=IndicatorsRoutes.StockIndicatorParam.from_dict,
+                      calc=self._calc_stock_indicators,
+                      to_line=lambda param, indicators: {"symbol": param.stock.symbol,
+                                                         "indicators": _as_dict(indicators)},
+                      identify=lambda d: {"symbol": (d.get("stock") or dict()).get("symbol")})
+
+    @staticmethod
+    def _calc_stock_indicators(params: List[IndicatorsRoutes.StockIndicatorParam]) -> List[FundIndicators]:
+        return calc_indicators([get_all_stock_indicators() for _ in params],
+                               [param.historic_prices["price"]
+                                if isinstance(param.historic_prices, StockHistoricPrices)
+                                else param.historic_prices
+                                for param in params])
+
+
+def _as_dict(indicators: FundIndicators) -> Dict:
+    return {key: indicator.as_dict() for key, indicator in indicators.items()}
+
+
+def _stream_batch(req: falcon.Request, resp: falcon.Response, parse: Callable[[Dict], Any],
+                  calc: Callable[[List[Any]], List[FundIndicators]], to_line: Callable[[Any, FundIndicators], Dict],
+                  identify: Callable[[Dict], Dict]) -> None:
+    """
+    Streams back calc() of chunks of the request's list as ndjson, in order of completion.
+    :param parse: parses an entry of the list into a param
+    :param calc: computes the indicators of a list of params
+    :param to_line: response line of a param and its indicators
+    :param identify: identifies an entry of the list in its error line
+    """
+    entries = req.media
+    if not isinstance(entries, list):
+        raise falcon.HTTPBadRequest(description="Expected a list of instruments")
+    chunks = [entries[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(entries), BATCH_CHUNK_SIZE)]
+
+    def lines() -> Iterator[bytes]:
+        pending: Set[Future] = set()
+        chunks_by_future: Dict[Future, List[Dict]] = dict()
+        try:
+            for chunk in chunks:
+                future = _batch_executor.submit(_calc_chunk, chunk, parse, calc, to_line, identify)
+                pending.add(future)
+                chunks_by_future[future] = chunk
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = chunks_by_future.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        log_error(f"Failed to compute indicators: {repr(e)}")
+                        results = [{**identify(d), "error": repr(e)} for d in chunk]
+                    yield "".join(f"{ujson.dumps(result)}\n" for result in results).encode()
+        finally:
+            # client went away - drop chunks not yet started
+            for future in pending:
+                future.cancel()
+
+    resp.content_type = NDJSON_CONTENT_TYPE
+    resp.stream = lines()
+
+
+def _calc_chunk(chunk: List[Dict], parse: Callable[[Dict], Any],
+                calc: Callable[[List[Any]], List[FundIndicators]], to_line: Callable[[Any, FundIndicators], Dict],
+                identify: Callable[[Dict], Dict]) -> List[Dict]:
+    """
+    Computes the response lines of a chunk together, or one entry at a time if that fails,
+    so that a bad entry only fails its own line.
+    """
+    try:
+        params = [parse(d) for d in chunk]
+        return [to_line(param, indicators) for param, indicators in zip(params, calc(params))]
+    except Exception:
+        lines = []
+        for d in chunk:
+            try:
+                param = parse(d)
+                lines.append(to_line(param, calc([param])[0]))
+            except Exception as e:
+                log_error(f"Failed to compute indicators: {repr(e)}")
+                lines.append({**identify(d), "error": repr(e)})
+        return lines
 
 
 indicators_routes = IndicatorsRoutes()
@@ -0,0 +1,67 @@
+import ujson
+from falcon import testing
+
+from server.routes import indicators_routes
+from server.server import app
+
+HISTORIC_PRICES = [
+    {"date": "2017-03-10T00:00:00Z", "price": 486.0},
+    {"date": "2017-03-13T00:00:00Z", "price": 482.0},
+    {"date": "2017-03-14T00:00:00Z", "price": 489.0},
+    {"date": "2017-03-15T00:00:00Z", "price": 475.0},
+    {"date": "2017-03-16T00:00:00Z", "price": 487.0},
+    {"date": "2017-03-17T00:00:00Z", "price": 490.0}
+]
+
+
+def test_post_fund_batch(monkeypatch):
+    monkeypatch.setattr(indicators_routes, "BATCH_CHUNK_SIZE", 1)
+    client = testing.TestClient(app)
+    funds = [{"fund": {"isin": "isin1", "ocf": 0.01}, "historicPrices": HISTORIC_PRICES},
+             {"fund": {"isin": "isin2"}, "historicPrices": HISTORIC_PRICES[:3]},
+             {"fund": {"isin": "isin3"}, "historicPrices": "malformed"}]
+
+    resp = client.simulate_post("/indicators/fund/batch", json=funds)
+    assert resp.headers["content-type"] == indicators_routes.NDJSON_CONTENT_TYPE
+    lines = {line["isin"]: line for line in map(ujson.loads, resp.text.splitlines())}
+    assert set(lines) == {"isin1", "isin2", "isin3"}
+    for fund in funds[:2]:
+        expected = client.simulate_post("/indicators/fund", json=fund).json
+        assert lines[fund["fund"]["isin"]]["indicators"] == expected
+    assert "error" in lines["isin3"]
+
+
+def test_post_stock_batch():
+    client = testing.TestClient(app)
+    stocks = [{"stock": {"symbol": "symbol1"}, "historicPrices": HISTORIC_PRICES},
+              {"stock": {"symbol": "symbol2"}, "historicPrices": HISTORIC_PRICES[2:]}]
+
+    resp = client.simulate_post("/indicators/stock/batch", json=stocks)
+    lines = {line["symbol"]: line for line in map(ujson.loads, resp.text.splitlines())}
+    assert set(lines) == {"symbol1", "symbol2"}
+    for stock in stocks:
+        expected = client.simulate_post("/indicators/stock", json=stock).json
+        assert lines[stock["stock"]["symbol"]]["indicators"] == expected
+
+
+def test_post_batch_bad_entry_fails_own_line_only():
+    client = testing.TestClient(app)
+    funds = [{"fund": {"isin": "isin1"}, "historicPrices": HISTORIC_PRICES},
+             {"fund": {"isin": "isin2"}, "historicPrices": "malformed"},
+             {"fund": {"isin": "isin3"}, "historicPrices": HISTORIC_PRICES[1:]}]
+    stocks = [{"stock": {"symbol": "symbol1"}, "historicPrices": [{"date": "malformed", "price": 1.0}]},
+              {"stock": {"symbol": "symbol2"}, "historicPrices": HISTORIC_PRICES}]
+    assert indicators_routes.BATCH_CHUNK_SIZE >= len(funds)  # all in one chunk
+
+    resp = client.simulate_post("/indicators/fund/batch", json=funds)
+    lines = {line["isin"]: line for line in map(ujson.loads, resp.text.splitlines())}
+    assert set(lines) == {"isin1", "isin2", "isin3"}
+    for fund in [funds[0], funds[2]]:
+        assert lines[fund["fund"]["isin"]]["indicators"] == \
+               client.simulate_post("/indicators/fund", json=fund).json
+    assert "error" in lines["isin2"]
+
+    resp = client.simulate_post("/indicators/stock/batch", json=stocks)
+    lines = {line["symbol"]: line for line in map(ujson.loads, resp.text.splitlines())}
+    assert "error" in lines["symbol1"]
+    assert lines["symbol2"]["indicators"] == client.simulate_post("/indicators/stock", json=stocks[1]).json
@@ -5,6 +5,7 @@ from typing import Dict, List, NamedTuple, Optional
 
 import falcon
 
+from lib.simulate import simulator_cache
 from lib.simulate.simulator import Simulator
 from lib.simulate.strategy import strategies
 from lib.simulate.strategy.strategies import get_all_strategies
@@ -82,7 +83,7 @@ class SimulateRoutes:
     def on_post_predict(self, req: falcon.Request, resp: falcon.Response):
         params = SimulateRoutes.PredictParam.from_dict(req.media)
         predict_date = BDAY.rollback(params.date) if params.date else None
-        simulator = self._build_simulator(params.simulate_param)
+        simulator = self._get_simulator(params.simulate_param)
         result = simulator.predict(predict_date)
         resp.media = {
             "date": format_date(result.date),
@@ -105,5 +106,12 @@ class SimulateRoutes:
             isins=params.isins,
             num_portfolio=params.num_portfolio)
 
+    @classmethod
+    def _get_simulator(cls, params: SimulateRoutes.SimulateParam) -> Simulator:
+        return simulator_cache.get(
+            strategy=params.strategy,
+            isins=params.isins,
+            num_portfolio=params.num_portfolio)
+
 
 simulate_routes = SimulateRoutes()
@@ -12,6 +12,8 @@ app = falcon.API(middleware=[LoggingMiddleware()])
 app.add_route("/", home_routes)
 app.add_route("/indicators/fund", indicators_routes, suffix="fund")
 app.add_route("/indicators/stock", indicators_routes, suffix="stock")
+app.add_route("/indicators/fund/batch", indicators_routes, suffix="fund_batch")
+app.add_route("/indicators/stock/batch", indicators_routes, suffix="stock_batch")
 app.add_route("/simulate", simulate_routes)
 app.add_route("/simulate/predict", simulate_routes, suffix="predict")
 app.add_route("/simulate/strategies", simulate_routes, suffix="strategies")
@@ -0,0 +1,54 @@
+import * as StreamTest from 'streamtest'
+import * as columnar from './columnar'
+
+describe('columnar', () => {
+  const version = 'v2'
+  const fund = {
+    isin: 'GB00B80QG615',
+    name: 'HSBC American Index Fund Accumulation C',
+    historicPrices: [
+      { date: new Date(Date.UTC(2017, 3, 21)), price: 457.0 },
+      { date: new Date(Date.UTC(2017, 3, 24)), price: 458.5 }
+    ]
+  }
+
+  test('encode', () => {
+    const buf = columnar.encode(fund)
+    expect(buf.readUInt32LE(0)).toBe(buf.length - 4)
+    const headerLength = buf.readUInt32LE(4)
+    const header = JSON.parse(buf.toString('utf-8', 8, 8 + headerLength))
+    expect(header).toEqual({
+      isin: 'GB00B80QG615',
+      name: 'HSBC American Index Fund Accumulation C',
+      historicPriceFields: ['price']
+    })
+
+    let offset = 8 + headerLength
+    expect(buf.readUInt32LE(offset)).toBe(2)
+    offset += 4
+    expect(buf.readInt32LE(offset)).toBe(17277)
+    expect(buf.readInt32LE(offset + 4)).toBe(17280)
+    offset += 8
+    expect(buf.readDoubleLE(offset)).toBe(457.0)
+    expect(buf.readDoubleLE(offset + 8)).toBe(458.5)
+    expect(buf.length).toBe(offset + 16)
+  })
+
+  test('encode without historic prices', () => {
+    const buf = columnar.encode({ isin: 'GB00B80QG615' })
+    const headerLength = buf.readUInt32LE(4)
+    expect(JSON.parse(buf.toString('utf-8', 8, 8 + headerLength)).historicPriceFields).toEqual([])
+    expect(buf.readUInt32LE(8 + headerLength)).toBe(0)
+    expect(buf.length).toBe(12 + headerLength)
+  })
+
+  test('stringify', done => {
+    StreamTest[version].fromObjects([fund, fund])
+      .pipe(columnar.stringify())
+      .pipe(StreamTest[version].toChunks((err, chunks) => {
+        expect(err).toBeNull()
+        expect(Buffer.concat(chunks)).toEqual(Buffer.concat([columnar.encode(fund), columnar.encode(fund)]))
+        done()
+      }))
+  })
+})
@@ -0,0 +1,73 @@
+import axios from 'axios'
+import { Server } from 'http'
+import Koa from 'koa'
+import bodyParser from 'koa-bodyparser'
+import { AddressInfo } from 'net'
+import * as StreamTest from 'streamtest'
+import * as FundDAO from '../../lib/db/FundDAO'
+import Fund from '../../lib/fund/Fund'
+import fundsRoutes from './funds-routes'
+
+describe('funds-routes', () => {
+  const version = 'v2'
+  const fund = Fund.builder('GB00B80QG615')
+    .name('HSBC American Index Fund Accumulation C')
+    .historicPrices([
+      new Fund.HistoricPrice(new Date(Date.UTC(2017, 3, 20)), 456.0),
+      new Fund.HistoricPrice(new Date(Date.UTC(2017, 3, 21)), 457.0),
+      new Fund.HistoricPrice(new Date(Date.UTC(2017, 3, 24)), 458.5)
+    ])
+    .build()
+  let server: Server
+
+  beforeAll(() => {
+    const app = new Koa()
+    app.use(bodyParser())
+    app.use(fundsRoutes.routes())
+    server = app.listen()
+  })
+  afterAll(() => {
+    server.close()
+  })
+  beforeEach(() => {
+    jest.spyOn(FundDAO, 'streamFunds')
+      .mockImplementation(() => StreamTest[version].fromObjects([fund]) as any)
+  })
+  afterEach(() => {
+    jest.restoreAllMocks()
+  })
+
+  const postStream = (body: object) => {
+    const { port } = server.address() as AddressInfo
+    return axios.post(`http://localhost:${port}/api/funds/stream`, body)
+  }
+
+  test('/stream should return all historic prices', async () => {
+    const { data } = await postStream({ isins: ['GB00B80QG615'] })
+    expect(FundDAO.streamFunds).toHaveBeenCalledWith({
+      query: { isin: { $in: ['GB00B80QG615'] } },
+      projection: { _id: 0 }
+    })
+    expect(data).toHaveLength(1)
+    expect(data[0].isin).toBe('GB00B80QG615')
+    expect(data[0].historicPrices).toEqual([
+      { date: '2017-04-20T00:00:00.000Z', price: 456.0 },
+      { date: '2017-04-21T00:00:00.000Z', price: 457.0 },
+      { date: '2017-04-24T00:00:00.000Z', price: 458.5 }
+    ])
+  })
+
+  test('/stream should return only historic prices after since', async () => {
+    const { data } = await postStream({ isins: ['GB00B80QG615'], since: '2017-04-21' })
+    expect(data).toHaveLength(1)
+    expect(data[0].name).toBe('HSBC American Index Fund Accumulation C')
+    expect(data[0].historicPrices).toEqual([
+      { date: '2017-04-24T00:00:00.000Z', price: 458.5 }
+    ])
+  })
+
+  test('/stream should reject invalid since', async () => {
+    await expect(postStream({ since: 'yesterday' })).rejects.toHaveProperty('response.status', 400)
+    expect(FundDAO.streamFunds).not.toHaveBeenCalled()
+  })
+})
@@ -7,7 +7,10 @@ import * as compute from '../../client/compute'
 import * as FundDAO from '../../lib/db/FundDAO'
 import * as SimilarFundsDAO from '../../lib/db/SimilarFundsDAO'
 import FinancialTimes from '../../lib/fund/FinancialTimes'
+import Fund from '../../lib/fund/Fund'
 import * as agGridUtils from '../../lib/util/agGridUtils'
+import * as columnar from '../../lib/util/columnar'
+import * as streamWrapper from '../../lib/util/streamWrapper'
 import * as fundCache from '../cache/fundCache'
 const JSONStream = require('JSONStream')
 
@@ -38,7 +41,11 @@ router.get('/isins/:isins', async (ctx: Context) => {
 })
 
 router.post('/stream', async (ctx: Context) => {
-  const { isins } = ctx.request.body
+  const { isins, since } = ctx.request.body
+  const sinceDate = since ? new Date(since) : undefined
+  if (sinceDate && isNaN(sinceDate.getTime())) {
+    ctx.throw(400, `Invalid since date: ${since}`)
+  }
   const options: FundDAO.Options = isins
     ? {
         query: { isin: { $in: isins } },
@@ -47,10 +54,14 @@ router.post('/stream', async (ctx: Context) => {
     : {
         projection: { _id: 0 }
       }
-  ctx.type = 'json'
-  ctx.body = FundDAO.streamFunds(options)
+  // compute service asks for the compact columnar encoding, other clients get json
+  const columnarRequested = ctx.accepts('json', columnar.COLUMNAR_CONTENT_TYPE) === columnar.COLUMNAR_CONTENT_TYPE
+  ctx.type = columnarRequested ? columnar.COLUMNAR_CONTENT_TYPE : 'json'
+  const fundStream = FundDAO.streamFunds(options)
     .on('error', ctx.onerror)
-    .pipe(JSONStream.stringify())
+  // incremental refreshes only need historic prices after since, so don't serialise the rest
+  ctx.body = (sinceDate ? fundStream.pipe(historicPricesAfter(sinceDate)) : fundStream)
+    .pipe(columnarRequested ? columnar.stringify() : JSONStream.stringify())
 })
 
 router.get('/real-time-details/:isins', async (ctx: Context) => {
@@ -126,4 +137,9 @@ router.post('/similar-funds', async (ctx: Context) => {
   ctx.status = 200
 })
 
+const historicPricesAfter = (since: Date) => streamWrapper.asTransformAsync(async (fund: Fund) => ({
+  ...fund,
+  historicPrices: _.filter(fund.historicPrices, hp => hp.date > since)
+}))
+
 export default router
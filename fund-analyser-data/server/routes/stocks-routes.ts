@@ -5,6 +5,7 @@ import * as compute from '../../client/compute'
 import * as StockDAO from '../../lib/db/StockDAO'
 import FreeRealTime from '../../lib/stock/FreeRealTime'
 import * as agGridUtils from '../../lib/util/agGridUtils'
+import * as columnar from '../../lib/util/columnar'
 import * as stockCache from '../cache/stockCache'
 const JSONStream = require('JSONStream')
 const STOCKS_URL_PREFIX = '/api/stocks'
@@ -35,9 +36,14 @@ router.post('/stream', async (ctx: Context) => {
     : {
         projection: { _id: 0 }
       }
+  // compute service asks for the compact columnar encoding, other clients get json
+  const columnarRequested = ctx.accepts('json', columnar.COLUMNAR_CONTENT_TYPE) === columnar.COLUMNAR_CONTENT_TYPE
+  if (columnarRequested) {
+    ctx.type = columnar.COLUMNAR_CONTENT_TYPE
+  }
   ctx.body = StockDAO.streamStocks(options)
     .on('error', ctx.onerror)
-    .pipe(JSONStream.stringify())
+    .pipe(columnarRequested ? columnar.stringify() : JSONStream.stringify())
 })
 
 router.get('/real-time-details/:symbols', async (ctx: Context) => {